@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -17,3 +19,9 @@ class Settings(BaseSettings):
     
     # Database URL za PostgreSQL
     database_url: str | None = Field(default=None, alias="DATABASE_URL")
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Settings se preberejo enkrat na proces (brez ponovnega branja .env ob vsakem klicu)."""
+    return Settings()
@@ -0,0 +1,360 @@
+"""
+Upravljanje povezav na bazo.
+
+- Postgres: omejen pool (max DB_POOL_MAX_SIZE povezav), ki čaka na prosto povezavo
+- SQLite: ena trajna povezava na nit (sqlite3 povezave niso varne med nitmi)
+
+Povezava se kliče z `pool.acquire()` in vrne s `conn.close()`, zato obstoječa
+koda (`conn = self._conn(); ... finally: conn.close()`) ostane nespremenjena.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from app.core.metrics import record_span
+
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+POOL_TIMEOUT_SECONDS = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+CONN_MAX_LIFETIME_SECONDS = float(os.environ.get("DB_CONN_MAX_LIFETIME", "1800"))
+HEALTH_CHECK_IDLE_SECONDS = float(os.environ.get("DB_HEALTH_CHECK_IDLE", "30"))
+
+
+class _Slot:
+    """Surova povezava + čas nastanka in zadnje uporabe."""
+
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw: Any) -> None:
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class PooledConnection:
+    """Ovoj okoli povezave: close() vrne povezavo v pool namesto da jo zapre."""
+
+    def __init__(self, pool: "ConnectionPool", slot: _Slot) -> None:
+        self._pool = pool
+        self._slot: Optional[_Slot] = slot
+        self._acquired_at = time.perf_counter()
+
+    def __getattr__(self, name: str) -> Any:
+        slot = self.__dict__.get("_slot")
+        if slot is None:
+            raise RuntimeError("Povezava je že vrnjena v pool.")
+        return getattr(slot.raw, name)
+
+    def close(self) -> None:
+        slot, self._slot = self._slot, None
+        if slot is not None:
+            self._pool.release(slot)
+            # čas od prevzema do vrnitve povezave = razpon "db" v sledi zahtevka
+            record_span("db", time.perf_counter() - self._acquired_at, self._pool.backend)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class ConnectionPool:
+    """Skupna logika: health check, recikliranje po max lifetime in metrike."""
+
+    backend = "generic"
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_lifetime: float = CONN_MAX_LIFETIME_SECONDS,
+        health_check_idle: float = HEALTH_CHECK_IDLE_SECONDS,
+    ) -> None:
+        self._connect = connect
+        self.max_lifetime = max_lifetime
+        self.health_check_idle = health_check_idle
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "created": 0,
+            "recycled": 0,
+            "health_failures": 0,
+            "acquired": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        }
+
+    # --- metrike ---------------------------------------------------------
+    def _bump(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _record_wait(self, wait_ms: float) -> None:
+        with self._stats_lock:
+            self._stats["waits"] += 1
+            self._stats["wait_ms_total"] += wait_ms
+            self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            data = dict(self._stats)
+        data["wait_ms_total"] = round(data["wait_ms_total"], 2)
+        data["wait_ms_max"] = round(data["wait_ms_max"], 2)
+        data["backend"] = self.backend
+        return data
+
+    # --- povezave --------------------------------------------------------
+    def _new_slot(self) -> _Slot:
+        slot = _Slot(self._connect())
+        self._bump("created")
+        return slot
+
+    def _discard(self, slot: _Slot) -> None:
+        try:
+            slot.raw.close()
+        except Exception:
+            pass
+
+    def _expired(self, slot: _Slot) -> bool:
+        return bool(self.max_lifetime) and time.monotonic() - slot.created_at > self.max_lifetime
+
+    def _healthy(self, slot: _Slot) -> bool:
+        """Ping le, če je povezava nekaj časa mirovala (sicer je sveža)."""
+        if getattr(slot.raw, "closed", 0):
+            return False
+        if time.monotonic() - slot.last_used < self.health_check_idle:
+            return True
+        try:
+            cur = slot.raw.cursor()
+            try:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+            finally:
+                cur.close()
+            slot.raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _validate(self, slot: _Slot) -> Optional[_Slot]:
+        """Vrne uporabno povezavo ali None (povezava zavržena)."""
+        if self._expired(slot):
+            self._bump("recycled")
+            self._discard(slot)
+            return None
+        if not self._healthy(slot):
+            self._bump("health_failures")
+            self._discard(slot)
+            return None
+        return slot
+
+    def _reset(self, slot: _Slot) -> bool:
+        """Pred vrnitvijo v pool zaključi odprto transakcijo."""
+        if getattr(slot.raw, "closed", 0):
+            return False
+        try:
+            slot.raw.rollback()
+        except Exception:
+            return False
+        slot.last_used = time.monotonic()
+        return True
+
+    def acquire(self) -> PooledConnection:
+        raise NotImplementedError
+
+    def release(self, slot: _Slot) -> None:
+        raise NotImplementedError
+
+    def close_all(self) -> None:
+        raise NotImplementedError
+
+
+class BoundedConnectionPool(ConnectionPool):
+    """Pool z največ `max_size` povezavami; ob polnem poolu čaka do `timeout` sekund."""
+
+    backend = "postgres"
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_size: int = POOL_MAX_SIZE,
+        timeout: float = POOL_TIMEOUT_SECONDS,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(connect, **kwargs)
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self._idle: list[_Slot] = []
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        waited_from: Optional[float] = None
+        with self._cond:
+            while not self._idle and self._in_use >= self.max_size:
+                if waited_from is None:
+                    waited_from = time.monotonic()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._record_wait((time.monotonic() - waited_from) * 1000)
+                    self._bump("timeouts")
+                    raise TimeoutError(
+                        f"Ni proste povezave na bazo ({self.max_size} v uporabi, čakali {self.timeout}s)."
+                    )
+                self._cond.wait(remaining)
+            slot = self._idle.pop() if self._idle else None
+            self._in_use += 1
+        if waited_from is not None:
+            self._record_wait((time.monotonic() - waited_from) * 1000)
+        try:
+            if slot is not None:
+                slot = self._validate(slot)
+            if slot is None:
+                slot = self._new_slot()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        self._bump("acquired")
+        return PooledConnection(self, slot)
+
+    def release(self, slot: _Slot) -> None:
+        keep = self._reset(slot) and not self._expired(slot)
+        if not keep:
+            self._discard(slot)
+            self._bump("recycled")
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                self._idle.append(slot)
+            self._cond.notify()
+
+    def close_all(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for slot in idle:
+            self._discard(slot)
+
+    def stats(self) -> dict:
+        data = super().stats()
+        with self._cond:
+            data.update(
+                {
+                    "max_size": self.max_size,
+                    "in_use": self._in_use,
+                    "idle": len(self._idle),
+                    "size": self._in_use + len(self._idle),
+                }
+            )
+        return data
+
+
+class ThreadLocalConnectionPool(ConnectionPool):
+    """Ena trajna povezava na nit (SQLite)."""
+
+    backend = "sqlite"
+
+    def __init__(self, connect: Callable[[], Any], **kwargs: Any) -> None:
+        super().__init__(connect, **kwargs)
+        self._local = threading.local()
+        self._all: set[_Slot] = set()
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> PooledConnection:
+        slot: Optional[_Slot] = getattr(self._local, "slot", None)
+        if slot is not None and getattr(self._local, "busy", False):
+            # gnezdena uporaba v isti niti -> začasna ločena povezava
+            slot = None
+            nested = True
+        else:
+            nested = False
+            if slot is not None:
+                slot = self._validate(slot)
+                if slot is None:
+                    with self._lock:
+                        self._all.discard(self._local.slot)
+                    self._local.slot = None
+        if slot is None:
+            slot = self._new_slot()
+            if not nested:
+                self._local.slot = slot
+                with self._lock:
+                    self._all.add(slot)
+        if not nested:
+            self._local.busy = True
+        with self._lock:
+            self._in_use += 1
+        self._bump("acquired")
+        return PooledConnection(self, slot)
+
+    def release(self, slot: _Slot) -> None:
+        with self._lock:
+            self._in_use -= 1
+        if getattr(self._local, "slot", None) is not slot:
+            # začasna povezava iz gnezdenega klica
+            self._discard(slot)
+            return
+        self._local.busy = False
+        if not self._reset(slot) or self._expired(slot):
+            self._discard(slot)
+            self._bump("recycled")
+            with self._lock:
+                self._all.discard(slot)
+            self._local.slot = None
+
+    def close_all(self) -> None:
+        with self._lock:
+            slots, self._all = self._all, set()
+        for slot in slots:
+            self._discard(slot)
+        self._local = threading.local()
+
+    def stats(self) -> dict:
+        data = super().stats()
+        with self._lock:
+            data.update({"size": len(self._all), "in_use": self._in_use, "idle": len(self._all) - self._in_use})
+        return data
+
+
+_POOLS: dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(key: str, factory: Callable[[], ConnectionPool]) -> ConnectionPool:
+    """Vrne pool za dano bazo (en pool na DSN/pot za cel proces)."""
+    pool = _POOLS.get(key)
+    if pool is not None:
+        return pool
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = factory()
+            _POOLS[key] = pool
+        return pool
+
+
+def pool_stats() -> list[dict]:
+    # ključev (DSN z geslom) ne vračamo
+    return [pool.stats() for pool in list(_POOLS.values())]
+
+
+def close_pool(key: str) -> None:
+    with _POOLS_LOCK:
+        pool = _POOLS.pop(key, None)
+    if pool is not None:
+        pool.close_all()
+
+
+def close_all_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close_all()
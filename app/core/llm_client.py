@@ -1,14 +1,274 @@
-from openai import OpenAI
+"""
+Skupen LLM odjemalec za celo aplikacijo.
 
-from app.core.config import Settings
+En OpenAI/AsyncOpenAI odjemalec na proces (keep-alive HTTP povezave), timeout
+po vrsti klica, ponovni poskusi z naključnim (jitter) eksponentnim zamikom ob
+429/5xx/prekinjeni povezavi ter števci (klici, napake, latenca, tokeni) po
+mestu klica (vključno s tokeni iz predpomnilnika poziva); vsak klic se zapiše
+tudi v histograme za /metrics (app/core/metrics.py).
+"""
+from __future__ import annotations
 
-_settings = Settings()
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Optional
 
+import httpx
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    OpenAI,
+    RateLimitError,
+)
 
-def get_llm_client() -> OpenAI:
-    """Return an initialized OpenAI client or raise if API key missing."""
-    if not _settings.openai_api_key:
+from app.core.config import get_settings
+from app.core.metrics import observe_llm_call
+
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "8"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.environ.get("LLM_MAX_KEEPALIVE", "20"))
+# izpis tokenov (vhodni/predpomnjeni/nepredpomnjeni) za vsak klic
+LLM_LOG_USAGE = os.environ.get("LLM_LOG_USAGE", "true").strip().lower() in {"1", "true", "yes", "on"}
+
+# timeout (s) po vrsti klica; LLM_TIMEOUT_<VRSTA> ga povozi
+CALL_TIMEOUTS = {
+    "route": 8.0,
+    "answer": 25.0,
+    "stream": 40.0,
+    "translate": 12.0,
+}
+DEFAULT_TIMEOUT = 20.0
+
+_client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+_client_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, float]] = {}
+
+
+def _api_key() -> str:
+    api_key = get_settings().openai_api_key
+    if not api_key:
         raise RuntimeError(
             "OPENAI_API_KEY ni nastavljen. Dodaj ga v okolje ali .env datoteko."
         )
-    return OpenAI(api_key=_settings.openai_api_key)
+    return api_key
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE)
+
+
+def get_llm_client() -> OpenAI:
+    """Return the shared OpenAI client or raise if API key missing."""
+    global _client
+    api_key = _api_key()
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # ponovne poskuse vodimo sami (z jitterjem in števci), zato max_retries=0
+                _client = OpenAI(
+                    api_key=api_key,
+                    max_retries=0,
+                    timeout=DEFAULT_TIMEOUT,
+                    http_client=DefaultHttpxClient(limits=_limits()),
+                )
+    return _client
+
+
+def get_async_llm_client() -> AsyncOpenAI:
+    """Return the shared AsyncOpenAI client (one HTTP pool for all conversations)."""
+    global _async_client
+    api_key = _api_key()
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncOpenAI(
+                    api_key=api_key,
+                    max_retries=0,
+                    timeout=DEFAULT_TIMEOUT,
+                    http_client=DefaultAsyncHttpxClient(limits=_limits()),
+                )
+    return _async_client
+
+
+async def close_llm_clients() -> None:
+    """Zapre HTTP povezave (ob zaustavitvi aplikacije)."""
+    global _client, _async_client
+    client, async_client = _client, _async_client
+    _client = _async_client = None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.close()
+
+
+# --- timeouti, ponovni poskusi, števci -----------------------------------
+def call_timeout(kind: str) -> float:
+    env_value = os.environ.get(f"LLM_TIMEOUT_{kind.upper()}")
+    if env_value:
+        return float(env_value)
+    return CALL_TIMEOUTS.get(kind, DEFAULT_TIMEOUT)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (RateLimitError, APIConnectionError)):
+        return True
+    return isinstance(exc, APIStatusError) and exc.status_code >= 500
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+        except ValueError:
+            pass
+    # "full jitter": naključno med 0 in base * 2^attempt
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _site_stats(call_site: str) -> dict[str, float]:
+    stats = _stats.get(call_site)
+    if stats is None:
+        stats = _stats.setdefault(
+            call_site,
+            {
+                "calls": 0,
+                "errors": 0,
+                "retries": 0,
+                "latency_ms_total": 0.0,
+                "latency_ms_max": 0.0,
+                "input_tokens": 0,
+                "cached_input_tokens": 0,
+                "output_tokens": 0,
+            },
+        )
+    return stats
+
+
+def cached_tokens(usage: Any) -> int:
+    """Vhodni tokeni, ki jih je ponudnik postregel iz predpomnilnika poziva."""
+    details = getattr(usage, "input_tokens_details", None)
+    return (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+
+
+def _record(call_site: str, started: float, usage: Any = None, error: bool = False, model: str = "") -> None:
+    latency_ms = (time.monotonic() - started) * 1000
+    observe_llm_call(call_site, model, latency_ms / 1000, usage=usage, error=error)
+    if usage is not None and LLM_LOG_USAGE:
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        cached = cached_tokens(usage)
+        print(f"[LLM] {call_site}: input={input_tokens} cached={cached} uncached={input_tokens - cached}")
+    with _stats_lock:
+        stats = _site_stats(call_site)
+        stats["calls"] += 1
+        stats["latency_ms_total"] += latency_ms
+        stats["latency_ms_max"] = max(stats["latency_ms_max"], latency_ms)
+        if error:
+            stats["errors"] += 1
+        if usage is not None:
+            stats["input_tokens"] += getattr(usage, "input_tokens", 0) or 0
+            stats["cached_input_tokens"] += cached_tokens(usage)
+            stats["output_tokens"] += getattr(usage, "output_tokens", 0) or 0
+
+
+def _record_retry(call_site: str) -> None:
+    with _stats_lock:
+        _site_stats(call_site)["retries"] += 1
+
+
+def llm_stats() -> dict[str, dict[str, float]]:
+    """Števci po mestu klica (za admin/metrics)."""
+    with _stats_lock:
+        result = {}
+        for call_site, stats in _stats.items():
+            row = dict(stats)
+            row["latency_ms_avg"] = round(row["latency_ms_total"] / row["calls"], 1) if row["calls"] else 0.0
+            row["uncached_input_tokens"] = row["input_tokens"] - row["cached_input_tokens"]
+            row["cache_hit_ratio"] = (
+                round(row["cached_input_tokens"] / row["input_tokens"], 3) if row["input_tokens"] else 0.0
+            )
+            result[call_site] = row
+        return result
+
+
+def reset_llm_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+# --- klici -----------------------------------------------------------------
+def create_response(call_site: str, kind: str = "answer", **request: Any) -> Any:
+    """client.responses.create s timeoutom za `kind`, ponovnimi poskusi in števci."""
+    client = get_llm_client().with_options(timeout=call_timeout(kind))
+    started = time.monotonic()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            response = client.responses.create(**request)
+        except Exception as exc:
+            if attempt < LLM_MAX_RETRIES and _is_retryable(exc):
+                _record_retry(call_site)
+                time.sleep(_retry_delay(exc, attempt))
+                continue
+            _record(call_site, started, error=True, model=request.get("model", ""))
+            raise
+        _record(call_site, started, usage=getattr(response, "usage", None), model=request.get("model", ""))
+        return response
+
+
+async def acreate_response(call_site: str, kind: str = "answer", **request: Any) -> Any:
+    """Async različica create_response."""
+    client = get_async_llm_client().with_options(timeout=call_timeout(kind))
+    started = time.monotonic()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            response = await client.responses.create(**request)
+        except Exception as exc:
+            if attempt < LLM_MAX_RETRIES and _is_retryable(exc):
+                _record_retry(call_site)
+                await asyncio.sleep(_retry_delay(exc, attempt))
+                continue
+            _record(call_site, started, error=True, model=request.get("model", ""))
+            raise
+        _record(call_site, started, usage=getattr(response, "usage", None), model=request.get("model", ""))
+        return response
+
+
+async def astream_response(call_site: str, kind: str = "stream", **request: Any) -> AsyncIterator[Any]:
+    """
+    Async stream dogodkov. Ponovni poskus je možen le pred prvim dogodkom;
+    tokeni se preberejo iz zaključnega dogodka (response.completed).
+    """
+    client = get_async_llm_client().with_options(timeout=call_timeout(kind))
+    started = time.monotonic()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            stream = await client.responses.create(stream=True, **request)
+            break
+        except Exception as exc:
+            if attempt < LLM_MAX_RETRIES and _is_retryable(exc):
+                _record_retry(call_site)
+                await asyncio.sleep(_retry_delay(exc, attempt))
+                continue
+            _record(call_site, started, error=True, model=request.get("model", ""))
+            raise
+    usage = None
+    try:
+        async for event in stream:
+            if getattr(event, "type", "") == "response.completed":
+                usage = getattr(getattr(event, "response", None), "usage", None)
+            yield event
+    except Exception:
+        _record(call_site, started, error=True, model=request.get("model", ""))
+        raise
+    _record(call_site, started, usage=usage, model=request.get("model", ""))
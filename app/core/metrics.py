@@ -0,0 +1,280 @@
+"""
+Časovni razponi (spans) po fazah chat cevovoda in histogrami za /metrics.
+
+Vsak /chat zahtevek odpre sled (`start_trace`); faze (routing, db, llm,
+retrieval, translation, logging) se merijo z `span(...)` oz. `record_span(...)`
+in zbirajo v sledi (ContextVar – velja tudi v asyncio.to_thread). Ob koncu
+zahtevka (`finish_trace`) se vsi razponi zapišejo v histograme z oznako končne
+namere (vrednost, podana `finalize`). Pri /chat/stream sled prevzame generator
+odgovora (`defer_trace` + `traced_stream`) in jo zapiše, ko je odgovor poslan.
+Razponi izven sledi dobijo intent="none". Izpis je v Prometheus tekstovnem
+formatu, brez odvisnosti:
+
+    chat_stage_seconds_bucket{stage="llm",detail="route_reservation",intent="booking_room",le="0.5"} 12
+
+p95 po poti: histogram_quantile(0.95, sum by (le, intent) (rate(chat_request_seconds_bucket[5m]))).
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterator, Optional
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+UNTRACED_INTENT = "none"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Kumulativni histogram z oznakami (Prometheus `histogram`)."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # oznake -> [števci po predalih (+Inf zadnji), vsota]
+        self._series: dict[tuple[str, ...], list[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        """Ocena kvantila iz predalov (linearno znotraj predala, kot histogram_quantile)."""
+        wanted = {name: str(value) for name, value in labels.items()}
+        counts = [0] * (len(self.buckets) + 1)
+        with self._lock:
+            for key, (bucket_counts, _) in self._series.items():
+                if all(key[self.label_names.index(name)] == value for name, value in wanted.items()):
+                    counts = [a + b for a, b in zip(counts, bucket_counts)]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def label_values(self) -> list[dict[str, str]]:
+        with self._lock:
+            return [dict(zip(self.label_names, key)) for key in self._series]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """Monotoni števec z oznakami (Prometheus `counter`)."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...]) -> None:
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.label_names, key)} {value:g}" for key, value in values)
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+CHAT_REQUEST_SECONDS = Histogram("chat_request_seconds", "Trajanje /chat zahtevka po končni nameri.", ("intent",))
+CHAT_STAGE_SECONDS = Histogram(
+    "chat_stage_seconds",
+    "Trajanje faz cevovoda (routing, db, llm, retrieval, translation, logging) po končni nameri.",
+    ("stage", "detail", "intent"),
+)
+LLM_CALL_SECONDS = Histogram("llm_call_seconds", "Trajanje LLM klicev (z vsemi ponovnimi poskusi).", ("call_site", "model", "status"))
+LLM_TOKENS = Counter("llm_tokens_total", "Tokeni LLM klicev po vrsti (input, cached_input, output).", ("call_site", "model", "type"))
+METRICS = (CHAT_REQUEST_SECONDS, CHAT_STAGE_SECONDS, LLM_CALL_SECONDS, LLM_TOKENS)
+
+
+@dataclass
+class RequestTrace:
+    started: float = field(default_factory=time.perf_counter)
+    intent: Optional[str] = None
+    spans: list[tuple[str, str, float]] = field(default_factory=list)
+    deferred: bool = False
+
+
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar("chat_trace", default=None)
+
+
+def start_trace() -> Any:
+    """Odpre sled za zahtevek; vrne žeton za finish_trace.
+
+    Znotraj že odprte sledi (/chat/stream -> chat_endpoint) vrne None: razponi
+    gredo v zunanjo sled, ki jo zapre njen lastnik.
+    """
+    if _trace.get() is not None:
+        return None
+    return _trace.set(RequestTrace())
+
+
+def set_trace_intent(intent: str) -> None:
+    trace = _trace.get()
+    if trace is not None:
+        trace.intent = intent
+
+
+def finish_trace(token: Any, default_intent: str = "error") -> Optional[RequestTrace]:
+    """Zapiše razpone in skupni čas zahtevka z oznako namere ter zapre sled."""
+    if token is None:
+        return None
+    trace = _trace.get()
+    _trace.reset(token)
+    if trace is None or trace.deferred:
+        return trace
+    _observe_trace(trace, default_intent)
+    return trace
+
+
+def _observe_trace(trace: RequestTrace, default_intent: str) -> None:
+    intent = trace.intent or default_intent
+    CHAT_REQUEST_SECONDS.observe(time.perf_counter() - trace.started, intent=intent)
+    for stage, detail, seconds in trace.spans:
+        CHAT_STAGE_SECONDS.observe(seconds, stage=stage, detail=detail, intent=intent)
+
+
+def defer_trace() -> Optional[RequestTrace]:
+    """Zapis sledi prevzame generator odgovora (traced_stream); finish_trace jo le zapre."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.deferred = True
+    return trace
+
+
+async def traced_stream(chunks: AsyncIterator[str], trace: Optional[RequestTrace], intent: str) -> AsyncIterator[str]:
+    """Nadaljuje sled v generatorju StreamingResponse in jo zapiše, ko je odgovor poslan."""
+    if trace is None:
+        async for chunk in chunks:
+            yield chunk
+        return
+    token = _trace.set(trace)
+    try:
+        async for chunk in chunks:
+            yield chunk
+        trace.intent = trace.intent or intent
+    finally:
+        try:
+            _trace.reset(token)
+        except ValueError:
+            # generator zaprt v drugem kontekstu (prekinjena povezava)
+            pass
+        _observe_trace(trace, "error")
+
+
+def record_span(stage: str, seconds: float, detail: str = "") -> None:
+    trace = _trace.get()
+    if trace is None:
+        CHAT_STAGE_SECONDS.observe(seconds, stage=stage, detail=detail, intent=UNTRACED_INTENT)
+    else:
+        trace.spans.append((stage, detail, seconds))
+
+
+@contextmanager
+def span(stage: str, detail: str = "") -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - started, detail)
+
+
+def observe_llm_call(call_site: str, model: str, seconds: float, usage: Any = None, error: bool = False) -> None:
+    """LLM klic: histogram po mestu klica/modelu, tokeni in razpon "llm" v sledi."""
+    model = model or "unknown"
+    LLM_CALL_SECONDS.observe(seconds, call_site=call_site, model=model, status="error" if error else "ok")
+    record_span("llm", seconds, call_site)
+    if usage is not None:
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        details = getattr(usage, "input_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+        LLM_TOKENS.inc(input_tokens, call_site=call_site, model=model, type="input")
+        LLM_TOKENS.inc(cached, call_site=call_site, model=model, type="cached_input")
+        LLM_TOKENS.inc(getattr(usage, "output_tokens", 0) or 0, call_site=call_site, model=model, type="output")
+
+
+def render_metrics() -> str:
+    """Vse metrike v Prometheus tekstovnem formatu (0.0.4)."""
+    lines: list[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def latency_summary(quantiles: tuple[float, ...] = (0.5, 0.95)) -> dict[str, Any]:
+    """p50/p95 (s) po nameri in po fazi – za admin brez Prometheusa."""
+    def row(histogram: Histogram, **labels: str) -> dict[str, Optional[float]]:
+        return {f"p{int(q * 100)}": _round(histogram.quantile(q, **labels)) for q in quantiles}
+
+    intents = sorted({labels["intent"] for labels in CHAT_REQUEST_SECONDS.label_values()})
+    stages = sorted({(labels["stage"], labels["detail"]) for labels in CHAT_STAGE_SECONDS.label_values()})
+    return {
+        "requests": {intent: row(CHAT_REQUEST_SECONDS, intent=intent) for intent in intents},
+        "stages": {f"{stage}:{detail}" if detail else stage: row(CHAT_STAGE_SECONDS, stage=stage, detail=detail) for stage, detail in stages},
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 4) if value is not None else None
+
+
+def reset_metrics() -> None:
+    for metric in METRICS:
+        metric.reset()
@@ -0,0 +1,104 @@
+"""
+Kontekst za LLM z omejenim številom vhodnih tokenov.
+
+Namesto celotne baze znanja v pozivu izberemo najboljše odstavke
+(search_knowledge_scored), vedno dodamo kritična dejstva (cene, urnik,
+pravila) in se ustavimo pri proračunu `KB_CONTEXT_MAX_TOKENS`. Če je iskanje
+premalo zanesljivo, vrne None in klicatelj uporabi celoten KB.
+"""
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Optional
+
+from app.rag.knowledge_base import KnowledgeChunk, search_knowledge_scored
+
+KB_CONTEXT_MAX_TOKENS = int(os.environ.get("KB_CONTEXT_MAX_TOKENS", "2000"))
+KB_CONTEXT_MIN_SCORE = float(os.environ.get("KB_CONTEXT_MIN_SCORE", "0.4"))
+KB_CONTEXT_TOP_K = int(os.environ.get("KB_CONTEXT_TOP_K", "8"))
+# gpt-4.1 / gpt-4o tokenizer
+TOKEN_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Any:
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as exc:  # ni nameščen ali ni mogoče naložiti BPE datoteke
+        print(f"[KB] tiktoken ni na voljo ({exc}) – tokeni se ocenijo")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Število tokenov (tiktoken); brez njega konzervativna ocena po bajtih."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # ~4 bajte na token; šumniki so 2 bajta, zato ocena raje previsoka kot prenizka
+    return math.ceil(len(text.encode("utf-8")) / 3.5)
+
+
+def format_chunk(chunk: KnowledgeChunk) -> str:
+    return f"URL: {chunk.url}\nNaslov: {chunk.title}\nVsebina: {chunk.paragraph.strip()}\n"
+
+
+def format_facts(facts: dict[str, str]) -> str:
+    return "\n\n".join(f"[{key}]\n{text.strip()}" for key, text in facts.items() if text and text.strip())
+
+
+@dataclass
+class BoundedContext:
+    facts: str
+    passages: str
+    tokens: int
+    chunks: int
+    top_score: float
+
+
+def build_bounded_context(
+    question: str,
+    facts: dict[str, str],
+    reserved_tokens: int = 0,
+    max_tokens: int = KB_CONTEXT_MAX_TOKENS,
+    min_score: float = KB_CONTEXT_MIN_SCORE,
+    top_k: int = KB_CONTEXT_TOP_K,
+) -> Optional[BoundedContext]:
+    """
+    Kritična dejstva + najbolj relevantni odstavki do `max_tokens` (vključno z
+    `reserved_tokens` za navodila in vprašanje). None = premalo zanesljivo.
+    """
+    scored = search_knowledge_scored(question, top_k=top_k)
+    if not scored or scored[0][0] < min_score:
+        return None
+
+    facts_text = format_facts(facts)
+    used = reserved_tokens + count_tokens(facts_text)
+    passages: list[str] = []
+    seen: set[tuple[str, str]] = set()
+    for score, chunk in scored:
+        key = (chunk.url, chunk.paragraph[:80])
+        if key in seen:
+            continue
+        seen.add(key)
+        passage = format_chunk(chunk)
+        cost = count_tokens(passage) + 2  # ločilo "---"
+        if used + cost > max_tokens:
+            continue
+        passages.append(passage)
+        used += cost
+    if not passages:
+        return None
+    return BoundedContext(
+        facts=facts_text,
+        passages="\n---\n".join(passages),
+        tokens=used,
+        chunks=len(passages),
+        top_score=scored[0][0],
+    )
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import re
 from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Set
 
-from app.core.llm_client import get_llm_client
+from app.core.llm_client import acreate_response, create_response
+from app.services.answer_cache import cached_answer, store_answer
 
 BASE_DIR = Path(__file__).resolve().parents[2]
 KNOWLEDGE_PATH = BASE_DIR / "knowledge.jsonl"
@@ -74,6 +76,8 @@ def load_knowledge_chunks() -> list[KnowledgeChunk]:
 
 
 KNOWLEDGE_CHUNKS: List[KnowledgeChunk] = load_knowledge_chunks()
+# verzija baze znanja (ključ za predpomnjene odgovore in predpono poziva)
+KB_VERSION = hashlib.sha1(KNOWLEDGE_PATH.read_bytes()).hexdigest()[:12] if KNOWLEDGE_PATH.exists() else "none"
 
 CONTACT = {
     "phone": "03 759 04 10, 031 249 812",
@@ -429,8 +433,19 @@ Ti: "Ni za kaj! Če boste imeli še kakšno vprašanje, sem tu. Lep pozdrav s Po
 - Ne zaključuješ vedno z istim stavkom
 """
 
+# odgovor nastane neposredno v jeziku gosta (brez naknadnega prevoda)
+LANGUAGE_INSTRUCTIONS = {
+    "en": "The guest writes in English. Answer in natural, friendly English (keep names, prices and dates as they are).",
+    "de": "Der Gast schreibt auf Deutsch. Antworte in natürlichem, freundlichem Deutsch (Namen, Preise und Daten unverändert).",
+}
+
 
-def generate_llm_answer(question: str, top_k: int = 6, history: list[dict[str, str]] | None = None) -> str:
+def _llm_answer_request(
+    question: str,
+    top_k: int,
+    history: list[dict[str, str]] | None,
+    language: str = "si",
+) -> dict:
     try:
         paragraphs = _gather_relevant_chunks(question, base_top_k=top_k)
         paragraphs = _filter_chunks_by_category(question, paragraphs)
@@ -444,17 +459,17 @@ def generate_llm_answer(question: str, top_k: int = 6, history: list[dict[str, s
     else:
         context_text = _build_context_snippet(question, paragraphs)
 
-    client = get_llm_client()
     convo: list[dict[str, str]] = [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "developer", "content": f"Kontekst iz baze znanja Urška:\n{context_text}"},
     ]
+    if language in LANGUAGE_INSTRUCTIONS:
+        convo.append({"role": "developer", "content": LANGUAGE_INSTRUCTIONS[language]})
     if history:
         # vzamemo zadnjih nekaj sporočil, da ohranimo kratko zgodovino
         convo.extend(history[-6:])
     convo.append({"role": "user", "content": f"Vprašanje gosta: {question}"})
-
-    response = client.responses.create(
+    return dict(
         model="gpt-4.1-mini",
         input=convo,
         max_output_tokens=400,
@@ -462,6 +477,11 @@ def generate_llm_answer(question: str, top_k: int = 6, history: list[dict[str, s
         top_p=0.9,
     )
 
+
+LLM_EMPTY_ANSWER = "Trenutno v podatkih ne najdem jasnega odgovora. Prosimo, preverite www.kmetija-urska.si."
+
+
+def _llm_answer_text(response) -> str:
     answer = getattr(response, "output_text", None)
     if not answer:
         outputs = []
@@ -472,6 +492,45 @@ def generate_llm_answer(question: str, top_k: int = 6, history: list[dict[str, s
                     outputs.append(text)
         answer = "\n".join(outputs).strip()
 
-    return answer or (
-        "Trenutno v podatkih ne najdem jasnega odgovora. Prosimo, preverite www.kmetija-urska.si."
-    )
+    return answer or LLM_EMPTY_ANSWER
+
+
+def generate_llm_answer(
+    question: str,
+    top_k: int = 6,
+    history: list[dict[str, str]] | None = None,
+    call_site: str = "rag_answer",
+    kind: str = "answer",
+    language: str = "si",
+) -> str:
+    # brez zgodovine je odgovor odvisen le od vprašanja -> predpomnilnik (prevodi ne)
+    cacheable = not history and kind == "answer"
+    if cacheable:
+        cached = cached_answer(question, language, KB_VERSION)
+        if cached:
+            return cached
+    request = _llm_answer_request(question, top_k, history, language)
+    answer = _llm_answer_text(create_response(call_site, kind=kind, **request))
+    if cacheable and answer != LLM_EMPTY_ANSWER:
+        store_answer(question, language, KB_VERSION, answer)
+    return answer
+
+
+async def generate_llm_answer_async(
+    question: str,
+    top_k: int = 6,
+    history: list[dict[str, str]] | None = None,
+    call_site: str = "rag_answer",
+    kind: str = "answer",
+    language: str = "si",
+) -> str:
+    cacheable = not history and kind == "answer"
+    if cacheable:
+        cached = cached_answer(question, language, KB_VERSION)
+        if cached:
+            return cached
+    request = _llm_answer_request(question, top_k, history, language)
+    answer = _llm_answer_text(await acreate_response(call_site, kind=kind, **request))
+    if cacheable and answer != LLM_EMPTY_ANSWER:
+        store_answer(question, language, KB_VERSION, answer)
+    return answer
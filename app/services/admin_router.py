@@ -7,15 +7,20 @@ from fastapi import APIRouter, HTTPException
 from fastapi.responses import HTMLResponse, Response
 from pydantic import BaseModel
 
+from app.core.db_pool import pool_stats
+from app.core.llm_client import llm_stats
+from app.core.metrics import latency_summary
+from app.services.answer_cache import answer_cache_stats
 from app.services.email_service import (
     send_custom_message,
     send_reservation_confirmed,
     send_reservation_rejected,
 )
-from app.services.reservation_service import ROOMS, ReservationService
+from app.services.reservation_service import ROOMS, get_reservation_service
 
 router = APIRouter(tags=["admin"])
-service = ReservationService()
+# ista instanca kot v ostalih routerjih (helperji spodaj jo uporabljajo neposredno)
+service = get_reservation_service()
 
 ROOM_IDS = {r["id"] for r in ROOMS}
 
@@ -70,23 +75,43 @@ def _reservation_days(date_str: str, nights: Optional[int]) -> list[datetime]:
     return [start + timedelta(days=i) for i in range(nights_int)]
 
 
+def _row_days(r: dict) -> list[datetime]:
+    """Dnevi bivanja iz ISO stolpcev (start_date/end_date), sicer iz dd.mm.yyyy."""
+    start_date, end_date = r.get("start_date"), r.get("end_date")
+    if start_date and end_date:
+        start = datetime.fromisoformat(start_date)
+        return [start + timedelta(days=i) for i in range((datetime.fromisoformat(end_date) - start).days)]
+    return _reservation_days(r.get("date", ""), r.get("nights"))
+
+
+def _month_range(month: int, year: int) -> tuple[str, str]:
+    """Prvi in zadnji dan meseca v ISO obliki."""
+    first = datetime(year, month, 1)
+    next_month = datetime(year + (month == 12), month % 12 + 1, 1)
+    return first.strftime("%Y-%m-%d"), (next_month - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
 def _room_conflicts(reservation_id: int, room_id: str, date_str: str, nights: Optional[int]) -> list[str]:
     """Vrne seznam datumov (dd.mm.yyyy) kjer je soba že zasedena."""
     occupied: list[str] = []
     days = _reservation_days(date_str, nights)
     if not days:
         return occupied
-    other_reservations = service.read_reservations(limit=1000, reservation_type="room")
+    other_reservations = service.read_reservations(
+        limit=1000,
+        reservation_type="room",
+        statuses=["confirmed", "processing"],
+        date_from=days[0].strftime("%Y-%m-%d"),
+        date_to=days[-1].strftime("%Y-%m-%d"),
+        include_undated=False,
+    )
     for r in other_reservations:
         if r.get("id") == reservation_id:
             continue
-        status = r.get("status")
-        if status not in {"confirmed", "processing"}:
-            continue
         other_room = _normalize_room_id(r.get("location"))
         if other_room != room_id:
             continue
-        other_days = _reservation_days(r.get("date", ""), r.get("nights"))
+        other_days = _row_days(r)
         overlaps = {d.date() for d in days} & {d.date() for d in other_days}
         if overlaps:
             occupied.extend(sorted({d.strftime("%d.%m.%Y") for d in overlaps}))
@@ -199,6 +224,25 @@ def get_usage_stats():
     return service.get_usage_stats()
 
 
+@router.get("/api/admin/db_pool")
+def get_db_pool_stats():
+    _log("db_pool")
+    return {"pools": pool_stats(), "conversation_log": service.conversation_log_stats()}
+
+
+@router.get("/api/admin/llm_stats")
+def get_llm_stats():
+    _log("llm_stats")
+    return {"call_sites": llm_stats(), "answer_cache": answer_cache_stats()}
+
+
+@router.get("/api/admin/latency")
+def get_latency():
+    """p50/p95 po končni nameri in po fazi (ocena iz histogramov za /metrics)."""
+    _log("latency")
+    return latency_summary()
+
+
 @router.get("/api/admin/question_stats")
 def get_question_stats(limit: int = 10):
     _log("question_stats", limit=limit)
@@ -216,7 +260,6 @@ def get_reservations(
 ):
     """Vrne seznam rezervacij s filtri ter osnovno statistiko."""
     _log("reservations", limit=limit, status=status, type=type, source=source, date_from=date_from, date_to=date_to)
-    reservations = service.read_reservations(limit=limit, status=status, reservation_type=type, source=source)
 
     def _parse_date(date_str: str) -> Optional[datetime]:
         if not date_str:
@@ -229,27 +272,17 @@ def get_reservations(
                 continue
         return None
 
-    if date_from or date_to:
-        start = _parse_date(date_from) if date_from else None
-        end = _parse_date(date_to) if date_to else None
-        filtered = []
-        for r in reservations:
-            days = _reservation_days(r.get("date", ""), r.get("nights"))
-            if not days:
-                # če ni datuma, ga obdržimo (ne izločimo)
-                filtered.append(r)
-                continue
-            overlaps = False
-            for d in days:
-                if start and d < start:
-                    continue
-                if end and d > end:
-                    continue
-                overlaps = True
-                break
-            if overlaps:
-                filtered.append(r)
-        reservations = filtered
+    start = _parse_date(date_from) if date_from else None
+    end = _parse_date(date_to) if date_to else None
+    # prekrivanje z obdobjem se filtrira v SQL; rezervacije brez datuma obdržimo
+    reservations = service.read_reservations(
+        limit=limit,
+        status=status,
+        reservation_type=type,
+        source=source,
+        date_from=start.strftime("%Y-%m-%d") if start else None,
+        date_to=end.strftime("%Y-%m-%d") if end else None,
+    )
 
     all_res = service.read_reservations(limit=1000)
     today_prefix = datetime.now().strftime("%Y-%m-%d")
@@ -460,15 +493,21 @@ def calendar_rooms(month: int, year: int):
     if month < 1 or month > 12:
         raise HTTPException(status_code=400, detail="Neveljaven mesec")
     days: dict[str, dict[str, Any]] = {}
-    reservations = service.read_reservations(limit=1000, reservation_type="room")
+    month_start, month_end = _month_range(month, year)
+    reservations = service.read_reservations(
+        limit=1000,
+        reservation_type="room",
+        statuses=["pending", "processing", "confirmed"],
+        date_from=month_start,
+        date_to=month_end,
+        include_undated=False,
+    )
     for r in reservations:
         status = r.get("status")
-        if status not in {"pending", "processing", "confirmed"}:
-            continue
         room_id = _normalize_room_id(r.get("location"))
         if not room_id:
             continue
-        for day in _reservation_days(r.get("date", ""), r.get("nights")):
+        for day in _row_days(r):
             if day.month != month or day.year != year:
                 continue
             key = day.strftime("%Y-%m-%d")
@@ -493,13 +532,28 @@ def calendar_rooms(month: int, year: int):
     return {"days": days}
 
 
+@router.post("/api/admin/rooms/auto-assign")
+def auto_assign_rooms(apply: bool = False):
+    """Predlog sob za pending rezervacije brez sobe; z apply=true se sobe tudi zapišejo."""
+    _log("auto_assign_rooms", apply=apply)
+    proposals = service.auto_assign_rooms(apply=apply)
+    return {"applied": apply, "assignments": proposals}
+
+
 @router.get("/api/admin/calendar/tables")
 def calendar_tables(month: int, year: int):
     """Zasedenost miz po dnevih in urah."""
     if month < 1 or month > 12:
         raise HTTPException(status_code=400, detail="Neveljaven mesec")
     calendar: dict[str, dict[str, Any]] = {}
-    reservations = service.read_reservations(limit=1000, reservation_type="table")
+    month_start, month_end = _month_range(month, year)
+    reservations = service.read_reservations(
+        limit=1000,
+        reservation_type="table",
+        date_from=month_start,
+        date_to=month_end,
+        include_undated=False,
+    )
     for r in reservations:
         status = r.get("status")
         if status in {"rejected", "cancelled"}:
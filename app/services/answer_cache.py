@@ -0,0 +1,307 @@
+"""
+Predpomnilnik LLM odgovorov na informativna vprašanja.
+
+Ključ je normalizirano vprašanje (male črke, brez šumnikov in mašil) + jezik
++ verzija baze znanja, zato se ob novem knowledge.jsonl stari odgovori ne
+uporabijo več. Privzeto je v pomnilniku (LRU + TTL); z `ANSWER_CACHE=db` je
+v tabeli `answer_cache`, ki si jo delijo vsi workerji. `ANSWER_CACHE=off`
+ga izklopi.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+ANSWER_CACHE_BACKEND = os.environ.get("ANSWER_CACHE", "memory").strip().lower()
+ANSWER_CACHE_MAX = int(os.environ.get("ANSWER_CACHE_MAX", "2000"))
+ANSWER_CACHE_TTL_HOURS = float(os.environ.get("ANSWER_CACHE_TTL_HOURS", "24"))
+
+# mašila (si/en/de, brez šumnikov), ki ne spremenijo pomena vprašanja
+STOPWORDS = {
+    "a", "ali", "al", "pa", "in", "na", "za", "se", "so", "je", "smo", "ste", "sem", "bi", "da",
+    "mi", "vi", "vas", "vam", "nam", "to", "ta", "te", "tudi", "lahko", "prosim", "hvala", "pozdravljeni",
+    "zivjo", "zdravo", "ok", "pri", "v", "z", "s", "k", "od", "do", "iz", "ob", "me", "mene",
+    "the", "an", "and", "or", "is", "are", "does", "you", "your", "we", "i", "my", "please",
+    "hi", "hello", "can", "could", "there", "of", "for", "on", "at", "it",
+    "der", "die", "das", "ein", "eine", "und", "oder", "ist", "sind", "sie", "ihr", "ich", "bitte",
+    "hallo", "es", "zu", "im", "am", "bei", "mit", "fur", "gibt",
+}
+
+
+def normalize_question(text: str) -> str:
+    """'Koliko stane soba?' in 'koliko STANE sóba' -> 'koliko stane soba'."""
+    folded = unicodedata.normalize("NFKD", (text or "").lower())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    tokens = re.findall(r"[a-z0-9]+", folded)
+    return " ".join(token for token in tokens if token not in STOPWORDS)
+
+
+def cache_key(question: str, language: str, kb_version: str) -> Optional[str]:
+    normalized = normalize_question(question)
+    if not normalized:
+        return None
+    return f"{kb_version}:{language or 'si'}:{normalized}"
+
+
+class InMemoryAnswerCache:
+    """LRU + TTL v pomnilniku procesa."""
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX, ttl_hours: float = ANSWER_CACHE_TTL_HOURS) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_hours * 3600
+        self._entries: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "expired": 0, "evicted": 0}
+
+    def get(self, question: str, language: str, kb_version: str) -> Optional[str]:
+        key = cache_key(question, language, kb_version)
+        if key is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self.stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def set(self, question: str, language: str, kb_version: str, answer: str) -> None:
+        key = cache_key(question, language, kb_version)
+        if key is None or not answer:
+            return
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic())
+            self._entries.move_to_end(key)
+            self.stats["stored"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evicted"] += 1
+
+    def invalidate(self, kb_version: Optional[str] = None) -> int:
+        """Odstrani vnose drugih verzij KB (ali vse, če verzija ni podana)."""
+        with self._lock:
+            stale = [key for key in self._entries if kb_version is None or not key.startswith(f"{kb_version}:")]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DatabaseAnswerCache:
+    """Odgovori v tabeli answer_cache (SQLite/Postgres), deljeni med workerji.
+
+    Branje je samo SELECT: zadetki se štejejo v pomnilniku in zapišejo v paketu
+    ob vzdrževanju (vsakih PURGE_EVERY operacij), ki hkrati odstrani pretečene
+    vnose in nad `max_entries` najmanj uporabljene (hits, nato najstarejše).
+    """
+
+    PURGE_EVERY = 200
+
+    def __init__(
+        self,
+        service_factory: Callable[[], Any],
+        max_entries: int = ANSWER_CACHE_MAX,
+        ttl_hours: float = ANSWER_CACHE_TTL_HOURS,
+    ) -> None:
+        self._service_factory = service_factory
+        self.max_entries = max(1, max_entries)
+        self.ttl = timedelta(hours=ttl_hours)
+        self._pending_hits: dict[str, int] = {}
+        self._operations = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "expired": 0, "evicted": 0}
+
+    @property
+    def _service(self):
+        return self._service_factory()
+
+    def get(self, question: str, language: str, kb_version: str) -> Optional[str]:
+        key = cache_key(question, language, kb_version)
+        if key is None:
+            return None
+        service = self._service
+        ph = service._placeholder()
+        now = datetime.now().isoformat(timespec="seconds")
+        conn = service._conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(f"SELECT answer FROM answer_cache WHERE cache_key = {ph} AND expires_at > {ph}", (key, now))
+            row = cur.fetchone()
+        finally:
+            conn.close()
+        if not row:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+            self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+        self._maybe_purge()
+        return dict(row)["answer"]
+
+    def set(self, question: str, language: str, kb_version: str, answer: str) -> None:
+        key = cache_key(question, language, kb_version)
+        if key is None or not answer:
+            return
+        service = self._service
+        ph = service._placeholder()
+        now = datetime.now()
+        conn = service._conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO answer_cache (cache_key, kb_version, answer, hits, created_at, expires_at) "
+                f"VALUES ({ph}, {ph}, {ph}, 0, {ph}, {ph}) "
+                "ON CONFLICT (cache_key) DO UPDATE SET answer = excluded.answer, "
+                "created_at = excluded.created_at, expires_at = excluded.expires_at",
+                (
+                    key,
+                    kb_version,
+                    answer,
+                    now.isoformat(timespec="seconds"),
+                    (now + self.ttl).isoformat(timespec="seconds"),
+                ),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self.stats["stored"] += 1
+        self._maybe_purge()
+
+    def _maybe_purge(self) -> None:
+        with self._lock:
+            self._operations += 1
+            purge = self._operations % self.PURGE_EVERY == 0
+        if purge:
+            self.purge()
+
+    def purge(self) -> int:
+        """Zapiše zbrane zadetke, odstrani pretečene vnose in presežek nad max_entries."""
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, {}
+        service = self._service
+        ph = service._placeholder()
+        now = datetime.now().isoformat(timespec="seconds")
+        conn = service._conn()
+        try:
+            cur = conn.cursor()
+            if pending:
+                cur.executemany(
+                    f"UPDATE answer_cache SET hits = hits + {ph} WHERE cache_key = {ph}",
+                    [(count, key) for key, count in pending.items()],
+                )
+            cur.execute(f"DELETE FROM answer_cache WHERE expires_at <= {ph}", (now,))
+            expired = cur.rowcount or 0
+            cur.execute("SELECT COUNT(*) AS total FROM answer_cache")
+            excess = dict(cur.fetchone())["total"] - self.max_entries
+            evicted = 0
+            if excess > 0:
+                cur.execute(
+                    "DELETE FROM answer_cache WHERE cache_key IN ("
+                    f"SELECT cache_key FROM answer_cache ORDER BY hits ASC, created_at ASC LIMIT {ph})",
+                    (excess,),
+                )
+                evicted = cur.rowcount or 0
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self.stats["expired"] += expired
+            self.stats["evicted"] += evicted
+        return expired + evicted
+
+    def invalidate(self, kb_version: Optional[str] = None) -> int:
+        """Odstrani pretečene vnose in vnose drugih verzij KB (ali vse)."""
+        service = self._service
+        ph = service._placeholder()
+        now = datetime.now().isoformat(timespec="seconds")
+        conn = service._conn()
+        try:
+            cur = conn.cursor()
+            if kb_version is None:
+                cur.execute("DELETE FROM answer_cache")
+            else:
+                cur.execute(
+                    f"DELETE FROM answer_cache WHERE kb_version != {ph} OR expires_at <= {ph}", (kb_version, now)
+                )
+            removed = cur.rowcount or 0
+            conn.commit()
+        finally:
+            conn.close()
+        return removed
+
+    def clear(self) -> None:
+        self.invalidate()
+
+
+_CACHE: Optional[InMemoryAnswerCache | DatabaseAnswerCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_answer_cache() -> Optional[InMemoryAnswerCache | DatabaseAnswerCache]:
+    """En predpomnilnik na proces; backend izbere ANSWER_CACHE (memory|db|off)."""
+    global _CACHE
+    if ANSWER_CACHE_BACKEND in {"off", "none", "0", "false"}:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                if ANSWER_CACHE_BACKEND in {"db", "database", "sql", "sqlite"}:
+                    from app.services.reservation_service import get_reservation_service
+
+                    _CACHE = DatabaseAnswerCache(get_reservation_service)
+                else:
+                    _CACHE = InMemoryAnswerCache()
+                print(f"[CACHE] odgovori: {type(_CACHE).__name__}")
+    return _CACHE
+
+
+def cached_answer(question: str, language: str, kb_version: str) -> Optional[str]:
+    cache = get_answer_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(question, language, kb_version)
+    except Exception as exc:
+        print(f"[CACHE] napaka pri branju: {exc}")
+        return None
+
+
+def store_answer(question: str, language: str, kb_version: str, answer: str) -> None:
+    cache = get_answer_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(question, language, kb_version, answer)
+    except Exception as exc:
+        print(f"[CACHE] napaka pri zapisu: {exc}")
+
+
+def answer_cache_stats() -> dict[str, Any]:
+    cache = get_answer_cache()
+    if cache is None:
+        return {"backend": "off"}
+    stats: dict[str, Any] = {"backend": type(cache).__name__, **cache.stats}
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    if isinstance(cache, InMemoryAnswerCache):
+        stats["entries"] = len(cache)
+    return stats
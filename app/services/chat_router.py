@@ -1,12 +1,13 @@
+import asyncio
 import re
 import random
 import json
-import difflib
 import os
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Any, Optional, Tuple
-import uuid
+from contextvars import ContextVar
 import threading
 
 from fastapi import APIRouter
@@ -14,18 +15,29 @@ from fastapi.responses import StreamingResponse
 
 from app.models.chat import ChatRequest, ChatResponse
 from app.services.product_service import find_products
-from app.services.reservation_service import ReservationService
+from app.services.reservation_service import ROOMS, get_reservation_service
+from app.services.message_catalog import catalog_message, catalog_translate
+from app.services.answer_cache import cached_answer, store_answer
+from app.services.intent_classifier import classify_reservation
+from app.services.keyword_matcher import compile_keywords, keyword_group, keyword_groups, registered_keywords, scan_keywords
+from app.services.session_store import ChatSession, get_session_store
+from app.services.temporal_parser import MONTHS, NUMBER_WORDS, WEEKDAYS, fold, parse_booking_entities
+from app.services.typo_index import build_typo_index, correct_typos, correct_word, typo_vocabulary
 from app.services.email_service import send_guest_confirmation, send_admin_notification, send_custom_message
 from app.rag.rag_engine import rag_engine
+from app.rag.context_builder import build_bounded_context, count_tokens
 from app.rag.knowledge_base import (
     CONTACT,
+    KB_VERSION,
     KNOWLEDGE_CHUNKS,
     generate_llm_answer,
+    generate_llm_answer_async,
     search_knowledge,
     search_knowledge_scored,
 )
-from app.core.config import Settings
-from app.core.llm_client import get_llm_client
+from app.core.config import Settings, get_settings
+from app.core.llm_client import acreate_response, astream_response
+from app.core.metrics import defer_trace, finish_trace, set_trace_intent, span, start_trace, traced_stream
 from app.rag.chroma_service import answer_tourist_question, is_tourist_query
 from app.services.router_agent import route_message
 from app.services.executor_v2 import execute_decision
@@ -33,6 +45,8 @@ from app.services.executor_v2 import execute_decision
 router = APIRouter(prefix="/chat", tags=["chat"])
 USE_ROUTER_V2 = True
 USE_FULL_KB_LLM = True
+# en strukturiran LLM klic (namen + entitete + odgovor) namesto route -> answer -> prevod
+USE_ONE_SHOT_LLM = os.getenv("ONE_SHOT_LLM", "true").strip().lower() in {"1", "true", "yes", "on"}
 INQUIRY_RECIPIENT = os.getenv("INQUIRY_RECIPIENT", "satlermarko@gmail.com")
 SHORT_MODE = os.getenv("SHORT_MODE", "true").strip().lower() in {"1", "true", "yes", "on"}
 
@@ -162,38 +176,79 @@ try:
         FULL_KB_TEXT = "\n---\n".join(chunks)
 except Exception as exc:
     print(f"[KB] Full KB load failed: {exc}")
+# verzija baze znanja: ob spremembi knowledge.jsonl se zgradi nov začetek poziva, stari odgovori iz predpomnilnika ne veljajo več
+FULL_KB_VERSION = KB_VERSION
+
+# jezikovni del je na koncu, da je dolg začetek z bazo znanja enak za vse jezike
+FULL_KB_LANGUAGE_TAILS = {
+    "si": "Odgovarjaj prijazno, naravno in slovensko.\n",
+    "en": "You are the assistant for Turistična kmetija Urška. Respond in English.\n",
+    "de": "Du bist der Assistent für Turistična kmetija Urška. Antworte auf Deutsch.\n",
+}
 
-def _llm_system_prompt_full_kb(language: str = "si") -> str:
-    common = (
+
+FULL_KB_RULES = (
+    "Ne izmišljuj si podatkov.\n"
+    "Odgovarjaj kratko (2–4 stavke), razen če uporabnik izrecno želi podrobnosti.\n"
+    "Če nisi prepričan, postavi kratko pojasnitveno vprašanje.\n"
+    "Če uporabnik želi TOČEN meni, ga podaš samo, če je v podatkih.\n"
+    "Če ni podatka o točnem meniju ali sezoni, to povej in vprašaj za mesec/termin.\n"
+    "Če uporabnik želi rezervirati sobo ali mizo, OBVEZNO pokliči funkcijo "
+    "`reservation_intent` in nastavi ustrezen action.\n"
+)
+BOUNDED_KB_HEADER = (
+    "Ti si asistent Turistične kmetije Urška.\n"
+    "Ključna dejstva o kmetiji (veljajo vedno):\n"
+)
+# izbran kontekst v proračunu tokenov namesto celega KB (cel KB ostane fallback)
+USE_BOUNDED_CONTEXT = os.getenv("KB_BOUNDED_CONTEXT", "true").strip().lower() in {"1", "true", "yes", "on"}
+
+
+@lru_cache(maxsize=2)
+def _full_kb_prefix(kb_version: str) -> str:
+    """Začetek sistemskega poziva z vso bazo znanja; bajtno enak med klici (prompt caching)."""
+    return (
         "Ti si asistent Turistične kmetije Urška.\n"
         "Tukaj so VSE informacije o kmetiji:\n"
         f"{FULL_KB_TEXT}\n\n"
-        "Ne izmišljuj si podatkov.\n"
-        "Odgovarjaj kratko (2–4 stavke), razen če uporabnik izrecno želi podrobnosti.\n"
-        "Če nisi prepričan, postavi kratko pojasnitveno vprašanje.\n"
-        "Če uporabnik želi TOČEN meni, ga podaš samo, če je v podatkih.\n"
-        "Če ni podatka o točnem meniju ali sezoni, to povej in vprašaj za mesec/termin.\n"
-        "Če uporabnik želi rezervirati sobo ali mizo, OBVEZNO pokliči funkcijo "
-        "`reservation_intent` in nastavi ustrezen action.\n"
-    )
-    if language == "en":
-        return (
-            "You are the assistant for Turistična kmetija Urška. Respond in English.\n"
-            + common
-        )
-    if language == "de":
-        return (
-            "Du bist der Assistent für Turistična kmetija Urška. Antworte auf Deutsch.\n"
-            + common
-        )
-    return (
-        common
-        + "Odgovarjaj prijazno, naravno in slovensko.\n"
+        + FULL_KB_RULES
     )
 
-def _llm_route_reservation(message: str) -> dict:
-    client = get_llm_client()
-    settings = Settings()
+
+def _llm_system_prompt_full_kb(language: str = "si") -> str:
+    tail = FULL_KB_LANGUAGE_TAILS.get(language, FULL_KB_LANGUAGE_TAILS["si"])
+    return _full_kb_prefix(FULL_KB_VERSION) + tail
+
+
+def _full_kb_cache_key() -> str:
+    # isti ključ za vse zahteve z istim začetkom -> usmerjanje na isti predpomnilnik
+    return f"urska-full-kb-{FULL_KB_VERSION}"
+
+
+def _critical_facts() -> dict[str, str]:
+    # sortirano, da je besedilo (in s tem začetek poziva) vedno enako
+    return {key: INFO_RESPONSES[key] for key in sorted(CRITICAL_INFO_KEYS) if key in INFO_RESPONSES}
+
+
+def _knowledge_input(message: str, language: str = "si", extra: str = "") -> tuple[list[dict[str, str]], str]:
+    """
+    Sistemski del poziva in prompt_cache_key: kritična dejstva + izbrani odlomki
+    v proračunu tokenov, ob šibkem zadetku iskanja cel KB.
+    """
+    tail = FULL_KB_LANGUAGE_TAILS.get(language, FULL_KB_LANGUAGE_TAILS["si"])
+    if USE_BOUNDED_CONTEXT:
+        reserved = count_tokens(BOUNDED_KB_HEADER + FULL_KB_RULES + tail + extra + message)
+        with span("retrieval", "bounded_context"):
+            context = build_bounded_context(message, _critical_facts(), reserved_tokens=reserved)
+        if context is not None:
+            print(f"[KB] kontekst: {context.chunks} odlomkov, {context.tokens} tokenov (score {context.top_score:.2f})")
+            return [
+                {"role": "system", "content": f"{BOUNDED_KB_HEADER}{context.facts}\n\n{FULL_KB_RULES}{tail}"},
+                {"role": "developer", "content": f"Izbrani odlomki iz baze znanja:\n{context.passages}"},
+            ], f"urska-bounded-{FULL_KB_VERSION}"
+    return [{"role": "system", "content": _llm_system_prompt_full_kb(language)}], _full_kb_cache_key()
+
+def _route_request(message: str, settings: Settings) -> dict[str, Any]:
     tools = [
         {
             "type": "function",
@@ -215,22 +270,20 @@ def _llm_route_reservation(message: str) -> dict:
             },
         }
     ]
-    try:
-        response = client.responses.create(
-            model=getattr(settings, "openai_model", "gpt-4.1-mini"),
-            input=[
-                {"role": "system", "content": "Ugotovi, ali uporabnik želi rezervacijo sobe ali mize."},
-                {"role": "user", "content": message},
-            ],
-            tools=tools,
-            tool_choice={"type": "function", "name": "reservation_intent"},
-            temperature=0.2,
-            max_output_tokens=120,
-        )
-    except Exception as exc:
-        print(f"[LLM] reservation route error: {exc}")
-        return {"action": "NONE"}
+    return dict(
+        model=getattr(settings, "openai_model", "gpt-4.1-mini"),
+        input=[
+            {"role": "system", "content": "Ugotovi, ali uporabnik želi rezervacijo sobe ali mize."},
+            {"role": "user", "content": message},
+        ],
+        tools=tools,
+        tool_choice={"type": "function", "name": "reservation_intent"},
+        temperature=0.2,
+        max_output_tokens=120,
+    )
+
 
+def _parse_route(response: Any) -> dict:
     for block in getattr(response, "output", []) or []:
         for content in getattr(block, "content", []) or []:
             content_type = getattr(content, "type", "")
@@ -249,23 +302,158 @@ def _llm_route_reservation(message: str) -> dict:
                 return {"action": "NONE"}
     return {"action": "NONE"}
 
-def _llm_answer_full_kb(message: str, language: str = "si") -> str:
-    client = get_llm_client()
-    settings = Settings()
+
+async def _llm_route_reservation_async(message: str) -> dict:
     try:
-        response = client.responses.create(
-            model=getattr(settings, "openai_model", "gpt-4.1-mini"),
-            input=[
-                {"role": "system", "content": _llm_system_prompt_full_kb(language)},
-                {"role": "user", "content": message},
-            ],
-            max_output_tokens=450,
-            temperature=getattr(settings, "openai_temperature", 0.8),
-            top_p=0.9,
-        )
+        response = await acreate_response("route_reservation", kind="route", **_route_request(message, get_settings()))
     except Exception as exc:
-        print(f"[LLM] answer error: {exc}")
-        return "Oprostite, trenutno ne morem odgovoriti. Poskusite znova čez trenutek."
+        print(f"[LLM] reservation route error: {exc}")
+        return {"action": "NONE"}
+    return _parse_route(response)
+
+
+async def _route_reservation_async(message: str) -> dict:
+    """Lokalni klasifikator; LLM le, ko ta ni dovolj zanesljiv."""
+    with span("routing", "reservation"):
+        local = classify_reservation(message)
+        if local is not None:
+            print(f"[ROUTER_CLF] {local['action']} ({local['confidence']})")
+            return local
+        return await _llm_route_reservation_async(message)
+
+
+ONE_SHOT_INTENTS = ("BOOKING_ROOM", "BOOKING_TABLE", "INFO")
+ONE_SHOT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "enum": list(ONE_SHOT_INTENTS)},
+        "date": {"type": ["string", "null"], "description": "DD.MM.YYYY"},
+        "nights": {"type": ["integer", "null"]},
+        "people_count": {"type": ["integer", "null"]},
+        "time": {"type": ["string", "null"], "description": "HH:MM"},
+        "answer": {"type": "string"},
+    },
+    "required": ["intent", "date", "nights", "people_count", "time", "answer"],
+    "additionalProperties": False,
+}
+ONE_SHOT_INSTRUCTIONS = (
+    "Namesto klica funkcije vrni JSON po shemi.\n"
+    "intent: BOOKING_ROOM ali BOOKING_TABLE, če gost želi rezervirati sobo ali mizo, sicer INFO.\n"
+    "date, nights, people_count, time: podatki za rezervacijo iz sporočila (null, če jih ni).\n"
+    "answer: pri INFO tvoj odgovor gostu (v jeziku gosta), pri rezervaciji prazen niz."
+)
+
+
+def _one_shot_request(message: str, settings: Settings, language: str = "si") -> dict[str, Any]:
+    knowledge, cache_key = _knowledge_input(message, language, extra=ONE_SHOT_INSTRUCTIONS)
+    return dict(
+        model=getattr(settings, "openai_model", "gpt-4.1-mini"),
+        input=[
+            *knowledge,
+            {"role": "developer", "content": ONE_SHOT_INSTRUCTIONS},
+            {"role": "user", "content": message},
+        ],
+        text={"format": {"type": "json_schema", "name": "chat_turn", "schema": ONE_SHOT_SCHEMA, "strict": True}},
+        prompt_cache_key=cache_key,
+        max_output_tokens=500,
+        temperature=getattr(settings, "openai_temperature", 0.8),
+        top_p=0.9,
+    )
+
+
+def _parse_one_shot(response: Any) -> Optional[dict]:
+    raw = getattr(response, "output_text", None) or _full_kb_text(response)
+    try:
+        result = json.loads(raw)
+    except (TypeError, json.JSONDecodeError):
+        print(f"[LLM] one-shot: neveljaven JSON: {str(raw)[:120]}")
+        return None
+    if not isinstance(result, dict) or result.get("intent") not in ONE_SHOT_INTENTS:
+        return None
+    if result["intent"] == "INFO" and not (result.get("answer") or "").strip():
+        return None
+    return result
+
+
+async def _llm_one_shot_async(message: str, language: str = "si") -> Optional[dict]:
+    """Namen, entitete in (pri INFO) odgovor v enem klicu; None -> stara pot."""
+    try:
+        response = await acreate_response("one_shot", **_one_shot_request(message, get_settings(), language))
+    except Exception as exc:
+        print(f"[LLM] one-shot error: {exc}")
+        return None
+    return _parse_one_shot(response)
+
+
+def one_shot_decision(result: dict, state: dict) -> dict[str, Any]:
+    """Rezultat one-shot klica v obliki odločitve routerja V2 (za execute_decision)."""
+    entities = {
+        key: result.get(key)
+        for key in ("date", "nights", "people_count", "time")
+        if result.get(key) not in (None, "")
+    }
+    return {
+        "routing": {"intent": result["intent"], "confidence": 1.0, "is_interrupt": False},
+        "context": {
+            "info_key": None,
+            "product_category": None,
+            "needs_soft_sell": False,
+            "answer": (result.get("answer") or "").strip() or None,
+        },
+        "entities": entities,
+        "meta": {"has_active_booking": state.get("step") is not None, "booking_step": state.get("step"), "source": "one_shot"},
+    }
+
+
+# polje one-shot entitete -> ključ v stanju rezervacije
+ONE_SHOT_ENTITY_FIELDS = {"date": "date", "nights": "nights", "people_count": "people", "time": "time"}
+
+
+def _one_shot_entity(key: str, value: Any) -> Optional[str | int]:
+    """Preveri vrednost iz modela (DD.MM.YYYY, HH:MM, smiselno število) ali None."""
+    if value in (None, ""):
+        return None
+    try:
+        if key == "date":
+            return datetime.strptime(str(value), "%d.%m.%Y").strftime("%d.%m.%Y")
+        if key == "time":
+            return datetime.strptime(str(value), "%H:%M").strftime("%H:%M")
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if 0 < number <= 50 else None
+
+
+def seed_booking_entities(message: str, state: dict, entities: dict[str, Any]) -> None:
+    """Entitete one-shot klica v stanje rezervacije, le kjer pravilni razčlenjevalnik ni našel ničesar."""
+    parsed = parse_booking_entities(message)
+    found = {"date": parsed.date, "nights": parsed.nights, "people_count": parsed.total_people, "time": parsed.time}
+    for key, state_key in ONE_SHOT_ENTITY_FIELDS.items():
+        value = _one_shot_entity(key, entities.get(key))
+        if value is not None and found[key] is None and state.get(state_key) is None:
+            state[state_key] = value
+
+
+def _full_kb_request(message: str, settings: Settings, language: str = "si") -> dict[str, Any]:
+    knowledge, cache_key = _knowledge_input(message, language)
+    return dict(
+        model=getattr(settings, "openai_model", "gpt-4.1-mini"),
+        input=[
+            *knowledge,
+            {"role": "user", "content": message},
+        ],
+        prompt_cache_key=cache_key,
+        max_output_tokens=450,
+        temperature=getattr(settings, "openai_temperature", 0.8),
+        top_p=0.9,
+    )
+
+
+FULL_KB_EMPTY_ANSWER = "Seveda, z veseljem pomagam. Kaj vas zanima?"
+FULL_KB_ERROR_ANSWER = "Oprostite, trenutno ne morem odgovoriti. Poskusite znova čez trenutek."
+
+
+def _full_kb_text(response: Any) -> str:
     answer = getattr(response, "output_text", None)
     if not answer:
         outputs = []
@@ -275,7 +463,22 @@ def _llm_answer_full_kb(message: str, language: str = "si") -> str:
                 if text:
                     outputs.append(text)
         answer = "\n".join(outputs).strip()
-    return answer or "Seveda, z veseljem pomagam. Kaj vas zanima?"
+    return answer or FULL_KB_EMPTY_ANSWER
+
+
+async def _llm_answer_full_kb_async(message: str, language: str = "si") -> str:
+    cached = cached_answer(message, language, FULL_KB_VERSION)
+    if cached:
+        return cached
+    try:
+        response = await acreate_response("full_kb_answer", **_full_kb_request(message, get_settings(), language))
+    except Exception as exc:
+        print(f"[LLM] answer error: {exc}")
+        return FULL_KB_ERROR_ANSWER
+    answer = _full_kb_text(response)
+    if answer != FULL_KB_EMPTY_ANSWER:
+        store_answer(message, language, FULL_KB_VERSION, answer)
+    return answer
 
 
 def _stream_text_chunks(text: str, chunk_size: int = 80):
@@ -283,65 +486,71 @@ def _stream_text_chunks(text: str, chunk_size: int = 80):
         yield text[i : i + chunk_size]
 
 
-def _llm_answer_full_kb_stream(message: str, settings: Settings, language: str = "si"):
-    client = get_llm_client()
-    try:
-        stream = client.responses.create(
-            model=getattr(settings, "openai_model", "gpt-4.1-mini"),
-            input=[
-                {"role": "system", "content": _llm_system_prompt_full_kb(language)},
-                {"role": "user", "content": message},
-            ],
-            max_output_tokens=450,
-            temperature=getattr(settings, "openai_temperature", 0.8),
-            top_p=0.9,
-            stream=True,
-        )
-    except Exception as exc:
-        fallback = "Oprostite, trenutno ne morem odgovoriti. Poskusite znova čez trenutek."
-        print(f"[LLM] stream error: {exc}")
-        for chunk in _stream_text_chunks(fallback):
-            yield chunk
-        return fallback
+async def _astream_text_chunks(text: str, chunk_size: int = 80):
+    for chunk in _stream_text_chunks(text, chunk_size):
+        yield chunk
+
+
+def _stream_delta(event: Any) -> str:
+    event_type = getattr(event, "type", "")
+    if event_type == "response.output_text.delta":
+        return getattr(event, "delta", "") or ""
+    if event_type == "response.error":
+        error_message = getattr(getattr(event, "error", None), "message", "")
+        if error_message:
+            print(f"[LLM] stream error event: {error_message}")
+    return ""
+
 
+async def _llm_answer_full_kb_stream_async(message: str, settings: Settings, language: str = "si"):
+    cached = cached_answer(message, language, FULL_KB_VERSION)
+    if cached:
+        for chunk in _stream_text_chunks(cached):
+            yield chunk
+        return
+    started = False
     collected: list[str] = []
-    for event in stream:
-        event_type = getattr(event, "type", "")
-        if event_type == "response.output_text.delta":
-            delta = getattr(event, "delta", "")
+    try:
+        async for event in astream_response("full_kb_stream", **_full_kb_request(message, settings, language)):
+            delta = _stream_delta(event)
             if delta:
+                started = True
                 collected.append(delta)
                 yield delta
-        elif event_type == "response.error":
-            error_message = getattr(getattr(event, "error", None), "message", "")
-            if error_message:
-                print(f"[LLM] stream error event: {error_message}")
-    final_text = "".join(collected).strip()
-    return final_text or "Seveda, z veseljem pomagam. Kaj vas zanima?"
-
-def _llm_answer(question: str, history: list[dict[str, str]]) -> Optional[str]:
+        # v predpomnilnik gre le celoten (neprekinjen) odgovor
+        if collected:
+            store_answer(message, language, FULL_KB_VERSION, "".join(collected).strip())
+    except Exception as exc:
+        print(f"[LLM] stream error: {exc}")
+        if not started:
+            for chunk in _stream_text_chunks(FULL_KB_ERROR_ANSWER):
+                yield chunk
+
+
+async def _llm_answer_async(question: str, history: list[dict[str, str]], language: str = "si") -> Optional[str]:
     try:
-        return generate_llm_answer(question, history=history)
+        return await generate_llm_answer_async(question, history=history, language=language)
     except Exception as exc:
         print(f"[LLM] Failed to answer: {exc}")
         return None
 
 
-def get_info_response(key: str, question: str | None = None) -> str:
+def get_info_response(key: str, question: str | None = None, language: str = "si") -> str:
+    """Info odgovor v jeziku gosta: LLM odgovori neposredno, fiksni iz kataloga."""
     if key.startswith("topic:"):
         topic_key = key.split(":", 1)[1]
         if topic_key in _TOPIC_RESPONSES:
-            return maybe_shorten_response(_TOPIC_RESPONSES[topic_key])
+            return maybe_translate(maybe_shorten_response(_TOPIC_RESPONSES[topic_key]), language)
     if question and USE_FULL_KB_LLM:
         try:
-            return generate_llm_answer(question)
+            return generate_llm_answer(question, language=language)
         except Exception as exc:
             print(f"[LLM] Failed to answer info: {exc}")
     if key in INFO_RESPONSES_VARIANTS:
         variants = INFO_RESPONSES_VARIANTS[key]
         chosen = min(variants, key=len) if SHORT_MODE else random.choice(variants)
-        return maybe_shorten_response(chosen)
-    return maybe_shorten_response(INFO_RESPONSES.get(key, "Kako vam lahko pomagam?"))
+        return maybe_translate(maybe_shorten_response(chosen), language)
+    return maybe_translate(maybe_shorten_response(INFO_RESPONSES.get(key, "Kako vam lahko pomagam?")), language)
 
 
 def maybe_shorten_response(text: str) -> str:
@@ -361,7 +570,8 @@ def maybe_shorten_response(text: str) -> str:
 
 # Mini RAG fallback za neznane info/product
 def get_mini_rag_answer(question: str) -> Optional[str]:
-    chunks = search_knowledge(question, top_k=1)
+    with span("retrieval", "mini_rag"):
+        chunks = search_knowledge(question, top_k=1)
     if not chunks:
         return None
     chunk = chunks[0]
@@ -421,7 +631,8 @@ def _format_semantic_snippet(chunk: Any) -> str:
 
 
 def semantic_info_answer(question: str) -> Optional[str]:
-    scored = search_knowledge_scored(question, top_k=1)
+    with span("retrieval", "semantic"):
+        scored = search_knowledge_scored(question, top_k=1)
     if not scored:
         return None
     score, chunk = scored[0]
@@ -457,12 +668,50 @@ RESERVATION_PENDING_MESSAGE = """
 ⚠️ Preverite tudi **SPAM/VSILJENO POŠTO**.
 """
 
+# Fiksni odgovori v pogovoru (slovenski izvor za katalog sporočil, glej message_catalog)
+STATIC_REPLIES = {
+    "switch_topic": "Seveda — zamenjamo temo. Kako vam lahko pomagam?",
+    "inquiry_start": "Super, zabeležim povpraševanje. Do kdaj bi to potrebovali? (datum/rok ali 'ni pomembno')",
+    "followup_email_saved": "Hvala! 📧 Vaš elektronski naslov sem si zabeležil. Odgovoril vam bom v najkrajšem možnem času.",
+    "clarify_reservation": "Želite rezervirati **sobo** ali **mizo**?",
+    "clarify_inquiry": (
+        "Ali želite, da zabeležim **povpraševanje/naročilo**? "
+        "Če da, prosim napišite **količino** in **rok**."
+    ),
+    "reservation_cancelled": "OK, prekinil sem rezervacijo.",
+    "inquiry_consent": (
+        "Žal nimam dovolj informacij. "
+        "Lahko zabeležim povpraševanje in ga posredujem ekipi. "
+        "Želite to? (da/ne)"
+    ),
+    "booking_continue_header": "📝 **Nadaljujemo z rezervacijo:**",
+    "continue_hint": "Če želiš nadaljevati rezervacijo, napiši 'nadaljuj'.",
+    "offer_prompt": "Želite, da pripravim **ponudbo**?",
+    "bulk_order": "Za večja naročila nam pišite na urska@kmetija-urska.si, da uskladimo količine in prevzem.",
+    "room_info": """Seveda! 😊 Imamo tri prijetne družinske sobe:
+
+🛏️ **Soba ALJAŽ** - soba z balkonom (2+2 osebi)
+🛏️ **Soba JULIJA** - družinska soba z balkonom (2 odrasla + 2 otroka)  
+🛏️ **Soba ANA** - družinska soba z dvema spalnicama (2 odrasla + 2 otroka)
+
+**Cena**: 50€/osebo/noč z zajtrkom
+**Večerja**: dodatnih 25€/osebo
+
+Sobe so klimatizirane, Wi-Fi je brezplačen. Prijava ob 14:00, odjava ob 10:00.
+
+Bi želeli rezervirati? Povejte mi datum in število oseb! 🗓️""",
+}
+
+
+def static_reply(key: str, language: str = "si") -> str:
+    """Fiksni odgovor v jeziku gosta (iz kataloga; slovensko, če prevoda ni)."""
+    return catalog_message(f"reply.{key}", language, STATIC_REPLIES[key]) or STATIC_REPLIES[key]
+
 
 class ChatRequestWithSession(ChatRequest):
     session_id: Optional[str] = None
 
 
-last_wine_query: Optional[str] = None
 SESSION_TIMEOUT_HOURS = 48
 PRODUCT_STEMS = {
     "salam",
@@ -618,7 +867,7 @@ INFO_FOLLOWUP_PHRASES = {
     "še kaj drugega",
 }
 
-reservation_service = ReservationService()
+reservation_service = get_reservation_service()
 
 # Osnovni podatki o kmetiji
 FARM_INFO = {
@@ -833,33 +1082,36 @@ def _blank_inquiry_state() -> dict[str, Optional[str]]:
     }
 
 
-reservation_states: dict[str, dict[str, Optional[str | int]]] = {}
-inquiry_states: dict[str, dict[str, Optional[str]]] = {}
+# pogovorne seje (zgodovina, zadnja vprašanja, stanje rezervacije) so v shrambi sej;
+# seja trenutnega zahtevka je v contextvar, da jo vidijo tudi pomožne funkcije
+session_store = get_session_store()
+_current_session: ContextVar[Optional[ChatSession]] = ContextVar("chat_session", default=None)
+
+
+def get_session(session_id: Optional[str] = None) -> ChatSession:
+    current = _current_session.get()
+    if current is not None and (session_id is None or current.session_id == session_id):
+        return current
+    return session_store.get(session_id or "default")
 
 
 def get_reservation_state(session_id: str) -> dict[str, Optional[str | int]]:
-    if session_id not in reservation_states:
-        reservation_states[session_id] = _blank_reservation_state()
-    return reservation_states[session_id]
+    session = get_session(session_id)
+    if not session.reservation:
+        session.reservation.update(_blank_reservation_state())
+    return session.reservation
 
 
 def get_inquiry_state(session_id: str) -> dict[str, Optional[str]]:
-    if session_id not in inquiry_states:
-        inquiry_states[session_id] = _blank_inquiry_state()
-    return inquiry_states[session_id]
+    session = get_session(session_id)
+    if not session.inquiry:
+        session.inquiry.update(_blank_inquiry_state())
+    return session.inquiry
 
 
 def reset_inquiry_state(state: dict[str, Optional[str]]) -> None:
     state.update(_blank_inquiry_state())
 
-last_product_query: Optional[str] = None
-last_info_query: Optional[str] = None
-last_menu_query: bool = False
-conversation_history: list[dict[str, str]] = []
-last_shown_products: list[str] = []
-last_interaction: Optional[datetime] = None
-unknown_question_state: dict[str, dict[str, Any]] = {}
-chat_session_id: str = str(uuid.uuid4())[:8]
 MENU_INTROS = [
     "Hej! Poglej, kaj kuhamo ta vikend:",
     "Z veseljem povem, kaj je na meniju:",
@@ -870,7 +1122,7 @@ menu_intro_index = 0
 
 def answer_wine_question(message: str) -> str:
     """Odgovarja na vprašanja o vinih SAMO iz WINE_LIST, z upoštevanjem followupov."""
-    global last_shown_products
+    last_shown_products = get_session().last_shown_products
 
     if not any(WINE_LIST.values()):
         return (
@@ -1029,9 +1281,36 @@ def answer_weekly_menu(message: str) -> str:
     return "\n".join(lines)
 
 
+INTENT_KEYWORDS = keyword_groups(
+    "intent",
+    {
+        "rezerv": ["rezerv", "rezer", "book", "buking", "reserve", "reservation"],
+        "soba": ["sobo", "sobe", "soba", "room"],
+        "miza": ["mizo", "mize", "miza", "table"],
+        "nocitev": ["nočitev", "nocitev"],
+        "start": RESERVATION_START_PHRASES,
+        "sobe_info": ["sobe", "soba", "sobo", "nastanitev", "prenočitev", "nočitev nočitve", "rooms", "room", "accommodation"],
+        "rezerv_book": ["rezerv", "book"],
+        "wine": WINE_KEYWORDS,
+        "wine_followup": ["še", "še kakšn", "še kater", "kaj pa", "drug"],
+        "price": PRICE_KEYWORDS,
+        "stay": ["sob", "nočitev", "nocitev", "noč", "spanje", "bivanje"],
+        "weekly": WEEKLY_KEYWORDS,
+        "farm_info": FARM_INFO_KEYWORDS,
+        "product": PRODUCT_STEMS,
+        "product_followup": PRODUCT_FOLLOWUP_PHRASES,
+        "info": INFO_KEYWORDS,
+        "food_general": FOOD_GENERAL_KEYWORDS,
+        "help": HELP_KEYWORDS,
+    },
+)
+
+
 def detect_intent(message: str, state: dict[str, Optional[str | int]]) -> str:
-    global last_product_query, last_wine_query
+    session = get_session()
     lower_message = message.lower()
+    hits = scan_keywords(correct_typos(lower_message))
+    keys = INTENT_KEYWORDS
 
     # 1) nadaljevanje rezervacije ima vedno prednost
     if state["step"] is not None:
@@ -1050,17 +1329,14 @@ def detect_intent(message: str, state: dict[str, Optional[str | int]]) -> str:
         return "room_info"
 
     # Rezervacija - fuzzy match (tudi s tipkarskimi napakami)
-    rezerv_patterns = ["rezerv", "rezev", "rezer", "book", "buking", "bokking", "reserve", "reservation"]
-    soba_patterns = ["sobo", "sobe", "soba", "room"]
-    miza_patterns = ["mizo", "mize", "miza", "table"]
-    has_rezerv = any(p in lower_message for p in rezerv_patterns)
-    has_soba = any(p in lower_message for p in soba_patterns)
-    has_miza = any(p in lower_message for p in miza_patterns)
-    if has_rezerv and (has_soba or has_miza or "nočitev" in lower_message or "nocitev" in lower_message):
+    has_rezerv = hits.has(keys["rezerv"])
+    has_soba = hits.has(keys["soba"])
+    has_miza = hits.has(keys["miza"])
+    if has_rezerv and (has_soba or has_miza or hits.has(keys["nocitev"])):
         return "reservation"
     if is_reservation_typo(message) and (has_soba or has_miza):
         return "reservation"
-    if any(phrase in lower_message for phrase in RESERVATION_START_PHRASES):
+    if hits.has(keys["start"]):
         return "reservation"
 
     # goodbye/hvala
@@ -1072,86 +1348,65 @@ def detect_intent(message: str, state: dict[str, Optional[str | int]]) -> str:
         return "menu"
 
     # SOBE - posebej pred rezervacijo
-    sobe_keywords = ["sobe", "soba", "sobo", "nastanitev", "prenočitev", "nočitev nočitve", "rooms", "room", "accommodation"]
-    if any(kw in lower_message for kw in sobe_keywords) and "rezerv" not in lower_message and "book" not in lower_message:
+    if hits.has(keys["sobe_info"]) and not hits.has(keys["rezerv_book"]):
         return "room_info"
 
     # vino intent
-    if any(keyword in lower_message for keyword in WINE_KEYWORDS):
+    if hits.has(keys["wine"]):
         return "wine"
 
     # vino followup (če je bila prejšnja interakcija o vinih)
-    if last_wine_query and any(
-        phrase in lower_message for phrase in ["še", "še kakšn", "še kater", "kaj pa", "drug"]
-    ):
+    if session.last_wine_query and hits.has(keys["wine_followup"]):
         return "wine_followup"
 
     # cene sob
-    if any(word in lower_message for word in PRICE_KEYWORDS):
-        if any(word in lower_message for word in ["sob", "nočitev", "nocitev", "noč", "spanje", "bivanje"]):
-            return "room_pricing"
+    if hits.has(keys["price"]) and hits.has(keys["stay"]):
+        return "room_pricing"
 
     # tedenska ponudba (degustacijski meniji) – pred jedilnikom
-    if any(word in lower_message for word in WEEKLY_KEYWORDS):
+    if hits.has(keys["weekly"]):
         return "weekly_menu"
     if re.search(r"\b[4-7]\s*-?\s*hodn", lower_message):
         return "weekly_menu"
 
     # 3) info o kmetiji / kontakt
-    if any(keyword in lower_message for keyword in FARM_INFO_KEYWORDS):
+    if hits.has(keys["farm_info"]):
         return "farm_info"
 
     if is_tourist_query(message):
         return "tourist_info"
 
     # 3) produktna vprašanja (salama, bunka, marmelada, paket, vino …)
-    if any(stem in lower_message for stem in PRODUCT_STEMS):
+    if hits.has(keys["product"]):
         return "product"
 
     # 4) kratko nadaljevanje produktnega vprašanja
-    if last_product_query and any(
-        phrase in lower_message for phrase in PRODUCT_FOLLOWUP_PHRASES
-    ):
+    if session.last_product_query and hits.has(keys["product_followup"]):
         return "product_followup"
 
     # 5) info vprašanja (kje, soba, nočitve …)
-    if any(keyword in lower_message for keyword in INFO_KEYWORDS):
+    if hits.has(keys["info"]):
         return "info"
     # 6) splošna hrana (ne jedilnik)
-    if any(word in lower_message for word in FOOD_GENERAL_KEYWORDS) and not is_menu_query(message):
+    if hits.has(keys["food_general"]) and not is_menu_query(message):
         return "food_general"
     # 7) pomoč
-    if any(word in lower_message for word in HELP_KEYWORDS):
+    if hits.has(keys["help"]):
         return "help"
     # 9) tedenska ponudba
-    if any(word in lower_message for word in WEEKLY_KEYWORDS):
+    if hits.has(keys["weekly"]):
         return "weekly_menu"
     return "default"
 
 
-def detect_info_intent(message: str) -> Optional[str]:
-    """
-    Detecta INFO intent BREZ LLM.
-    Vrne ključ iz INFO_RESPONSES ali None če ni info vprašanje.
-    """
-    text = message.lower().strip()
-
-    # Odpiralni čas
-    if any(w in text for w in ["kdaj ste odprti", "odpiralni", "delovni čas", "kdaj odprete"]):
-        return "odpiralni_cas"
-
-    # Zajtrk
-    if "zajtrk" in text and "večerj" not in text:
-        return "zajtrk"
-
-    # Večerja (info, ne rezervacija)
-    if any(w in text for w in ["koliko stane večerja", "cena večerje"]):
-        return "vecerja"
-
-    # Cena sob / nočitev
-    if any(
-        w in text
-        for w in [
+INFO_INTENT_KEYWORDS = keyword_groups(
+    "info",
+    {
+        "odpiralni_cas": ["kdaj ste odprti", "odpiralni", "delovni čas", "kdaj odprete"],
+        "zajtrk": ["zajtrk"],
+        "vecerj": ["večerj"],
+        "vecerja": ["koliko stane večerja", "cena večerje"],
+        "cena_sobe": [
             "cena sobe",
             "cena nočit",
             "cena nocit",
@@ -1160,65 +1415,20 @@ def detect_info_intent(message: str) -> Optional[str]:
             "cenik",
             "koliko stane soba",
             "koliko stane nočitev",
-        ]
-    ):
-        return "cena_sobe"
-
-    # Sobe info
-    if any(w in text for w in ["koliko sob", "kakšne sobe", "koliko oseb v sobo", "kolko oseb v sobo", "kapaciteta sob"]):
-        return "sobe"
-
-    # Klima
-    if "klim" in text:
-        return "klima"
-
-    # WiFi
-    if "wifi" in text or "wi-fi" in text or "internet" in text:
-        return "wifi"
-
-    # Prijava/odjava
-    if any(w in text for w in ["prijava", "odjava", "check in", "check out"]):
-        return "prijava_odjava"
-
-    # Parking
-    if "parkir" in text:
-        return "parking"
-
-    # Živali
-    if any(w in text for w in ["pes", "psa", "psi", "psov", "mačk", "žival", "ljubljenč", "kuža", "kuz", "dog"]):
-        return "zivali"
-
-    # Plačilo
-    if any(w in text for w in ["plačilo", "kartic", "gotovina"]):
-        return "placilo"
-
-    # Kontakt / telefon
-    if any(
-        w in text
-        for w in ["telefon", "telefonsko", "številka", "stevilka", "gsm", "mobitel", "mobile", "phone"]
-    ):
-        return "kontakt"
-
-    # Min nočitve
-    if any(w in text for w in ["minimal", "najmanj noči", "najmanj nočitev", "min nočitev"]):
-        return "min_nocitve"
-
-    # Kapaciteta miz
-    if any(w in text for w in ["koliko miz", "kapaciteta"]):
-        return "kapaciteta_mize"
-
-    # Alergije
-    if any(w in text for w in ["alergij", "gluten", "lakto", "vegan"]):
-        return "alergije"
-
-    # Vina / vinska karta
-    if any(w in text for w in ["vino", "vina", "vinsko", "vinska", "wine", "wein", "vinci"]):
-        return "vina"
-
-    # Izleti / turizem
-    if any(
-        w in text
-        for w in [
+        ],
+        "sobe": ["koliko sob", "kakšne sobe", "koliko oseb v sobo", "kolko oseb v sobo", "kapaciteta sob"],
+        "klima": ["klim"],
+        "wifi": ["wifi", "wi-fi", "internet"],
+        "prijava_odjava": ["prijava", "odjava", "check in", "check out"],
+        "parking": ["parkir"],
+        "zivali": ["pes", "psa", "psi", "psov", "mačk", "žival", "ljubljenč", "kuža", "kuz", "dog"],
+        "placilo": ["plačilo", "kartic", "gotovina"],
+        "kontakt": ["telefon", "telefonsko", "številka", "stevilka", "gsm", "mobitel", "mobile", "phone"],
+        "min_nocitve": ["minimal", "najmanj noči", "najmanj nočitev", "min nočitev"],
+        "kapaciteta_mize": ["koliko miz", "kapaciteta"],
+        "alergije": ["alergij", "gluten", "lakto", "vegan"],
+        "vina": ["vino", "vina", "vinsko", "vinska", "wine", "wein", "vinci"],
+        "turizem": [
             "izlet",
             "izleti",
             "znamenitost",
@@ -1236,38 +1446,19 @@ def detect_info_intent(message: str) -> Optional[str]:
             "bistriški",
             "ščrno jezero",
             "šumik",
-        ]
-    ):
-        return "turizem"
-
-    # Izposoja koles
-    if any(w in text for w in ["kolo", "koles", "kolesar", "bike", "e-kolo", "ekolo", "bicikl"]):
-        return "kolesa"
-
-    # Slap Skalca
-    if "skalca" in text or ("slap" in text and "skalc" in text):
-        return "skalca"
-
-    # Darilni boni
-    if "darilni bon" in text or ("bon" in text and "daril" in text):
-        return "darilni_boni"
-
-    # Vikend ponudba / jedilnik
-    if ("vikend" in text or "ponudba" in text) and any(
-        w in text for w in ["vikend", "ponudba", "kosilo", "meni", "menu", "jedil"]
-    ):
-        return "jedilnik"
-
-    # Dodatno: jedilnik / meni
-    if any(
-        w in text
-        for w in [
+        ],
+        "kolesa": ["kolo", "koles", "kolesar", "bike", "e-kolo", "ekolo", "bicikl"],
+        "skalca": ["skalca"],
+        "slap": ["slap"],
+        "skalc": ["skalc"],
+        "darilni_bon": ["darilni bon"],
+        "bon": ["bon"],
+        "daril": ["daril"],
+        "vikend_ponudba": ["vikend", "ponudba"],
+        "vikend_meni": ["vikend", "ponudba", "kosilo", "meni", "menu", "jedil"],
+        "jedilnik": [
             "jedilnik",
-            "jedilnk",
-            "jedilnku",
-            "jedlnik",
             "meni",
-            "menij",
             "meniju",
             "menu",
             "kaj imate za jest",
@@ -1276,22 +1467,71 @@ def detect_info_intent(message: str) -> Optional[str]:
             "kaj je za kosilo",
             "kaj je za večerjo",
             "kaj je za vecerjo",
-            "koslo",
-        ]
+        ],
+        "druzina": ["družin", "druzina", "druzino"],
+        "kmetija": ["kmetij", "kmetijo"],
+        "gibanica": ["gibanica"],
+        "izdelki": ["izdelk", "trgovin", "katalog", "prodajate"],
+    },
+)
+
+
+def detect_info_intent(message: str) -> Optional[str]:
+    """
+    Detecta INFO intent BREZ LLM.
+    Vrne ključ iz INFO_RESPONSES ali None če ni info vprašanje.
+    """
+    hits = scan_keywords(correct_typos(message.lower().strip()))
+    keys = INFO_INTENT_KEYWORDS
+
+    # Odpiralni čas
+    if hits.has(keys["odpiralni_cas"]):
+        return "odpiralni_cas"
+
+    # Zajtrk
+    if hits.has(keys["zajtrk"]) and not hits.has(keys["vecerj"]):
+        return "zajtrk"
+
+    # Večerja (info, ne rezervacija), cena sob / nočitev, sobe info, klima, WiFi,
+    # prijava/odjava, parking, živali, plačilo, kontakt, min nočitve, kapaciteta miz,
+    # alergije, vina, izleti / turizem, izposoja koles
+    for key in (
+        "vecerja",
+        "cena_sobe",
+        "sobe",
+        "klima",
+        "wifi",
+        "prijava_odjava",
+        "parking",
+        "zivali",
+        "placilo",
+        "kontakt",
+        "min_nocitve",
+        "kapaciteta_mize",
+        "alergije",
+        "vina",
+        "turizem",
+        "kolesa",
     ):
-        return "jedilnik"
+        if hits.has(keys[key]):
+            return key
 
-    if any(w in text for w in ["družin", "druzina", "druzino"]):
-        return "druzina"
+    # Slap Skalca
+    if hits.has(keys["skalca"]) or (hits.has(keys["slap"]) and hits.has(keys["skalc"])):
+        return "skalca"
 
-    if "kmetij" in text or "kmetijo" in text:
-        return "kmetija"
+    # Darilni boni
+    if hits.has(keys["darilni_bon"]) or (hits.has(keys["bon"]) and hits.has(keys["daril"])):
+        return "darilni_boni"
 
-    if "gibanica" in text:
-        return "gibanica"
+    # Vikend ponudba / jedilnik
+    if hits.has(keys["vikend_ponudba"]) and hits.has(keys["vikend_meni"]):
+        return "jedilnik"
 
-    if any(w in text for w in ["izdelk", "trgovin", "katalog", "prodajate"]):
-        return "izdelki"
+    # Dodatno: jedilnik / meni, družina, kmetija, gibanica, izdelki
+    for key in ("jedilnik", "druzina", "kmetija", "gibanica", "izdelki"):
+        if hits.has(keys[key]):
+            return key
 
     return None
 
@@ -1324,34 +1564,53 @@ def get_product_response(key: str) -> str:
     return PRODUCT_RESPONSES["izdelki_splosno"][0]
 
 
-def get_booking_continuation(step: str, state: dict) -> str:
+BOOKING_CONTINUATIONS = {
+    "awaiting_date": "Za kateri **datum** bi rezervirali?",
+    "awaiting_nights": "Koliko **nočitev**?",
+    "awaiting_people": "Za koliko **oseb**?",
+    "awaiting_kids": "Koliko je **otrok** in koliko so stari?",
+    "awaiting_kids_info": "Koliko je **otrok** in koliko so stari?",
+    "awaiting_kids_ages": "Koliko so stari **otroci**?",
+    "awaiting_room_location": "Katero **sobo** želite? (ALJAŽ, JULIJA, ANA)",
+    "awaiting_name": "Vaše **ime in priimek**?",
+    "awaiting_phone": "Vaša **telefonska številka**?",
+    "awaiting_email": "Vaš **e-mail**?",
+    "awaiting_dinner": "Želite **večerje**? (Da/Ne)",
+    "awaiting_dinner_count": "Za koliko oseb želite **večerje**?",
+    "awaiting_note": "Želite še kaj **sporočiti**? (ali 'ne')",
+    "awaiting_time": "Ob kateri **uri**?",
+    "awaiting_table_date": "Za kateri **datum** bi rezervirali mizo?",
+    "awaiting_table_time": "Ob kateri **uri** bi prišli?",
+    "awaiting_table_people": "Za koliko **oseb**?",
+    "awaiting_table_location": "Katero **jedilnico** želite? (Pri peči / Pri vrtu)",
+    "awaiting_table_event_type": "Kakšen je **tip dogodka**?",
+    "awaiting_confirmation": "Potrdite rezervacijo? (da/ne)",
+}
+BOOKING_CONTINUATION_DEFAULT = "Lahko nadaljujemo z rezervacijo?"
+
+
+def get_booking_continuation(step: str, state: dict, language: str = "si") -> str:
     """Vrne navodilo za nadaljevanje glede na trenutni korak."""
-    continuations = {
-        "awaiting_date": "Za kateri **datum** bi rezervirali?",
-        "awaiting_nights": "Koliko **nočitev**?",
-        "awaiting_people": "Za koliko **oseb**?",
-        "awaiting_kids": "Koliko je **otrok** in koliko so stari?",
-        "awaiting_kids_info": "Koliko je **otrok** in koliko so stari?",
-        "awaiting_kids_ages": "Koliko so stari **otroci**?",
-        "awaiting_room_location": "Katero **sobo** želite? (ALJAŽ, JULIJA, ANA)",
-        "awaiting_name": "Vaše **ime in priimek**?",
-        "awaiting_phone": "Vaša **telefonska številka**?",
-        "awaiting_email": "Vaš **e-mail**?",
-        "awaiting_dinner": "Želite **večerje**? (Da/Ne)",
-        "awaiting_dinner_count": "Za koliko oseb želite **večerje**?",
-        "awaiting_note": "Želite še kaj **sporočiti**? (ali 'ne')",
-        "awaiting_time": "Ob kateri **uri**?",
-        "awaiting_table_date": "Za kateri **datum** bi rezervirali mizo?",
-        "awaiting_table_time": "Ob kateri **uri** bi prišli?",
-        "awaiting_table_people": "Za koliko **oseb**?",
-        "awaiting_table_location": "Katero **jedilnico** želite? (Pri peči / Pri vrtu)",
-        "awaiting_table_event_type": "Kakšen je **tip dogodka**?",
-        "awaiting_confirmation": "Potrdite rezervacijo? (da/ne)",
-    }
-    return continuations.get(step or "", "Lahko nadaljujemo z rezervacijo?")
+    if step in BOOKING_CONTINUATIONS:
+        return catalog_message(f"continuation.{step}", language, BOOKING_CONTINUATIONS[step]) or BOOKING_CONTINUATIONS[step]
+    return catalog_message("continuation.default", language, BOOKING_CONTINUATION_DEFAULT) or BOOKING_CONTINUATION_DEFAULT
 
 
-def handle_info_during_booking(message: str, session_state: dict) -> Optional[str]:
+def with_booking_continuation(reply: str, step: Optional[str], state: dict, language: str = "si") -> str:
+    """Odgovor + glava in navodilo za nadaljevanje rezervacije (deli v jeziku gosta)."""
+    continuation = get_booking_continuation(step, state, language)
+    return f"{reply}\n\n---\n\n{static_reply('booking_continue_header', language)}\n{continuation}"
+
+
+def get_product_reply(key: str, message: str, language: str = "si") -> str:
+    """Produktni odgovor v jeziku gosta (+ opomba za večja naročila)."""
+    reply = maybe_translate(get_product_response(key), language)
+    if is_bulk_order_request(message):
+        reply = f"{reply}\n\n{static_reply('bulk_order', language)}"
+    return reply
+
+
+def handle_info_during_booking(message: str, session_state: dict, language: str = "si") -> Optional[str]:
     """
     Če je booking aktiven in uporabnik vpraša info ali produkt, odgovorimo + nadaljujemo flow.
     """
@@ -1360,17 +1619,13 @@ def handle_info_during_booking(message: str, session_state: dict) -> Optional[st
 
     info_key = detect_info_intent(message)
     if info_key:
-        info_response = get_info_response(info_key, message)
-        continuation = get_booking_continuation(session_state.get("step"), session_state)
-        return f"{info_response}\n\n---\n\n📝 **Nadaljujemo z rezervacijo:**\n{continuation}"
+        info_response = get_info_response(info_key, message, language)
+        return with_booking_continuation(info_response, session_state.get("step"), session_state, language)
 
     product_key = detect_product_intent(message)
     if product_key:
-        product_response = get_product_response(product_key)
-        if is_bulk_order_request(message):
-            product_response = f"{product_response}\n\nZa večja naročila nam pišite na urska@kmetija-urska.si."
-        continuation = get_booking_continuation(session_state.get("step"), session_state)
-        return f"{product_response}\n\n---\n\n📝 **Nadaljujemo z rezervacijo:**\n{continuation}"
+        product_response = get_product_reply(product_key, message, language)
+        return with_booking_continuation(product_response, session_state.get("step"), session_state, language)
 
     return None
 
@@ -1385,53 +1640,53 @@ def is_food_question_without_booking_intent(message: str) -> bool:
     return has_food and not has_booking
 
 
+INFO_ONLY_KEYWORDS = keyword_groups(
+    "info_only",
+    {
+        "info": [
+            "koliko",
+            "kakšn",
+            "kakšen",
+            "kdo",
+            "ali imate",
+            "a imate",
+            "kaj je",
+            "kdaj",
+            "kje",
+            "kako",
+            "cena",
+            "stane",
+            "vključen",
+        ],
+        "booking": [
+            "rezervir",
+            "book",
+            "bi rad",
+            "bi radi",
+            "želim",
+            "želimo",
+            "za datum",
+            "nocitev",
+            "nočitev",
+            "oseb",
+        ],
+    },
+)
+
+
 def is_info_only_question(message: str) -> bool:
     """
     Vrne True če je vprašanje SAMO info (brez booking namere).
     Ta vprašanja ne smejo sprožiti rezervacije.
     """
-    text = message.lower()
-    info_words = [
-        "koliko",
-        "kakšn",
-        "kakšen",
-        "kdo",
-        "ali imate",
-        "a imate",
-        "kaj je",
-        "kdaj",
-        "kje",
-        "kako",
-        "cena",
-        "stane",
-        "vključen",
-    ]
-    booking_words = [
-        "rezervir",
-        "book",
-        "bi rad",
-        "bi radi",
-        "želim",
-        "želimo",
-        "za datum",
-        "nocitev",
-        "nočitev",
-        "oseb",
-    ]
-    has_info = any(w in text for w in info_words)
-    has_booking = any(w in text for w in booking_words)
-    return has_info and not has_booking
+    hits = scan_keywords(correct_typos(message.lower()))
+    return hits.has(INFO_ONLY_KEYWORDS["info"]) and not hits.has(INFO_ONLY_KEYWORDS["booking"])
 
 
 def is_reservation_typo(message: str) -> bool:
-    """Fuzzy zazna tipkarske napake pri 'rezervacija'."""
+    """Zazna 'rezervacija' tudi s tipkarskimi napakami (prek indeksa popravkov)."""
     words = re.findall(r"[a-zA-ZčšžČŠŽ]+", message.lower())
-    targets = ["rezervacija", "rezervirati", "rezerviram", "rezerviraj"]
-    for word in words:
-        for target in targets:
-            if difflib.SequenceMatcher(None, word, target).ratio() >= 0.75:
-                return True
-    return False
+    return any(correct_word(word).startswith("rezerv") for word in words)
 
 
 def is_ambiguous_reservation_request(message: str) -> bool:
@@ -1456,33 +1711,40 @@ def is_ambiguous_inquiry_request(message: str) -> bool:
     return has_explicit and not (has_number and has_product)
 
 
+INQUIRY_KEYWORDS = keyword_groups(
+    "inquiry",
+    {
+        "vecerja": ["večerj", "vecerj"],
+        "explicit": [
+            "povpraš",
+            "ponudb",
+            "naročil",
+            "naročilo",
+            "naroč",
+            "količin",
+            "večja količina",
+            "vecja kolicina",
+            "teambuilding",
+            "poroka",
+            "pogrebščina",
+            "pogrebscina",
+            "pogostitev",
+            "catering",
+        ],
+        "product": PRODUCT_STEMS | {"potica", "potic", "torta", "darilni paket"},
+    },
+)
+
+
 def is_inquiry_trigger(message: str) -> bool:
     lowered = message.lower()
-    if any(w in lowered for w in ["večerj", "vecerj"]):
+    hits = scan_keywords(correct_typos(lowered))
+    if hits.has(INQUIRY_KEYWORDS["vecerja"]):
         return False
-    explicit = [
-        "povpraš",
-        "ponudb",
-        "naročil",
-        "naročilo",
-        "naroč",
-        "količin",
-        "večja količina",
-        "vecja kolicina",
-        "teambuilding",
-        "poroka",
-        "pogrebščina",
-        "pogrebscina",
-        "pogostitev",
-        "catering",
-    ]
-    if any(t in lowered for t in explicit):
+    if hits.has(INQUIRY_KEYWORDS["explicit"]):
         return True
     has_number = re.search(r"\d", lowered) is not None
-    has_product = any(stem in lowered for stem in PRODUCT_STEMS) or any(
-        word in lowered for word in ["potica", "potic", "torta", "darilni paket"]
-    )
-    return has_number and has_product
+    return has_number and hits.has(INQUIRY_KEYWORDS["product"])
 
 
 def is_strong_inquiry_request(message: str) -> bool:
@@ -1516,8 +1778,9 @@ def should_switch_from_reservation(message: str, state: dict[str, Optional[str |
     return False
 
 def is_product_followup(message: str) -> bool:
+    session = get_session()
     lowered = message.lower()
-    if not last_product_query:
+    if not session.last_product_query:
         return False
     if any(phrase in lowered for phrase in PRODUCT_FOLLOWUP_PHRASES):
         return True
@@ -1543,8 +1806,52 @@ def is_bulk_order_request(message: str) -> bool:
     return any(w in message.lower() for w in bulk_words)
 
 
-def _fuzzy_contains(text: str, patterns: set[str]) -> bool:
-    return any(pat in text for pat in patterns)
+ROUTER_KEYWORDS = keyword_groups(
+    "router",
+    {
+        # tipkarske napake popravi correct_typos; ostanejo le kratke oblike
+        "booking": {
+            "rezerv",
+            "rezer",
+            "rezr",
+            "reserv",
+            "reservier",
+            "book",
+            "buking",
+            "booking",
+        },
+        "room": {
+            "soba",
+            "sobe",
+            "sobo",
+            "room",
+            "zimmer",
+            "zimmern",
+            "rum",
+            "camer",
+            "camera",
+            "accom",
+            "nocit",
+            "nočit",
+            "nočitev",
+            "nocitev",
+        },
+        "table": {
+            "miza",
+            "mize",
+            "mizo",
+            "miz",
+            "table",
+            "tafel",
+            "tisch",
+            "kosilo",
+            "vecerj",
+            "vecher",
+        },
+        "night": ["nocit", "noč", "night"],
+        "table_details": ["oseb", "ob ", ":00"],
+    },
+)
 
 
 def detect_router_intent(message: str, state: dict[str, Optional[str | int]]) -> str:
@@ -1552,77 +1859,24 @@ def detect_router_intent(message: str, state: dict[str, Optional[str | int]]) ->
     Preprost router za robustno detekcijo rezervacij z fuzzy tipi.
     Vrne: booking_room | booking_table | booking_continue | none
     """
-    lower = message.lower()
-
     if state.get("step") is not None:
         return "booking_continue"
 
-    booking_tokens = {
-        "rezerv",
-        "rezev",
-        "rezer",
-        "rezeriv",
-        "rezerver",
-        "rezerveru",
-        "rezr",
-        "rezrv",
-        "rezrvat",
-        "rezerveir",
-        "reserv",
-        "reservier",
-        "book",
-        "buking",
-        "booking",
-        "bukng",
-    }
-    room_tokens = {
-        "soba",
-        "sobe",
-        "sobo",
-        "room",
-        "zimmer",
-        "zimmern",
-        "rum",
-        "camer",
-        "camera",
-        "accom",
-        "nocit",
-        "nočit",
-        "nočitev",
-        "nocitev",
-    }
-    table_tokens = {
-        "miza",
-        "mize",
-        "mizo",
-        "miz",
-        "table",
-        "tabl",
-        "tabel",
-        "tble",
-        "tablle",
-        "tafel",
-        "tisch",
-        "koslo",  # typo kosilo
-        "kosilo",
-        "vecerj",
-        "veceja",
-        "vecher",
-    }
-
-    has_booking = _fuzzy_contains(lower, booking_tokens)
-    has_room = _fuzzy_contains(lower, room_tokens)
-    has_table = _fuzzy_contains(lower, table_tokens)
+    hits = scan_keywords(correct_typos(message.lower()))
+    keys = ROUTER_KEYWORDS
+    has_booking = hits.has(keys["booking"])
+    has_room = hits.has(keys["room"])
+    has_table = hits.has(keys["table"])
 
     if has_booking and has_room:
         return "booking_room"
     if has_booking and has_table:
         return "booking_table"
     # fallback: omemba sobe + nočitve tudi brez rezerv besed
-    if has_room and ("nocit" in lower or "noč" in lower or "night" in lower):
+    if has_room and hits.has(keys["night"]):
         return "booking_room"
     # omemba mize + časa/oseb brez booking besed
-    if has_table and any(tok in lower for tok in ["oseb", "ob ", ":00"]):
+    if has_table and hits.has(keys["table_details"]):
         return "booking_table"
 
     return "none"
@@ -2117,6 +2371,13 @@ def parse_people_count(message: str) -> dict[str, Optional[str | int]]:
         result["total"] = int(total_match.group(1))
         return result
 
+    # besede in en/de ("dva odrasla in en otrok", "2 adults", "3 Personen")
+    entities = parse_booking_entities(message)
+    if entities.total_people:
+        result["adults"], result["kids"] = entities.adults, entities.kids
+        result["total"] = entities.total_people
+        return result
+
     digits = re.findall(r"\d+", message)
     if len(digits) == 1:
         result["total"] = int(digits[0])
@@ -2204,11 +2465,22 @@ def advance_after_room_people(reservation_state: dict[str, Optional[str | int]])
         free_text = ""
         if free_now:
             free_text = f" Trenutno so na ta termin proste: {', '.join(free_now)} (vsaka 2+2)."
-        suggestion = (
-            f"Najbližji prost termin je {alternative}. Sporočite, ali vam ustreza, ali podajte drug datum."
-            if alternative
-            else "Prosim izberite drug datum ali manjšo skupino."
+        windows = reservation_service.suggest_room_windows(
+            reservation_state["date"] or "",
+            reservation_state["nights"] or 0,
+            people_val,
+            reservation_state["rooms"],
+            limit=3,
         )
+        if windows:
+            suggestion = (
+                f"Najbližji prosti termini so: {', '.join(windows)}. "
+                "Sporočite, kateri vam ustreza, ali podajte drug datum."
+            )
+        elif alternative:
+            suggestion = f"Najbližji prost termin je {alternative}. Sporočite, ali vam ustreza, ali podajte drug datum."
+        else:
+            suggestion = "Prosim izberite drug datum ali manjšo skupino."
         return f"V izbranem terminu nimamo dovolj prostih sob.{free_text} {suggestion}"
     # ponudi izbiro sobe, če je več prostih
     free_rooms = reservation_service.available_rooms(
@@ -2256,27 +2528,16 @@ def extract_nights(message: str) -> Optional[int]:
             if 1 <= num <= 30:
                 return num
 
-    # 4) števila z besedo (eno, dve, tri, štiri ...)
-    word_map = {
-        "ena": 1,
-        "eno": 1,
-        "en": 1,
-        "dve": 2,
-        "dva": 2,
-        "tri": 3,
-        "štiri": 4,
-        "stiri": 4,
-        "pet": 5,
-        "šest": 6,
-        "sest": 6,
-        "sedem": 7,
-        "osem": 8,
-        "devet": 9,
-        "deset": 10,
-    }
-    for word, num in word_map.items():
-        if re.search(rf"\\b{word}\\b", cleaned, re.IGNORECASE):
-            return num
+    # 4) števila z besedo ("tri noči", "two nights", "drei Nächte")
+    entities = parse_booking_entities(message)
+    if entities.nights:
+        return entities.nights
+
+    # 5) kratek odgovor z besedo (eno, dve, tri ...)
+    if len(message.strip()) < 20 and entities.total_people is None:
+        for word in re.findall(r"\w+", fold(cleaned)):
+            if word in NUMBER_WORDS:
+                return NUMBER_WORDS[word]
 
     return None
 
@@ -2301,7 +2562,8 @@ def extract_date(text: str) -> Optional[str]:
     if "pojutri" in lowered:
         return (today + timedelta(days=2)).strftime("%d.%m.%Y")
 
-    return None
+    # "naslednji petek", "čez 5 dni", "3. maja", "next Friday" ... (okna kot "konec julija" ne)
+    return parse_booking_entities(text).exact_date
 
 
 def extract_date_from_text(message: str) -> Optional[str]:
@@ -2319,6 +2581,10 @@ def extract_date_range(text: str) -> Optional[tuple[str, str]]:
         re.IGNORECASE,
     )
     if not match:
+        # "od 3. do 6. maja", "from 3rd to 6th of May", "vom 3. bis 6. Mai"
+        entities = parse_booking_entities(text)
+        if entities.end_date and not entities.approximate:
+            return (entities.date, entities.end_date)
         return None
     day1, month1, year1, day2, month2, year2 = match.groups()
     if year2 and not year1:
@@ -2353,7 +2619,8 @@ def extract_time(text: str) -> Optional[str]:
     """
     match = re.search(r"\b(\d{1,2})[:\.]?(\d{2})\b", text)
     if not match:
-        return None
+        # "ob 13h", "at 1 pm", "um 12 Uhr", "opoldne"
+        return parse_booking_entities(text).time
     hour, minute = int(match.group(1)), int(match.group(2))
     if hour > 23 or minute > 59:
         return None
@@ -2441,7 +2708,7 @@ def is_affirmative(message: str) -> bool:
 
 
 def get_last_assistant_message() -> str:
-    for msg in reversed(conversation_history):
+    for msg in reversed(get_session().history):
         if msg.get("role") == "assistant":
             return msg.get("content", "")
     return ""
@@ -2452,38 +2719,34 @@ def last_bot_mentions_reservation(last_bot: str) -> bool:
     return any(token in text for token in ["rezerv", "reserve", "booking", "zimmer", "room", "mizo", "table"])
 
 
+ROOM_STEP_PROMPTS = {
+    "awaiting_room_date": "Za kateri datum prihoda? (DD.MM.YYYY)",
+    "awaiting_nights": "Koliko nočitev načrtujete? (min. 3 v jun/jul/avg, sicer 2)",
+    "awaiting_people": "Za koliko oseb bi bilo bivanje (odrasli + otroci)?",
+    "awaiting_room_location": "Katero sobo želite (ALJAŽ, JULIJA, ANA)?",
+}
+TABLE_STEP_PROMPTS = {
+    "awaiting_table_date": "Prosim za datum (sobota/nedelja) v obliki DD.MM.YYYY.",
+    "awaiting_table_time": "Ob kateri uri bi želeli mizo? (12:00–20:00, zadnji prihod na kosilo 15:00)",
+    "awaiting_table_people": "Za koliko oseb pripravimo mizo?",
+    "awaiting_table_location": "Izberi prostor: Pri peči ali Pri vrtu?",
+}
+COMMON_STEP_PROMPTS = {
+    "awaiting_name": "Prosim ime in priimek nosilca rezervacije.",
+    "awaiting_phone": "Prosim telefonsko številko.",
+    "awaiting_email": "Kam naj pošljem povzetek ponudbe? (e-pošta)",
+    "awaiting_dinner": "Želite ob bivanju tudi večerje? (Da/Ne)",
+    "awaiting_dinner_count": "Za koliko oseb želite večerje?",
+}
+STEP_PROMPT_DEFAULT = "Nadaljujeva z rezervacijo – kako vam lahko pomagam?"
+
+
 def reservation_prompt_for_state(state: dict[str, Optional[str | int]]) -> str:
     step = state.get("step")
-    res_type = state.get("type")
-    if res_type == "table":
-        if step == "awaiting_table_date":
-            return "Prosim za datum (sobota/nedelja) v obliki DD.MM.YYYY."
-        if step == "awaiting_table_time":
-            return "Ob kateri uri bi želeli mizo? (12:00–20:00, zadnji prihod na kosilo 15:00)"
-        if step == "awaiting_table_people":
-            return "Za koliko oseb pripravimo mizo?"
-        if step == "awaiting_table_location":
-            return "Izberi prostor: Pri peči ali Pri vrtu?"
-    else:
-        if step == "awaiting_room_date":
-            return "Za kateri datum prihoda? (DD.MM.YYYY)"
-        if step == "awaiting_nights":
-            return "Koliko nočitev načrtujete? (min. 3 v jun/jul/avg, sicer 2)"
-        if step == "awaiting_people":
-            return "Za koliko oseb bi bilo bivanje (odrasli + otroci)?"
-        if step == "awaiting_room_location":
-            return "Katero sobo želite (ALJAŽ, JULIJA, ANA)?"
-    if step == "awaiting_name":
-        return "Prosim ime in priimek nosilca rezervacije."
-    if step == "awaiting_phone":
-        return "Prosim telefonsko številko."
-    if step == "awaiting_email":
-        return "Kam naj pošljem povzetek ponudbe? (e-pošta)"
-    if step == "awaiting_dinner":
-        return "Želite ob bivanju tudi večerje? (Da/Ne)"
-    if step == "awaiting_dinner_count":
-        return "Za koliko oseb želite večerje?"
-    return "Nadaljujeva z rezervacijo – kako vam lahko pomagam?"
+    type_prompts = TABLE_STEP_PROMPTS if state.get("type") == "table" else ROOM_STEP_PROMPTS
+    if step in type_prompts:
+        return type_prompts[step]
+    return COMMON_STEP_PROMPTS.get(step or "", STEP_PROMPT_DEFAULT)
 
 def get_greeting_response() -> str:
     return random.choice(GREETINGS)
@@ -2502,6 +2765,83 @@ def is_goodbye(message: str) -> bool:
     return False
 
 
+LANGUAGE_KEYWORDS = keyword_groups(
+    "lang",
+    {
+        "de": [
+            "ich",
+            "sie",
+            "wir",
+            "haben",
+            "möchte",
+            "möchten",
+            "können",
+            "bitte",
+            "zimmer",
+            "tisch",
+            "reservierung",
+            "reservieren",
+            "buchen",
+            "wann",
+            "wie",
+            "was",
+            "wo",
+            "gibt",
+            "guten tag",
+            "hallo",
+            "danke",
+            "preis",
+            "kosten",
+            "essen",
+            "trinken",
+            "wein",
+            "frühstück",
+            "abendessen",
+            "mittag",
+            "nacht",
+            "übernachtung",
+        ],
+        "en": [
+            " we ",
+            "you",
+            "have",
+            "would",
+            " like ",
+            "want",
+            "can",
+            "room",
+            "table",
+            "reservation",
+            "reserve",
+            "book",
+            "booking",
+            "when",
+            "how",
+            "what",
+            "where",
+            "there",
+            "hello",
+            "hi ",
+            "thank",
+            "price",
+            "cost",
+            "food",
+            "drink",
+            "wine",
+            "menu",
+            "breakfast",
+            "dinner",
+            "lunch",
+            "night",
+            "stay",
+            "please",
+        ],
+    },
+)
+# angleški zaimek "I" kot samostojna beseda
+ENGLISH_PRONOUN = keyword_group("lang.en_pronoun", ["i"], whole_word=True)
+
+
 def detect_language(message: str) -> str:
     """Zazna jezik sporočila. Vrne 'si', 'en' ali 'de'."""
     lowered = message.lower()
@@ -2511,80 +2851,9 @@ def detect_language(message: str) -> str:
     for exc in slovak_exceptions:
         lowered = lowered.replace(exc, "")
 
-    german_words = [
-        "ich",
-        "sie",
-        "wir",
-        "haben",
-        "möchte",
-        "möchten",
-        "können",
-        "bitte",
-        "zimmer",
-        "tisch",
-        "reservierung",
-        "reservieren",
-        "buchen",
-        "wann",
-        "wie",
-        "was",
-        "wo",
-        "gibt",
-        "guten tag",
-        "hallo",
-        "danke",
-        "preis",
-        "kosten",
-        "essen",
-        "trinken",
-        "wein",
-        "frühstück",
-        "abendessen",
-        "mittag",
-        "nacht",
-        "übernachtung",
-    ]
-    german_count = sum(1 for word in german_words if word in lowered)
-
-    # posebna obravnava angleškega zaimka "I" kot samostojne besede
-    english_pronoun = 1 if re.search(r"\bi\b", lowered) else 0
-
-    english_words = [
-        " we ",
-        "you",
-        "have",
-        "would",
-        " like ",
-        "want",
-        "can",
-        "room",
-        "table",
-        "reservation",
-        "reserve",
-        "book",
-        "booking",
-        "when",
-        "how",
-        "what",
-        "where",
-        "there",
-        "hello",
-        "hi ",
-        "thank",
-        "price",
-        "cost",
-        "food",
-        "drink",
-        "wine",
-        "menu",
-        "breakfast",
-        "dinner",
-        "lunch",
-        "night",
-        "stay",
-        "please",
-    ]
-    english_count = english_pronoun + sum(1 for word in english_words if word in lowered)
+    hits = scan_keywords(lowered)
+    german_count = hits.count(LANGUAGE_KEYWORDS["de"])
+    english_count = (1 if hits.has(ENGLISH_PRONOUN) else 0) + hits.count(LANGUAGE_KEYWORDS["en"])
 
     if german_count >= 2:
         return "de"
@@ -2602,36 +2871,58 @@ def translate_reply(reply: str, lang: str) -> str:
     """Prevede odgovor v angleščino ali nemščino, če je potrebno."""
     if not reply or lang not in {"en", "de"}:
         return reply
+    cached = catalog_translate(reply, lang)
+    if cached is not None:
+        return cached
     try:
-        prompt = (
-            f"Translate this to English, keep it natural and friendly:\n{reply}"
-            if lang == "en"
-            else f"Translate this to German/Deutsch, keep it natural and friendly:\n{reply}"
-        )
-        return generate_llm_answer(prompt, history=[])
+        return generate_llm_answer(_translation_prompt(reply, lang), history=[], call_site="translate", kind="translate")
     except Exception:
         return reply
 
 
+def _translation_prompt(text: str, target_lang: str) -> str:
+    return (
+        f"Translate this to English, keep it natural and friendly:\n{text}"
+        if target_lang == "en"
+        else f"Translate this to German/Deutsch, keep it natural and friendly:\n{text}"
+    )
+
+
 def maybe_translate(text: str, target_lang: str) -> str:
     """Po potrebi prevede besedilo v angleščino ali nemščino."""
     if target_lang not in {"en", "de"} or not text:
         return text
-    try:
-        prompt = (
-            f"Translate this to English, keep it natural and friendly:\n{text}"
-            if target_lang == "en"
-            else f"Translate this to German/Deutsch, keep it natural and friendly:\n{text}"
-        )
-        return generate_llm_answer(prompt, history=[])
-    except Exception:
+    with span("translation", target_lang):
+        cached = catalog_translate(text, target_lang)
+        if cached is not None:
+            return cached
+        try:
+            return generate_llm_answer(_translation_prompt(text, target_lang), history=[], call_site="translate", kind="translate")
+        except Exception:
+            return text
+
+
+async def maybe_translate_async(text: str, target_lang: str) -> str:
+    """Async različica maybe_translate (ne zasede niti med čakanjem na model)."""
+    if target_lang not in {"en", "de"} or not text:
         return text
+    with span("translation", target_lang):
+        cached = catalog_translate(text, target_lang)
+        if cached is not None:
+            return cached
+        try:
+            return await generate_llm_answer_async(_translation_prompt(text, target_lang), history=[], call_site="translate", kind="translate")
+        except Exception:
+            return text
 
 
 def translate_response(text: str, target_lang: str) -> str:
     """Prevede besedilo glede na zaznan jezik rezervacije."""
     if target_lang == "si" or target_lang is None:
         return text
+    cached = catalog_translate(text, target_lang)
+    if cached is not None:
+        return cached
     try:
         if target_lang == "en":
             prompt = f"Translate to English, natural and friendly, only translation:\\n{text}"
@@ -2639,7 +2930,7 @@ def translate_response(text: str, target_lang: str) -> str:
             prompt = f"Translate to German, natural and friendly, only translation:\\n{text}"
         else:
             return text
-        return generate_llm_answer(prompt, history=[])
+        return generate_llm_answer(prompt, history=[], call_site="translate", kind="translate")
     except Exception:
         return text
 
@@ -2653,6 +2944,17 @@ def is_unknown_response(response: str) -> bool:
         "nisem prepričan",
         "ni na voljo",
         "podatka nimam",
+        # odgovori, ki jih model napiše neposredno v angleščini/nemščini
+        "i don't know",
+        "i do not know",
+        "i'm not sure",
+        "i am not sure",
+        "i don't have information",
+        "i don't have any information",
+        "weiß ich nicht",
+        "ich bin nicht sicher",
+        "keine informationen",
+        "leider kann ich nicht",
     ]
     response_lower = response.lower()
     return any(ind in response_lower for ind in unknown_indicators)
@@ -2699,13 +3001,9 @@ def reset_reservation_state(state: dict[str, Optional[str | int]]) -> None:
     state.update(_blank_reservation_state())
 
 
-def start_inquiry_consent(state: dict[str, Optional[str]]) -> str:
+def start_inquiry_consent(state: dict[str, Optional[str]], language: str = "si") -> str:
     state["step"] = "awaiting_consent"
-    return (
-        "Žal nimam dovolj informacij. "
-        "Lahko zabeležim povpraševanje in ga posredujem ekipi. "
-        "Želite to? (da/ne)"
-    )
+    return static_reply("inquiry_consent", language)
 
 
 def handle_inquiry_flow(message: str, state: dict[str, Optional[str]], session_id: str) -> Optional[str]:
@@ -2789,27 +3087,19 @@ def handle_inquiry_flow(message: str, state: dict[str, Optional[str]], session_i
 
 def reset_conversation_context(session_id: Optional[str] = None) -> None:
     """Počisti začasne pogovorne podatke in ponastavi sejo."""
-    global conversation_history, last_product_query, last_wine_query, last_info_query, last_menu_query
-    global last_shown_products, chat_session_id, unknown_question_state, last_interaction
     if session_id:
-        state = reservation_states.get(session_id)
-        if state is not None:
-            reset_reservation_state(state)
-            reservation_states.pop(session_id, None)
-        unknown_question_state.pop(session_id, None)
+        session = get_session(session_id)
+        session.reset()
+        session.reservation.update(_blank_reservation_state())
+        session.inquiry.update(_blank_inquiry_state())
+        session_store.save(session)
     else:
-        for state in reservation_states.values():
-            reset_reservation_state(state)
-        reservation_states.clear()
-        unknown_question_state = {}
-    conversation_history = []
-    last_product_query = None
-    last_wine_query = None
-    last_info_query = None
-    last_menu_query = False
-    last_shown_products = []
-    chat_session_id = str(uuid.uuid4())[:8]
-    last_interaction = None
+        session_store.clear()
+        current = _current_session.get()
+        if current is not None:
+            current.reset()
+            current.reservation.update(_blank_reservation_state())
+            current.inquiry.update(_blank_inquiry_state())
 
 
 def generate_confirmation_email(state: dict[str, Optional[str | int]]) -> str:
@@ -2969,6 +3259,12 @@ def _handle_room_reservation_impl(message: str, state: dict[str, Optional[str |
         nights_candidate = extract_nights(message)
         if not date_candidate:
             reservation_state["date"] = None
+            window = parse_booking_entities(message)
+            if window.approximate:
+                return (
+                    f"Lepo, torej med {window.date} in {window.end_date}. "
+                    "Kateri dan točno bi prispeli (DD.MM.YYYY) in za koliko nočitev?"
+                )
             return "Z veseljem uredim sobo. 😊 Sporočite datum prihoda (DD.MM.YYYY) in približno število nočitev?"
 
         reservation_state["date"] = date_candidate
@@ -3025,6 +3321,8 @@ def _handle_room_reservation_impl(message: str, state: dict[str, Optional[str |
                 nums = re.findall(r"\d+", message)
                 if nums and len(message.strip()) < 20:
                     nights = int(nums[0])
+                elif not nums:
+                    nights = extract_nights(message)
 
         if nights is None:
             return "Koliko nočitev bi si želeli? (npr. '3' ali '3 nočitve')"
@@ -3520,6 +3818,19 @@ def handle_table_reservation(message: str, state: dict[str, Optional[str | int]]
     return translate_response(response, lang)
 
 
+def _prefill_table_reservation(state: dict[str, Optional[str | int]]) -> str:
+    """Datum, ura in osebe iz one-shot entitet gredo skozi iste korake (z validacijo)."""
+    seeded = {"awaiting_table_date": state.get("date"), "awaiting_table_time": state.get("time"), "awaiting_table_people": state.get("people")}
+    state.update(date=None, time=None, people=None)
+    state["step"] = "awaiting_table_date"
+    reply = ""
+    for step, value in seeded.items():
+        if value is None or state["step"] != step:
+            break
+        reply = handle_table_reservation(str(value), state)
+    return reply
+
+
 def handle_reservation_flow(message: str, state: dict[str, Optional[str | int]]) -> str:
     reservation_state = state
     if reservation_state["language"] is None:
@@ -3569,6 +3880,9 @@ def handle_reservation_flow(message: str, state: dict[str, Optional[str | int]])
                 prefilled_nights = extract_nights(message)
             if range_data and not prefilled_nights:
                 prefilled_nights = nights_from_range(range_data[0], range_data[1])
+            if not prefilled_nights:
+                # iz one-shot entitet (seed_booking_entities) – validira se enako
+                prefilled_nights = reservation_state.get("nights")
             prefilled_people = parse_people_count(message)
             if prefilled_people.get("total"):
                 reservation_state["people"] = prefilled_people["total"]
@@ -3619,6 +3933,8 @@ def handle_reservation_flow(message: str, state: dict[str, Optional[str | int]])
             )
         if detected == "table":
             reservation_state["type"] = "table"
+            if reservation_state.get("date"):
+                return _prefill_table_reservation(reservation_state)
             reservation_state["step"] = "awaiting_table_date"
             return _tr(
                 f"Odlično, mizo rezerviramo z veseljem. Za kateri datum (sobota/nedelja)? (DD.MM.YYYY)\n{table_intro_text()}"
@@ -3670,7 +3986,7 @@ def ensure_single_greeting(message: str, reply: str) -> str:
 
 
 def build_effective_query(message: str) -> str:
-    global last_info_query
+    session = get_session()
     normalized = message.strip().lower()
     short_follow = (
         len(normalized) < 12
@@ -3678,21 +3994,34 @@ def build_effective_query(message: str) -> str:
         or normalized.rstrip("?") in INFO_FOLLOWUP_PHRASES
     )
     if short_follow:
-        if last_product_query:
-            return f"{last_product_query} {message}"
-        if last_info_query:
-            return f"{last_info_query} {message}"
+        if session.last_product_query:
+            return f"{session.last_product_query} {message}"
+        if session.last_info_query:
+            return f"{session.last_info_query} {message}"
     return message
 
 
 @router.post("", response_model=ChatResponse)
-def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
-    global last_product_query, last_wine_query, last_info_query, last_menu_query, conversation_history, last_interaction, chat_session_id
+async def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
+    session = get_session(payload.session_id or "default")
+    token = _current_session.set(session)
+    trace = start_trace()
+    try:
+        return await _chat_reply(payload, session)
+    finally:
+        _current_session.reset(token)
+        with span("db", "session_save"):
+            session_store.save(session)
+        # razponi zahtevka -> histogrami z oznako končne namere (/metrics)
+        finish_trace(trace)
+
+
+async def _chat_reply(payload: ChatRequestWithSession, session: ChatSession) -> ChatResponse:
     now = datetime.now()
-    session_id = payload.session_id or "default"
-    if last_interaction and now - last_interaction > timedelta(hours=SESSION_TIMEOUT_HOURS):
+    session_id = session.session_id
+    if session.last_interaction and now - session.last_interaction > timedelta(hours=SESSION_TIMEOUT_HOURS):
         reset_conversation_context(session_id)
-    last_interaction = now
+    session.last_interaction = now
     state = get_reservation_state(session_id)
     inquiry_state = get_inquiry_state(session_id)
     needs_followup = False
@@ -3700,8 +4029,8 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
     if is_switch_topic_command(payload.message):
         reset_reservation_state(state)
         reset_inquiry_state(inquiry_state)
-        reply = "Seveda — zamenjamo temo. Kako vam lahko pomagam?"
-        reply = maybe_translate(reply, detected_lang)
+        reply = STATIC_REPLIES["switch_topic"]
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "switch_topic", followup_flag=False)
 
     if state.get("step") is None and is_affirmative(payload.message):
@@ -3713,8 +4042,8 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
                 state["type"] = "room"
             else:
                 state["type"] = None
-            reply = handle_reservation_flow(payload.message, state)
-            reply = maybe_translate(reply, detected_lang)
+            reply = await asyncio.to_thread(handle_reservation_flow, payload.message, state)
+            reply = await maybe_translate_async(reply, detected_lang)
             return finalize(reply, "reservation_confirmed", followup_flag=False)
 
     if state.get("step") is None:
@@ -3725,72 +4054,68 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
         people_hit = parse_people_count(payload.message).get("total")
         if date_hit and people_hit and (has_room_context or has_table_context):
             state["type"] = "room" if has_room_context else "table"
-            reply = handle_reservation_flow(payload.message, state)
-            reply = maybe_translate(reply, detected_lang)
+            reply = await asyncio.to_thread(handle_reservation_flow, payload.message, state)
+            reply = await maybe_translate_async(reply, detected_lang)
             return finalize(reply, "reservation_context_start", followup_flag=False)
 
     # zabeležimo user vprašanje v zgodovino (omejimo na zadnjih 6 parov)
-    conversation_history.append({"role": "user", "content": payload.message})
-    if len(conversation_history) > 12:
-        conversation_history = conversation_history[-12:]
+    session.add_message("user", payload.message)
 
     detected_lang = detect_language(payload.message)
 
     def finalize(reply_text: str, intent_value: str, followup_flag: bool = False) -> ChatResponse:
         nonlocal needs_followup
-        global conversation_history
+        set_trace_intent(intent_value)
         final_reply = reply_text
         flag = followup_flag or needs_followup or is_unknown_response(final_reply)
         if flag:
             final_reply = get_unknown_response(detected_lang)
-        conv_id = reservation_service.log_conversation(
-            session_id=session_id,
-            user_message=payload.message,
-            bot_response=final_reply,
-            intent=intent_value,
-            needs_followup=flag,
-        )
+        with span("logging", "conversation"):
+            conv_id = reservation_service.log_conversation(
+                session_id=session_id,
+                user_message=payload.message,
+                bot_response=final_reply,
+                intent=intent_value,
+                needs_followup=flag,
+            )
         if flag:
-            unknown_question_state[session_id] = {"question": payload.message, "conv_id": conv_id}
-        conversation_history.append({"role": "assistant", "content": final_reply})
-        if len(conversation_history) > 12:
-            conversation_history = conversation_history[-12:]
+            session.unknown_question = {"question": payload.message, "conv_id": conv_id}
+        session.add_message("assistant", final_reply)
         return ChatResponse(reply=final_reply)
 
     # inquiry flow
     if state.get("step") is None and inquiry_state.get("step"):
-        inquiry_reply = handle_inquiry_flow(payload.message, inquiry_state, session_id)
+        inquiry_reply = await asyncio.to_thread(handle_inquiry_flow, payload.message, inquiry_state, session_id)
         if inquiry_reply:
-            inquiry_reply = maybe_translate(inquiry_reply, detected_lang)
+            inquiry_reply = await maybe_translate_async(inquiry_reply, detected_lang)
             return finalize(inquiry_reply, "inquiry", followup_flag=False)
 
     if state.get("step") is None and is_inquiry_trigger(payload.message):
         if is_strong_inquiry_request(payload.message):
             inquiry_state["details"] = payload.message.strip()
             inquiry_state["step"] = "awaiting_deadline"
-            reply = "Super, zabeležim povpraševanje. Do kdaj bi to potrebovali? (datum/rok ali 'ni pomembno')"
-            reply = maybe_translate(reply, detected_lang)
+            reply = STATIC_REPLIES["inquiry_start"]
+            reply = await maybe_translate_async(reply, detected_lang)
             return finalize(reply, "inquiry_start", followup_flag=False)
         info_key = detect_info_intent(payload.message)
         if info_key:
-            info_reply = get_info_response(info_key, message)
-            consent = start_inquiry_consent(inquiry_state)
+            info_reply = await asyncio.to_thread(get_info_response, info_key, message, detected_lang)
+            consent = start_inquiry_consent(inquiry_state, detected_lang)
             reply = f"{info_reply}\n\n---\n\n{consent}"
-            reply = maybe_translate(reply, detected_lang)
             return finalize(reply, "inquiry_offer", followup_flag=False)
-        inquiry_reply = start_inquiry_consent(inquiry_state)
-        inquiry_reply = maybe_translate(inquiry_reply, detected_lang)
+        inquiry_reply = start_inquiry_consent(inquiry_state, detected_lang)
         return finalize(inquiry_reply, "inquiry_offer", followup_flag=False)
 
     # če je prejšnji odgovor bil "ne vem" in uporabnik pošlje email
-    if session_id in unknown_question_state and is_email(payload.message):
-        state = unknown_question_state.pop(session_id)
+    if session.unknown_question and is_email(payload.message):
+        state = session.unknown_question
+        session.unknown_question = None
         email_value = payload.message.strip()
         conv_id = state.get("conv_id")
         if conv_id:
-            reservation_service.update_followup_email(conv_id, email_value)
-        reply = "Hvala! 📧 Vaš elektronski naslov sem si zabeležil. Odgovoril vam bom v najkrajšem možnem času."
-        reply = maybe_translate(reply, detected_lang)
+            await asyncio.to_thread(reservation_service.update_followup_email, conv_id, email_value)
+        reply = STATIC_REPLIES["followup_email_saved"]
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "followup_email", followup_flag=False)
 
     # V2 router/exec (opcijsko)
@@ -3798,15 +4123,15 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
         if state.get("step") is not None:
             if should_switch_from_reservation(payload.message, state):
                 reset_reservation_state(state)
-                reply = _llm_answer_full_kb(payload.message, detected_lang)
+                reply = await _llm_answer_full_kb_async(payload.message, detected_lang)
                 return finalize(reply, "switch_from_reservation", followup_flag=False)
             lowered_message = payload.message.lower()
             if is_inquiry_trigger(payload.message) and is_strong_inquiry_request(payload.message):
                 reset_reservation_state(state)
                 inquiry_state["details"] = payload.message.strip()
                 inquiry_state["step"] = "awaiting_deadline"
-                reply = "Super, zabeležim povpraševanje. Do kdaj bi to potrebovali? (datum/rok ali 'ni pomembno')"
-                reply = maybe_translate(reply, detected_lang)
+                reply = STATIC_REPLIES["inquiry_start"]
+                reply = await maybe_translate_async(reply, detected_lang)
                 return finalize(reply, "inquiry_start", followup_flag=False)
             question_like = (
                 "?" in payload.message
@@ -3815,26 +4140,60 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
                 or any(word in lowered_message for word in ["gospodar", "družin", "lastnik", "kmetij"])
             )
             if question_like:
-                llm_reply = _llm_answer_full_kb(payload.message, detected_lang)
-                continuation = get_booking_continuation(state.get("step"), state)
-                llm_reply = f"{llm_reply}\n\n---\n\n📝 **Nadaljujemo z rezervacijo:**\n{continuation}"
-                llm_reply = maybe_translate(llm_reply, detected_lang)
+                llm_reply = await _llm_answer_full_kb_async(payload.message, detected_lang)
+                llm_reply = with_booking_continuation(llm_reply, state.get("step"), state, detected_lang)
                 return finalize(llm_reply, "info_during_reservation", followup_flag=False)
-            reply = handle_reservation_flow(payload.message, state)
+            reply = await asyncio.to_thread(handle_reservation_flow, payload.message, state)
             return finalize(reply, "reservation", followup_flag=False)
         if is_ambiguous_reservation_request(payload.message):
-            reply = "Želite rezervirati **sobo** ali **mizo**?"
-            reply = maybe_translate(reply, detected_lang)
+            reply = STATIC_REPLIES["clarify_reservation"]
+            reply = await maybe_translate_async(reply, detected_lang)
             return finalize(reply, "clarify_reservation", followup_flag=False)
         if is_ambiguous_inquiry_request(payload.message):
-            reply = (
-                "Ali želite, da zabeležim **povpraševanje/naročilo**? "
-                "Če da, prosim napišite **količino** in **rok**."
-            )
-            reply = maybe_translate(reply, detected_lang)
+            reply = STATIC_REPLIES["clarify_inquiry"]
+            reply = await maybe_translate_async(reply, detected_lang)
             return finalize(reply, "clarify_inquiry", followup_flag=False)
+        cached = cached_answer(payload.message, detected_lang, FULL_KB_VERSION)
+        if cached:
+            return finalize(cached, "info_cache", followup_flag=False)
+        # lokalni klasifikator pred vsakim LLM klicem: zanesljiva rezervacija gre
+        # naravnost v flow, LLM (one-shot ali router) le pod pragom
+        with span("routing", "reservation"):
+            local_route = classify_reservation(payload.message)
+        if local_route is not None and local_route["action"] in {"BOOKING_ROOM", "BOOKING_TABLE"}:
+            print(f"[ROUTER_CLF] {local_route['action']} ({local_route['confidence']}) -> brez LLM")
+            reset_reservation_state(state)
+            state["type"] = "room" if local_route["action"] == "BOOKING_ROOM" else "table"
+            reply = await asyncio.to_thread(handle_reservation_flow, payload.message, state)
+            return finalize(reply, local_route["action"].lower(), followup_flag=False)
+        if USE_ONE_SHOT_LLM:
+            one_shot = await _llm_one_shot_async(payload.message, detected_lang)
+            if one_shot is not None:
+                if one_shot["intent"] == "INFO":
+                    store_answer(payload.message, detected_lang, FULL_KB_VERSION, one_shot["answer"].strip())
+                decision = one_shot_decision(one_shot, state)
+                print(f"[ONE_SHOT] intent={one_shot['intent']} entities={decision['entities']}")
+                reply = await asyncio.to_thread(
+                    execute_decision,
+                    decision=decision,
+                    message=payload.message,
+                    state=state,
+                    # rezervacijski flow prevaja sam, odgovor modela je že v jeziku gosta
+                    translate_fn=lambda text: text,
+                    info_responder=lambda key, soft_sell: get_info_response(key or "", payload.message, detected_lang),
+                    product_responder=lambda key: get_product_reply(key, payload.message, detected_lang),
+                    reservation_flow_fn=handle_reservation_flow,
+                    reset_fn=reset_reservation_state,
+                    continuation_fn=lambda step_val, st: get_booking_continuation(step_val, st, detected_lang),
+                    continuation_header=static_reply("booking_continue_header", detected_lang),
+                    entities_fn=seed_booking_entities,
+                )
+                if reply:
+                    intent_value = "info_llm" if one_shot["intent"] == "INFO" else one_shot["intent"].lower()
+                    return finalize(reply, intent_value, followup_flag=False)
         try:
-            intent_result = _llm_route_reservation(payload.message)
+            # klasifikator je že odločil (NONE nad pragom) -> brez ponovnega klica
+            intent_result = local_route or await _route_reservation_async(payload.message)
         except Exception as exc:
             print(f"[LLM] routing failed: {exc}")
             intent_result = {"action": "NONE"}
@@ -3842,34 +4201,34 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
         if action in {"BOOKING_ROOM", "BOOKING_TABLE"}:
             reset_reservation_state(state)
             state["type"] = "room" if action == "BOOKING_ROOM" else "table"
-            reply = handle_reservation_flow(payload.message, state)
+            reply = await asyncio.to_thread(handle_reservation_flow, payload.message, state)
             return finalize(reply, action.lower(), followup_flag=False)
         info_key = detect_info_intent(payload.message)
         if info_key:
-            info_reply = get_info_response(info_key, message)
-            info_reply = maybe_translate(info_reply, detected_lang)
+            info_reply = await asyncio.to_thread(get_info_response, info_key, message, detected_lang)
             return finalize(info_reply, "info_llm", followup_flag=False)
         # fallback: če LLM ne vrne action, uporabi osnovno heuristiko
         if any(token in payload.message.lower() for token in ["rezerv", "book", "booking", "reserve", "reservation", "zimmer"]) or is_reservation_typo(payload.message):
             if "mizo" in payload.message.lower() or "table" in payload.message.lower():
                 reset_reservation_state(state)
                 state["type"] = "table"
-                reply = handle_reservation_flow(payload.message, state)
+                reply = await asyncio.to_thread(handle_reservation_flow, payload.message, state)
                 return finalize(reply, "booking_table_fallback", followup_flag=False)
             if "sobo" in payload.message.lower() or "room" in payload.message.lower() or "nočitev" in payload.message.lower():
                 reset_reservation_state(state)
                 state["type"] = "room"
-                reply = handle_reservation_flow(payload.message, state)
+                reply = await asyncio.to_thread(handle_reservation_flow, payload.message, state)
                 return finalize(reply, "booking_room_fallback", followup_flag=False)
-        llm_reply = _llm_answer_full_kb(payload.message, detected_lang)
+        llm_reply = await _llm_answer_full_kb_async(payload.message, detected_lang)
         return finalize(llm_reply, "info_llm", followup_flag=False)
 
     if USE_ROUTER_V2:
-        decision = route_message(
-            payload.message,
-            has_active_booking=state.get("step") is not None,
-            booking_step=state.get("step"),
-        )
+        with span("routing", "router_v2"):
+            decision = route_message(
+                payload.message,
+                has_active_booking=state.get("step") is not None,
+                booking_step=state.get("step"),
+            )
         routing_info = decision.get("routing", {})
         print(f"[ROUTER_V2] intent={routing_info.get('intent')} conf={routing_info.get('confidence')} info={decision.get('context', {}).get('info_key')} product={decision.get('context', {}).get('product_category')} interrupt={routing_info.get('is_interrupt')}")
         info_key = decision.get("context", {}).get("info_key") or ""
@@ -3878,36 +4237,32 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
         def _translate(txt: str) -> str:
             return maybe_translate(txt, detected_lang)
 
+        # info/produkt/nadaljevanje so že v jeziku gosta, _translate le za rezervacijski flow
         def _info_resp(key: Optional[str], soft_sell: bool) -> str:
-            reply_local = get_info_response(key or "", message)
+            reply_local = get_info_response(key or "", message, detected_lang)
             if soft_sell and (key or "") in BOOKING_RELEVANT_KEYS:
-                reply_local = f"{reply_local}\n\nŽelite, da pripravim **ponudbo**?"
+                reply_local = f"{reply_local}\n\n{static_reply('offer_prompt', detected_lang)}"
             return reply_local
 
         def _product_resp(key: str) -> str:
-            reply_local = get_product_response(key)
-            if is_bulk_order_request(payload.message):
-                reply_local = f"{reply_local}\n\nZa večja naročila nam pišite na urska@kmetija-urska.si, da uskladimo količine in prevzem."
-            return reply_local
+            return get_product_reply(key, payload.message, detected_lang)
 
         def _continuation(step_val: Optional[str], st: dict) -> str:
-            return get_booking_continuation(step_val, st)
+            return get_booking_continuation(step_val, st, detected_lang)
 
         # INFO brez kritičnih podatkov -> LLM/RAG odgovor (z možnostjo nadaljevanja rezervacije)
         if routing_info.get("intent") == "INFO" and not is_critical_info:
-            llm_reply = _llm_answer(payload.message, conversation_history)
+            llm_reply = await _llm_answer_async(payload.message, list(session.history), detected_lang)
             if llm_reply:
                 if routing_info.get("is_interrupt") and state.get("step"):
-                    cont = _continuation(state.get("step"), state)
-                    llm_reply = f"{llm_reply}\n\n---\n\n📝 **Nadaljujemo z rezervacijo:**\n{cont}"
-                llm_reply = maybe_translate(llm_reply, detected_lang)
+                    llm_reply = with_booking_continuation(llm_reply, state.get("step"), state, detected_lang)
                 if state.get("step") is None and is_unknown_response(llm_reply) and inquiry_state.get("step") is None:
-                    inquiry_reply = start_inquiry_consent(inquiry_state)
-                    inquiry_reply = maybe_translate(inquiry_reply, detected_lang)
+                    inquiry_reply = start_inquiry_consent(inquiry_state, detected_lang)
                     return finalize(inquiry_reply, "inquiry_offer", followup_flag=False)
                 return finalize(llm_reply, "info_llm", followup_flag=False)
 
-        reply_v2 = execute_decision(
+        reply_v2 = await asyncio.to_thread(
+            execute_decision,
             decision=decision,
             message=payload.message,
             state=state,
@@ -3918,46 +4273,44 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
             reset_fn=reset_reservation_state,
             continuation_fn=_continuation,
             general_handler=None,
+            continuation_header=static_reply("booking_continue_header", detected_lang),
         )
         if reply_v2:
             return finalize(reply_v2, decision.get("routing", {}).get("intent", "v2"), followup_flag=False)
         # Če nič ne ujame, poskusi LLM/RAG odgovor
-        llm_reply = _llm_answer(payload.message, conversation_history)
+        llm_reply = await _llm_answer_async(payload.message, list(session.history), detected_lang)
         if llm_reply:
-            llm_reply = maybe_translate(llm_reply, detected_lang)
             return finalize(llm_reply, "general_llm", followup_flag=False)
         # Če nič ne ujame, poskusi turistični RAG
         if state.get("step") is None:
-            tourist_reply = answer_tourist_question(payload.message)
+            with span("retrieval", "tourist"):
+                tourist_reply = await asyncio.to_thread(answer_tourist_question, payload.message)
             if tourist_reply:
-                tourist_reply = maybe_translate(tourist_reply, detected_lang)
+                tourist_reply = await maybe_translate_async(tourist_reply, detected_lang)
                 return finalize(tourist_reply, "tourist_info", followup_flag=False)
             # Nato semantični INFO odgovor iz knowledge baze
             semantic_reply = semantic_info_answer(payload.message)
             if semantic_reply:
-                semantic_reply = maybe_translate(semantic_reply, detected_lang)
+                semantic_reply = await maybe_translate_async(semantic_reply, detected_lang)
                 return finalize(semantic_reply, "info_semantic", followup_flag=False)
             # Če še vedno nič, priznaj neznano in ponudi email
             if state.get("step") is None:
-                inquiry_reply = start_inquiry_consent(inquiry_state)
-                inquiry_reply = maybe_translate(inquiry_reply, detected_lang)
+                inquiry_reply = start_inquiry_consent(inquiry_state, detected_lang)
                 return finalize(inquiry_reply, "info_unknown", followup_flag=False)
             reply = random.choice(UNKNOWN_RESPONSES)
-            reply = maybe_translate(reply, detected_lang)
+            reply = await maybe_translate_async(reply, detected_lang)
             return finalize(reply, "info_unknown", followup_flag=False)
     # Info ali produkt med aktivno rezervacijo: odgovor + nadaljevanje
-    info_during = handle_info_during_booking(payload.message, state)
+    info_during = await asyncio.to_thread(handle_info_during_booking, payload.message, state, detected_lang)
     if info_during:
-        reply = maybe_translate(info_during, detected_lang)
-        return finalize(reply, "info_during_reservation", followup_flag=False)
+        return finalize(info_during, "info_during_reservation", followup_flag=False)
 
     # === ROUTER: Info intent detection ===
     info_key = detect_info_intent(payload.message)
     if info_key:
-        reply = get_info_response(info_key, message)
+        reply = await asyncio.to_thread(get_info_response, info_key, message, detected_lang)
         if info_key in BOOKING_RELEVANT_KEYS:
-            reply = f"{reply}\n\nŽelite, da pripravim **ponudbo**?"
-        reply = maybe_translate(reply, detected_lang)
+            reply = f"{reply}\n\n{static_reply('offer_prompt', detected_lang)}"
         return finalize(reply, "info_static", followup_flag=False)
     # === KONEC ROUTER ===
 
@@ -3965,16 +4318,13 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
     if state["step"] is None:
         product_key = detect_product_intent(payload.message)
         if product_key:
-            reply = get_product_response(product_key)
-            if is_bulk_order_request(payload.message):
-                reply = f"{reply}\n\nZa večja naročila nam pišite na urska@kmetija-urska.si, da uskladimo količine in prevzem."
-            reply = maybe_translate(reply, detected_lang)
+            reply = await asyncio.to_thread(get_product_reply, product_key, payload.message, detected_lang)
             return finalize(reply, "product_static", followup_flag=False)
 
     # Guard: info-only vprašanja naj ne sprožijo rezervacije
     if state["step"] is None and is_info_only_question(payload.message):
         reply = random.choice(UNKNOWN_RESPONSES)
-        reply = maybe_translate(reply, detected_lang)
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "info_only", followup_flag=False)
 
     # Fuzzy router za rezervacije (robustno na tipkarske napake)
@@ -3982,20 +4332,19 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
     if router_intent == "booking_room" and state["step"] is None:
         reset_reservation_state(state)
         state["type"] = "room"
-        reply = handle_reservation_flow(payload.message, state)
-        reply = maybe_translate(reply, detected_lang)
+        reply = await asyncio.to_thread(handle_reservation_flow, payload.message, state)
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "reservation_router_room", followup_flag=False)
     if router_intent == "booking_table" and state["step"] is None:
         reset_reservation_state(state)
         state["type"] = "table"
-        reply = handle_reservation_flow(payload.message, state)
-        reply = maybe_translate(reply, detected_lang)
+        reply = await asyncio.to_thread(handle_reservation_flow, payload.message, state)
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "reservation_router_table", followup_flag=False)
 
     # Hrana/meni brez jasne rezervacijske namere
     if is_food_question_without_booking_intent(payload.message):
-        reply = get_info_response("menu_info", message)
-        reply = maybe_translate(reply, detected_lang)
+        reply = await asyncio.to_thread(get_info_response, "menu_info", message, detected_lang)
         return finalize(reply, "food_info", followup_flag=False)
 
     # aktivna rezervacija ima prednost, vendar omogoča izhod ali druga vprašanja
@@ -4004,17 +4353,17 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
             reset_reservation_state(state)
             inquiry_state["details"] = payload.message.strip()
             inquiry_state["step"] = "awaiting_deadline"
-            reply = "Super, zabeležim povpraševanje. Do kdaj bi to potrebovali? (datum/rok ali 'ni pomembno')"
-            reply = maybe_translate(reply, detected_lang)
+            reply = STATIC_REPLIES["inquiry_start"]
+            reply = await maybe_translate_async(reply, detected_lang)
             return finalize(reply, "inquiry_start", followup_flag=False)
         if is_escape_command(payload.message):
             reset_reservation_state(state)
-            reply = "OK, prekinil sem rezervacijo."
-            reply = maybe_translate(reply, detected_lang)
+            reply = STATIC_REPLIES["reservation_cancelled"]
+            reply = await maybe_translate_async(reply, detected_lang)
             return finalize(reply, "reservation_cancel", followup_flag=False)
         if payload.message.strip().lower() == "nadaljuj":
             prompt = reservation_prompt_for_state(state)
-            reply = maybe_translate(prompt, detected_lang)
+            reply = await maybe_translate_async(prompt, detected_lang)
             return finalize(reply, "reservation_continue", followup_flag=False)
         lowered_message = payload.message.lower()
         question_like = (
@@ -4025,229 +4374,194 @@ def chat_endpoint(payload: ChatRequestWithSession) -> ChatResponse:
         )
         if question_like:
             if USE_FULL_KB_LLM:
-                llm_reply = _llm_answer_full_kb(payload.message, detected_lang)
+                llm_reply = await _llm_answer_full_kb_async(payload.message, detected_lang)
             else:
-                llm_reply = _llm_answer(payload.message, conversation_history)
+                llm_reply = await _llm_answer_async(payload.message, list(session.history), detected_lang)
             if llm_reply:
-                continuation = get_booking_continuation(state.get("step"), state)
-                llm_reply = f"{llm_reply}\n\n---\n\n📝 **Nadaljujemo z rezervacijo:**\n{continuation}"
-                llm_reply = maybe_translate(llm_reply, detected_lang)
+                llm_reply = with_booking_continuation(llm_reply, state.get("step"), state, detected_lang)
                 return finalize(llm_reply, "info_during_reservation", followup_flag=False)
         if is_product_query(payload.message):
             reply = answer_product_question(payload.message)
-            last_product_query = payload.message
-            last_wine_query = None
-            last_info_query = None
-            last_menu_query = False
-            reply = maybe_translate(reply, detected_lang)
-            reply = f"{reply}\n\nČe želiš nadaljevati rezervacijo, napiši 'nadaljuj'."
+            session.last_product_query = payload.message
+            session.last_wine_query = None
+            session.last_info_query = None
+            session.last_menu_query = False
+            reply = await maybe_translate_async(reply, detected_lang)
+            reply = f"{reply}\n\n{static_reply('continue_hint', detected_lang)}"
             return finalize(reply, "product_during_reservation", followup_flag=False)
         if is_info_query(payload.message):
             reply = answer_farm_info(payload.message)
-            last_product_query = None
-            last_wine_query = None
-            last_info_query = payload.message
-            last_menu_query = False
-            reply = maybe_translate(reply, detected_lang)
-            reply = f"{reply}\n\nČe želiš nadaljevati rezervacijo, napiši 'nadaljuj'."
+            session.last_product_query = None
+            session.last_wine_query = None
+            session.last_info_query = payload.message
+            session.last_menu_query = False
+            reply = await maybe_translate_async(reply, detected_lang)
+            reply = f"{reply}\n\n{static_reply('continue_hint', detected_lang)}"
             return finalize(reply, "info_during_reservation", followup_flag=False)
 
-        reply = handle_reservation_flow(payload.message, state)
-        last_product_query = None
-        last_wine_query = None
-        last_info_query = None
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        reply = await asyncio.to_thread(handle_reservation_flow, payload.message, state)
+        session.last_product_query = None
+        session.last_wine_query = None
+        session.last_info_query = None
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "reservation")
 
     intent = detect_intent(payload.message, state)
 
     if intent == "goodbye":
         reply = get_goodbye_response()
-        last_product_query = None
-        last_wine_query = None
-        last_info_query = None
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        session.last_product_query = None
+        session.last_wine_query = None
+        session.last_info_query = None
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "goodbye")
 
     if intent == "reservation":
-        reply = handle_reservation_flow(payload.message, state)
-        last_product_query = None
-        last_wine_query = None
-        last_info_query = None
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        reply = await asyncio.to_thread(handle_reservation_flow, payload.message, state)
+        session.last_product_query = None
+        session.last_wine_query = None
+        session.last_info_query = None
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "reservation")
 
     # tedenska ponudba naj ima prednost pred vikend jedilnikom
     if intent == "weekly_menu":
         reply = answer_weekly_menu(payload.message)
-        last_product_query = None
-        last_wine_query = None
-        last_info_query = payload.message
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        session.last_product_query = None
+        session.last_wine_query = None
+        session.last_info_query = payload.message
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "weekly_menu")
 
     if intent == "room_info":
-        reply = """Seveda! 😊 Imamo tri prijetne družinske sobe:
-
-🛏️ **Soba ALJAŽ** - soba z balkonom (2+2 osebi)
-🛏️ **Soba JULIJA** - družinska soba z balkonom (2 odrasla + 2 otroka)  
-🛏️ **Soba ANA** - družinska soba z dvema spalnicama (2 odrasla + 2 otroka)
-
-**Cena**: 50€/osebo/noč z zajtrkom
-**Večerja**: dodatnih 25€/osebo
-
-Sobe so klimatizirane, Wi-Fi je brezplačen. Prijava ob 14:00, odjava ob 10:00.
-
-Bi želeli rezervirati? Povejte mi datum in število oseb! 🗓️"""
-        reply = maybe_translate(reply, detected_lang)
+        reply = STATIC_REPLIES["room_info"]
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "room_info")
 
     if intent == "room_pricing":
         reply = answer_room_pricing(payload.message)
-        last_product_query = None
-        last_wine_query = None
-        last_info_query = payload.message
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        session.last_product_query = None
+        session.last_wine_query = None
+        session.last_info_query = payload.message
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "room_pricing")
 
     if intent == "tourist_info":
-        tourist_reply = answer_tourist_question(payload.message)
+        tourist_reply = await asyncio.to_thread(answer_tourist_question, payload.message)
         if tourist_reply:
-            detected_lang = detect_language(payload.message)
-            if detected_lang == "en":
-                reply = generate_llm_answer(
-                    f"Translate this to English, keep it natural and friendly:\n{tourist_reply}",
-                    history=[],
-                )
-            elif detected_lang == "de":
-                reply = generate_llm_answer(
-                    f"Translate this to German/Deutsch, keep it natural and friendly:\n{tourist_reply}",
-                    history=[],
-                )
-            else:
-                reply = tourist_reply
-            last_product_query = None
-            last_wine_query = None
-            last_info_query = payload.message
-            last_menu_query = False
+            # izvleček iz baze okolice (brez LLM), zato ga po potrebi prevedemo
+            reply = await maybe_translate_async(tourist_reply, detected_lang)
+            session.last_product_query = None
+            session.last_wine_query = None
+            session.last_info_query = payload.message
+            session.last_menu_query = False
             return finalize(reply, "tourist_info")
 
     month_hint = parse_month_from_text(payload.message) or parse_relative_month(payload.message)
     if is_menu_query(payload.message):
         reply = format_current_menu(month_override=month_hint, force_full=is_full_menu_request(payload.message))
-        last_product_query = None
-        last_wine_query = None
-        last_info_query = None
-        last_menu_query = True
-        reply = maybe_translate(reply, detected_lang)
+        session.last_product_query = None
+        session.last_wine_query = None
+        session.last_info_query = None
+        session.last_menu_query = True
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "menu")
     if month_hint is not None and intent == "default":
         reply = format_current_menu(month_override=month_hint, force_full=is_full_menu_request(payload.message))
-        last_product_query = None
-        last_wine_query = None
-        last_info_query = None
-        last_menu_query = True
-        reply = maybe_translate(reply, detected_lang)
+        session.last_product_query = None
+        session.last_wine_query = None
+        session.last_info_query = None
+        session.last_menu_query = True
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "menu")
 
     if intent == "product":
         reply = answer_product_question(payload.message)
-        last_product_query = payload.message
-        last_wine_query = None
-        last_info_query = None
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        session.last_product_query = payload.message
+        session.last_wine_query = None
+        session.last_info_query = None
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "product")
 
     if intent == "product_followup":
         reply = answer_product_question(payload.message)
-        last_product_query = payload.message
-        last_wine_query = None
-        last_info_query = None
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        session.last_product_query = payload.message
+        session.last_wine_query = None
+        session.last_info_query = None
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "product_followup")
 
     if intent == "farm_info":
         reply = answer_farm_info(payload.message)
-        last_product_query = None
-        last_wine_query = None
-        last_info_query = payload.message
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        session.last_product_query = None
+        session.last_wine_query = None
+        session.last_info_query = payload.message
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "farm_info")
 
     if intent == "food_general":
         reply = answer_food_question(payload.message)
-        last_product_query = None
-        last_wine_query = None
-        last_info_query = payload.message
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        session.last_product_query = None
+        session.last_wine_query = None
+        session.last_info_query = payload.message
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "food_general")
 
     if intent == "help":
         reply = get_help_response()
-        last_product_query = None
-        last_wine_query = None
-        last_info_query = payload.message
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        session.last_product_query = None
+        session.last_wine_query = None
+        session.last_info_query = payload.message
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "help")
 
     if intent == "wine":
         reply = answer_wine_question(payload.message)
-        last_product_query = None
-        last_wine_query = payload.message
-        last_info_query = None
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        session.last_product_query = None
+        session.last_wine_query = payload.message
+        session.last_info_query = None
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "wine")
 
     if intent == "wine_followup":
-        combined = f"{last_wine_query} {payload.message}" if last_wine_query else payload.message
+        combined = f"{session.last_wine_query} {payload.message}" if session.last_wine_query else payload.message
         reply = answer_wine_question(combined)
-        last_wine_query = combined
-        last_product_query = None
-        last_info_query = None
-        last_menu_query = False
-        reply = maybe_translate(reply, detected_lang)
+        session.last_wine_query = combined
+        session.last_product_query = None
+        session.last_info_query = None
+        session.last_menu_query = False
+        reply = await maybe_translate_async(reply, detected_lang)
         return finalize(reply, "wine_followup")
 
     try:
         effective_query = build_effective_query(payload.message)
-        detected_lang = detect_language(payload.message)
-
-        if detected_lang == "en":
-            lang_hint = "\n\n[IMPORTANT: The user is writing in English. Respond in English.]"
-            effective_query = effective_query + lang_hint
-        elif detected_lang == "de":
-            lang_hint = "\n\n[IMPORTANT: The user is writing in German. Respond in German/Deutsch.]"
-            effective_query = effective_query + lang_hint
-
-        reply = generate_llm_answer(effective_query, history=conversation_history)
-        last_info_query = effective_query
+        reply = await generate_llm_answer_async(effective_query, history=list(session.history), language=detected_lang)
+        session.last_info_query = effective_query
     except Exception:
         reply = (
             "Trenutno imam tehnične težave pri dostopu do podatkov. "
             "Za natančne informacije prosim preverite www.kmetija-urska.si."
         )
-        last_info_query = None
-    last_product_query = None
-    last_wine_query = None
-    last_menu_query = False
+        session.last_info_query = None
+    session.last_product_query = None
+    session.last_wine_query = None
+    session.last_menu_query = False
 
     if intent == "default" and is_greeting(payload.message):
-        reply = get_greeting_response()
+        reply = await maybe_translate_async(get_greeting_response(), detected_lang)
     else:
         reply = append_today_hint(payload.message, reply)
-
-    reply = maybe_translate(reply, detected_lang)
     return finalize(reply, intent)
 WEEKLY_MENUS: dict[int, dict[str, object]] = {}
 
@@ -4261,68 +4575,126 @@ WEEKLY_INFO = {
 
 
 @router.post("/stream")
-def chat_stream(payload: ChatRequestWithSession):
-    global conversation_history, last_interaction
+async def chat_stream(payload: ChatRequestWithSession):
+    session = get_session(payload.session_id or "default")
+    token = _current_session.set(session)
+    # ena sled za ves zahtevek; chat_endpoint v delegiranih vejah ne odpre nove
+    trace = start_trace()
+    try:
+        return await _chat_stream_reply(payload, session)
+    finally:
+        _current_session.reset(token)
+        with span("db", "session_save"):
+            session_store.save(session)
+        # pri pravem streamu sled zapiše generator odgovora (traced_stream)
+        finish_trace(trace)
+
+
+async def _chat_stream_reply(payload: ChatRequestWithSession, session: ChatSession):
     now = datetime.now()
-    session_id = payload.session_id or "default"
-    if last_interaction and now - last_interaction > timedelta(hours=SESSION_TIMEOUT_HOURS):
+    session_id = session.session_id
+    if session.last_interaction and now - session.last_interaction > timedelta(hours=SESSION_TIMEOUT_HOURS):
         reset_conversation_context(session_id)
-    last_interaction = now
+    session.last_interaction = now
     state = get_reservation_state(session_id)
     inquiry_state = get_inquiry_state(session_id)
 
-    def stream_and_log(reply_chunks):
+    async def stream_and_log(reply_chunks):
         collected: list[str] = []
-        for chunk in reply_chunks:
+        async for chunk in reply_chunks:
             collected.append(chunk)
             yield chunk
         final_reply = "".join(collected).strip() or "Seveda, z veseljem pomagam. Kaj vas zanima?"
-        reservation_service.log_conversation(
-            session_id=session_id,
-            user_message=payload.message,
-            bot_response=final_reply,
-            intent="stream",
-            needs_followup=False,
-        )
-        conversation_history.append({"role": "assistant", "content": final_reply})
-        if len(conversation_history) > 12:
-            conversation_history[:] = conversation_history[-12:]
+        with span("logging", "conversation"):
+            reservation_service.log_conversation(
+                session_id=session_id,
+                user_message=payload.message,
+                bot_response=final_reply,
+                intent="stream",
+                needs_followup=False,
+            )
+        session.add_message("assistant", final_reply)
+        with span("db", "session_save"):
+            session_store.save(session)
 
     # Če je rezervacija aktivna ali gre za rezervacijo, uporabimo obstoječo pot (brez pravega streama)
     if state.get("step") is not None or detect_intent(payload.message, state) == "reservation":
-        response = chat_endpoint(payload)
+        response = await chat_endpoint(payload)
         return StreamingResponse(
-            _stream_text_chunks(response.reply),
+            _astream_text_chunks(response.reply),
             media_type="text/plain",
         )
 
     # inquiry flow mora prednostno delovati tudi v stream načinu
     if inquiry_state.get("step") or is_inquiry_trigger(payload.message):
-        response = chat_endpoint(payload)
+        response = await chat_endpoint(payload)
         return StreamingResponse(
-            _stream_text_chunks(response.reply),
+            _astream_text_chunks(response.reply),
             media_type="text/plain",
         )
 
     if is_ambiguous_reservation_request(payload.message) or is_ambiguous_inquiry_request(payload.message):
-        response = chat_endpoint(payload)
+        response = await chat_endpoint(payload)
         return StreamingResponse(
-            _stream_text_chunks(response.reply),
+            _astream_text_chunks(response.reply),
             media_type="text/plain",
         )
 
     if USE_FULL_KB_LLM:
-        settings = Settings()
-        conversation_history.append({"role": "user", "content": payload.message})
-        if len(conversation_history) > 12:
-            conversation_history = conversation_history[-12:]
+        settings = get_settings()
+        session.add_message("user", payload.message)
         return StreamingResponse(
-            stream_and_log(_llm_answer_full_kb_stream(payload.message, settings, detect_language(payload.message))),
+            traced_stream(
+                stream_and_log(_llm_answer_full_kb_stream_async(payload.message, settings, detect_language(payload.message))),
+                defer_trace(),
+                "stream",
+            ),
             media_type="text/plain",
         )
 
-    response = chat_endpoint(payload)
+    response = await chat_endpoint(payload)
     return StreamingResponse(
-        _stream_text_chunks(response.reply),
+        _astream_text_chunks(response.reply),
         media_type="text/plain",
     )
+
+
+# besedišče za popravljanje tipkarskih napak (cilji) in znane besede (zaščita)
+typo_vocabulary(
+    "booking",
+    [
+        "rezerv", "rezervacija", "rezervacijo", "rezervacije", "rezervirati", "rezerviram", "rezerviraj",
+        "rezerviral", "rezervirala", "rezervirali", "rezerviramo", "book", "booking", "buking",
+        "reserve", "reservation", "reservieren", "reservierung", "buchen",
+    ],
+)
+typo_vocabulary(
+    "rooms",
+    [
+        "soba", "sobo", "sobe", "sobah", "room", "rooms", "zimmer", "suita", "nočitev", "nočitve", "nocitev",
+        "nocitve", "prenočitev", "nastanitev", "accommodation",
+        *(room["id"].split("_")[0].lower() for room in ROOMS),
+    ],
+)
+typo_vocabulary(
+    "menu",
+    [
+        "miza", "mizo", "mize", "kosilo", "kosila", "večerja", "večerjo", "večerje", "vecerja", "vecerjo",
+        "zajtrk", "jedilnik", "jedilniku", "meni", "meniju", "degustacija", "table", "tisch", "dinner", "lunch",
+    ],
+)
+_KB_WORDS = {word for chunk in KNOWLEDGE_CHUNKS for word in re.findall(r"[^\W\d_]+", f"{chunk.title} {chunk.paragraph}".lower())}
+typo_vocabulary("products", [word for word in _KB_WORDS if word.startswith(tuple(PRODUCT_STEMS))])
+typo_vocabulary(
+    "known",
+    _KB_WORDS
+    | {word for word in registered_keywords() if word.isalpha()}
+    | set(NUMBER_WORDS)
+    | {word for names in (*MONTHS.values(), *WEEKDAYS.values()) for word in names}
+    | {"jedilnica", "jedilnico", "jedilnice", "jedilnici"},
+    target=False,
+)
+
+# vse skupine ključnih besed (tudi router_agent) so registrirane -> en avtomat ob uvozu
+compile_keywords()
+build_typo_index()
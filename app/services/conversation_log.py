@@ -0,0 +1,132 @@
+"""
+Write-behind zapisovanje pogovorov.
+
+Chat odgovor ne čaka več na INSERT + COMMIT: vrstice gredo v omejeno vrsto,
+ozadna nit pa jih vsakih `flush_interval_ms` (ali ob `batch_size` vrsticah)
+zapiše z enim executemany v eni transakciji. Ob zaustavitvi se vrsta izprazni.
+"""
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+LOG_QUEUE_MAX = int(os.environ.get("CONVERSATION_LOG_QUEUE_MAX", "10000"))
+LOG_BATCH_SIZE = int(os.environ.get("CONVERSATION_LOG_BATCH_SIZE", "100"))
+LOG_FLUSH_INTERVAL_MS = int(os.environ.get("CONVERSATION_LOG_FLUSH_MS", "250"))
+
+# vrstica: (session_id, user_message, bot_response, intent, needs_followup, followup_email, created_at)
+ConversationRow = tuple
+
+
+class ConversationLogWriter:
+    def __init__(
+        self,
+        insert_rows: Callable[[list[ConversationRow]], None],
+        max_queue: int = LOG_QUEUE_MAX,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_interval_ms: int = LOG_FLUSH_INTERVAL_MS,
+    ) -> None:
+        self._insert_rows = insert_rows
+        self._queue: "queue.Queue[ConversationRow]" = queue.Queue(maxsize=max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(1, flush_interval_ms) / 1000
+        self._thread: Optional[threading.Thread] = None
+        self._atexit_registered = False
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._idle = threading.Condition()
+        self._pending = 0  # v vrsti + v zapisovanju
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "dropped": 0, "errors": 0}
+
+    def _ensure_thread(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="conversation-log-writer", daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    def enqueue(self, row: ConversationRow) -> bool:
+        """Doda vrstico v vrsto; False, če je vrsta polna (klicatelj zapiše sam)."""
+        if self._stopping.is_set():
+            return False
+        self._ensure_thread()
+        with self._idle:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._idle:
+                self._pending -= 1
+                self._idle.notify_all()
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: list[ConversationRow]) -> None:
+        try:
+            self._insert_rows(batch)
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as exc:
+            # en ponovni poskus (npr. prekinjena povezava), nato zavržemo
+            try:
+                self._insert_rows(batch)
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+            except Exception:
+                self.stats["errors"] += 1
+                self.stats["dropped"] += len(batch)
+                print(f"[CONV LOG] zapis {len(batch)} pogovorov ni uspel: {exc}")
+        finally:
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Počaka, da so vse vrstice v vrsti zapisane. Vrne False ob timeoutu."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._pending > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Izprazni vrsto in ustavi ozadno nit (shutdown)."""
+        self.flush(timeout)
+        self._stopping.set()
+        thread = self._thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
@@ -1,6 +1,8 @@
 """
 Executor V2 - sprejme odločitev routerja in izvede ustrezno akcijo.
 Ne vsebuje FSM; obstoječo logiko dobimo prek funkcijskih parametrov.
+info_responder, product_responder in continuation_fn vrnejo besedilo že v
+jeziku gosta; translate_fn se uporabi le za odgovore rezervacijskega flowa.
 """
 from __future__ import annotations
 
@@ -18,6 +20,8 @@ def execute_decision(
     reset_fn: Callable[[Dict[str, Any]], None],
     continuation_fn: Callable[[Optional[str], Dict[str, Any]], str],
     general_handler: Optional[Callable[[str], str]] = None,
+    continuation_header: str = "📝 **Nadaljujemo z rezervacijo:**",
+    entities_fn: Optional[Callable[[str, Dict[str, Any], Dict[str, Any]], None]] = None,
 ) -> Optional[str]:
     routing = decision.get("routing", {})
     context = decision.get("context", {})
@@ -26,19 +30,20 @@ def execute_decision(
 
     if intent == "INFO":
         info_key = context.get("info_key")
-        reply = info_responder(info_key, context.get("needs_soft_sell", False))
+        # odgovor iz one-shot LLM klica uporabimo neposredno (brez dodatnega klica)
+        reply = context.get("answer") or info_responder(info_key, context.get("needs_soft_sell", False))
         if is_interrupt and state.get("step"):
             cont = continuation_fn(state.get("step"), state)
-            reply = f"{reply}\n\n---\n\n📝 **Nadaljujemo z rezervacijo:**\n{cont}"
-        return translate_fn(reply)
+            reply = f"{reply}\n\n---\n\n{continuation_header}\n{cont}"
+        return reply
 
     if intent == "PRODUCT":
         prod_key = context.get("product_category") or "izdelki_splosno"
         reply = product_responder(prod_key)
         if is_interrupt and state.get("step"):
             cont = continuation_fn(state.get("step"), state)
-            reply = f"{reply}\n\n---\n\n📝 **Nadaljujemo z rezervacijo:**\n{cont}"
-        return translate_fn(reply)
+            reply = f"{reply}\n\n---\n\n{continuation_header}\n{cont}"
+        return reply
 
     if intent == "SYSTEM":
         reset_fn(state)
@@ -47,11 +52,15 @@ def execute_decision(
     if intent == "BOOKING_ROOM":
         reset_fn(state)
         state["type"] = "room"
+        if entities_fn:
+            entities_fn(message, state, decision.get("entities") or {})
         return translate_fn(reservation_flow_fn(message, state))
 
     if intent == "BOOKING_TABLE":
         reset_fn(state)
         state["type"] = "table"
+        if entities_fn:
+            entities_fn(message, state, decision.get("entities") or {})
         return translate_fn(reservation_flow_fn(message, state))
 
     if intent == "BOOKING_CONTINUE":
@@ -0,0 +1,196 @@
+"""
+Lokalni klasifikator rezervacijske namere (NONE / BOOKING_ROOM / BOOKING_TABLE).
+
+Nadomešča LLM klic `route_reservation`, kadar je dovolj zanesljiv: znakovni
+n-grami (2–4, brez šumnikov) se zgostijo (crc32) v fiksno število predalov,
+nad njimi je linearni softmax model. Model nauči `scripts/train_router_classifier.py`
+(NumPy) iz data/router_debug.log in tests/fixtures/router_intents.jsonl ter ga
+shrani v verzionirano datoteko data/reservation_classifier.json; aplikacija ga
+naloži ob zagonu. Pod pragom `ROUTER_CLASSIFIER_THRESHOLD` odloča LLM.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import re
+import unicodedata
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # brez NumPy ni učenja; napovedi tečejo tudi brez
+    np = None
+
+CLASSIFIER_PATH = Path(__file__).resolve().parents[2] / "data" / "reservation_classifier.json"
+CLASSIFIER_FORMAT = 1
+LABELS = ("NONE", "BOOKING_ROOM", "BOOKING_TABLE")
+NGRAM_RANGE = (2, 4)
+BUCKETS = 4096
+USE_LOCAL_ROUTER = os.environ.get("ROUTER_CLASSIFIER", "true").strip().lower() in {"1", "true", "yes", "on"}
+ROUTER_CLASSIFIER_THRESHOLD = float(os.environ.get("ROUTER_CLASSIFIER_THRESHOLD", "0.85"))
+
+
+def normalize_text(text: str) -> str:
+    folded = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(ch for ch in folded if not unicodedata.combining(ch))
+
+
+def features(text: str, buckets: int = BUCKETS, ngram_range: tuple[int, int] = NGRAM_RANGE) -> list[int]:
+    """Indeksi predalov za besede in znakovne n-grame (vsak predal enkrat)."""
+    low, high = ngram_range
+    indices: set[int] = set()
+    crc32 = zlib.crc32
+    for token in re.findall(r"\w+", normalize_text(text)):
+        indices.add(crc32(f"w:{token}".encode("utf-8")) % buckets)
+        padded = f" {token} ".encode("utf-8")
+        for size in range(low, high + 1):
+            for start in range(len(padded) - size + 1):
+                indices.add(crc32(padded[start:start + size]) % buckets)
+    return sorted(indices)
+
+
+class IntentClassifier:
+    def __init__(
+        self,
+        weights: list[list[float]],
+        bias: list[float],
+        labels: Iterable[str] = LABELS,
+        buckets: int = BUCKETS,
+        ngram_range: tuple[int, int] = NGRAM_RANGE,
+        meta: Optional[dict[str, Any]] = None,
+    ) -> None:
+        self.labels = tuple(labels)
+        self.buckets = buckets
+        self.ngram_range = tuple(ngram_range)
+        # vrstica na predal -> hitro seštevanje brez NumPy
+        self.weights = [tuple(row) for row in weights]
+        self.bias = tuple(bias)
+        self.meta = meta or {}
+
+    @property
+    def version(self) -> str:
+        return str(self.meta.get("model_version") or "")
+
+    def predict(self, text: str) -> tuple[str, float]:
+        """(oznaka, verjetnost) za sporočilo."""
+        indices = features(text, self.buckets, self.ngram_range)
+        scores = list(self.bias)
+        if indices:
+            scale = 1.0 / math.sqrt(len(indices))
+            rows = [self.weights[index] for index in indices]
+            scores = [bias + sum(column) * scale for bias, column in zip(scores, zip(*rows))]
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        best = max(range(len(scores)), key=scores.__getitem__)
+        return self.labels[best], exps[best] / sum(exps)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "format": CLASSIFIER_FORMAT,
+            **self.meta,
+            "labels": list(self.labels),
+            "buckets": self.buckets,
+            "ngram_range": list(self.ngram_range),
+            "bias": [round(value, 5) for value in self.bias],
+            "weights": [[round(value, 5) for value in row] for row in self.weights],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "IntentClassifier":
+        if data.get("format") != CLASSIFIER_FORMAT:
+            raise ValueError(f"nepodprta verzija klasifikatorja: {data.get('format')}")
+        meta = {key: value for key, value in data.items() if key not in {"format", "labels", "buckets", "ngram_range", "bias", "weights"}}
+        return cls(
+            data["weights"],
+            data["bias"],
+            labels=data["labels"],
+            buckets=int(data["buckets"]),
+            ngram_range=tuple(data["ngram_range"]),
+            meta=meta,
+        )
+
+    def save(self, path: Path = CLASSIFIER_PATH) -> None:
+        path.write_text(json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":")) + "\n", encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path = CLASSIFIER_PATH) -> Optional["IntentClassifier"]:
+        if not path.exists():
+            print(f"[ROUTER_CLF] {path.name} ne obstaja – rezervacijsko namero določa LLM")
+            return None
+        try:
+            return cls.from_dict(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, KeyError) as exc:
+            print(f"[ROUTER_CLF] napaka pri branju {path.name}: {exc}")
+            return None
+
+
+def train(
+    examples: list[tuple[str, str]],
+    epochs: int = 400,
+    learning_rate: float = 1.0,
+    l2: float = 1e-4,
+    buckets: int = BUCKETS,
+) -> IntentClassifier:
+    """Softmax regresija (paketni gradientni spust, uravnotežene uteži razredov)."""
+    if np is None:
+        raise RuntimeError("za učenje klasifikatorja je potreben NumPy")
+    label_index = {label: index for index, label in enumerate(LABELS)}
+    x = np.zeros((len(examples), buckets), dtype=np.float64)
+    y = np.zeros(len(examples), dtype=np.int64)
+    for row, (text, label) in enumerate(examples):
+        indices = features(text, buckets)
+        if indices:
+            x[row, indices] = 1.0 / math.sqrt(len(indices))
+        y[row] = label_index[label]
+    counts = np.bincount(y, minlength=len(LABELS)).astype(np.float64)
+    class_weights = len(y) / (len(LABELS) * np.maximum(counts, 1.0))
+    sample_weights = class_weights[y] / class_weights[y].sum()
+    targets = np.eye(len(LABELS))[y]
+
+    weights = np.zeros((buckets, len(LABELS)))
+    bias = np.zeros(len(LABELS))
+    for _ in range(epochs):
+        scores = x @ weights + bias
+        scores -= scores.max(axis=1, keepdims=True)
+        probs = np.exp(scores)
+        probs /= probs.sum(axis=1, keepdims=True)
+        grad = (probs - targets) * sample_weights[:, None]
+        weights -= learning_rate * (x.T @ grad + l2 * weights)
+        bias -= learning_rate * grad.sum(axis=0)
+
+    digest = hashlib.sha1(json.dumps(sorted(examples), ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+    meta = {
+        "model_version": f"{datetime.now().strftime('%Y%m%d')}-{digest}",
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+        "examples": {label: int(counts[index]) for index, label in enumerate(LABELS)},
+    }
+    return IntentClassifier(weights.tolist(), bias.tolist(), buckets=buckets, meta=meta)
+
+
+@lru_cache(maxsize=1)
+def get_intent_classifier() -> Optional[IntentClassifier]:
+    """Naložen enkrat na proces (ob zagonu aplikacije)."""
+    if not USE_LOCAL_ROUTER:
+        return None
+    classifier = IntentClassifier.load()
+    if classifier is not None:
+        print(f"[ROUTER_CLF] model {classifier.version}, prag {ROUTER_CLASSIFIER_THRESHOLD}")
+    return classifier
+
+
+def classify_reservation(message: str, threshold: float = ROUTER_CLASSIFIER_THRESHOLD) -> Optional[dict[str, Any]]:
+    """{"action", "confidence"} iz lokalnega modela ali None (naj odloči LLM)."""
+    classifier = get_intent_classifier()
+    if classifier is None:
+        return None
+    label, confidence = classifier.predict(message)
+    if confidence < threshold:
+        print(f"[ROUTER_CLF] {label} {confidence:.2f} < {threshold} -> LLM")
+        return None
+    return {"action": label, "confidence": round(confidence, 3)}
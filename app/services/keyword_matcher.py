@@ -0,0 +1,186 @@
+"""
+Ključne besede detektorjev namer v enem prehodu čez sporočilo.
+
+Detektorji (detect_intent, detect_info_intent, router_agent ...) so sporočilo
+pregledovali z `any(kw in lower for kw in ...)` – vsak znova, čez desetine
+seznamov. Skupine ključnih besed se zdaj registrirajo ob uvozu modulov in
+prevedejo v en Aho-Corasick avtomat; besedilo se pregleda enkrat (rezultat je
+predpomnjen po besedilu), detektorji pa le preverijo zadete skupine:
+
+    hits = scan_keywords(message.lower())
+    if hits.has("info.wifi"): ...
+
+Pomen ostaja enak: ključna beseda je zadeta, če je podniz besedila, oz. cela
+beseda (kot `\\b...\\b`), če je skupina registrirana z whole_word=True.
+"""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator, Mapping, Optional
+
+SCAN_CACHE_SIZE = 512
+
+
+class AhoCorasick:
+    """Avtomat za iskanje vseh (tudi prekrivajočih se) pojavitev nizov."""
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[str, ...]] = [()]
+        for keyword in dict.fromkeys(keyword for keyword in keywords if keyword):
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] += (keyword,)
+
+        # povezave ob neujemanju (BFS); izhodi podedujejo izhode končnic
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, str]]:
+        """(začetni indeks, ključna beseda) za vsako pojavitev."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword in out[state]:
+                yield index - len(keyword) + 1, keyword
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _on_word_boundaries(text: str, start: int, keyword: str) -> bool:
+    """Enako kot regex `\\bkeyword\\b` na tem mestu."""
+    end = start + len(keyword)
+    before = _is_word_char(text[start - 1]) if start > 0 else False
+    after = _is_word_char(text[end]) if end < len(text) else False
+    return before != _is_word_char(keyword[0]) and after != _is_word_char(keyword[-1])
+
+
+@dataclass(frozen=True)
+class KeywordHits:
+    """Zadete skupine za eno besedilo: skupina -> zadete ključne besede."""
+
+    text: str
+    groups: Mapping[str, frozenset[str]]
+
+    def has(self, *names: str) -> bool:
+        groups = self.groups
+        for name in names:
+            if name in groups:
+                return True
+        return False
+
+    def count(self, name: str) -> int:
+        return len(self.groups.get(name, ()))
+
+    def matched(self, name: str) -> frozenset[str]:
+        return self.groups.get(name, frozenset())
+
+
+class KeywordRegistry:
+    """Poimenovane skupine ključnih besed, prevedene v en avtomat."""
+
+    def __init__(self) -> None:
+        self._groups: dict[str, tuple[tuple[str, ...], bool]] = {}
+        # ključna beseda -> [(skupina, whole_word)]
+        self._members: dict[str, list[tuple[str, bool]]] = {}
+        self._automaton: Optional[AhoCorasick] = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, keywords: Iterable[str], whole_word: bool = False) -> bool:
+        """Doda ali zamenja skupino; vrne True, če je treba avtomat znova prevesti."""
+        words = tuple(sorted({keyword for keyword in keywords if keyword}))
+        with self._lock:
+            if self._groups.get(name) == (words, whole_word):
+                return False
+            self._groups[name] = (words, whole_word)
+            self._automaton = None
+            return True
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._groups
+
+    def compile(self) -> AhoCorasick:
+        with self._lock:
+            if self._automaton is None:
+                members: dict[str, list[tuple[str, bool]]] = {}
+                for name, (words, whole_word) in self._groups.items():
+                    for word in words:
+                        members.setdefault(word, []).append((name, whole_word))
+                self._members = members
+                self._automaton = AhoCorasick(members)
+                print(f"[KEYWORDS] {len(self._groups)} skupin, {len(members)} besed, {len(self._automaton)} stanj")
+            return self._automaton
+
+    def scan(self, text: str) -> KeywordHits:
+        automaton = self.compile()
+        members = self._members
+        found: dict[str, set[str]] = {}
+        for start, keyword in automaton.iter_matches(text):
+            boundary: Optional[bool] = None
+            for name, whole_word in members[keyword]:
+                if whole_word:
+                    if boundary is None:
+                        boundary = _on_word_boundaries(text, start, keyword)
+                    if not boundary:
+                        continue
+                found.setdefault(name, set()).add(keyword)
+        return KeywordHits(text, {name: frozenset(words) for name, words in found.items()})
+
+
+_REGISTRY = KeywordRegistry()
+
+
+def keyword_group(name: str, keywords: Iterable[str], whole_word: bool = False) -> str:
+    """Registrira skupino in vrne njeno ime."""
+    if _REGISTRY.register(name, keywords, whole_word):
+        scan_keywords.cache_clear()
+    return name
+
+
+def keyword_groups(prefix: str, groups: Mapping[str, Iterable[str]], whole_word: bool = False) -> dict[str, str]:
+    """Več skupin z isto predpono: {"wifi": [...]} -> "<prefix>.wifi"."""
+    return {key: keyword_group(f"{prefix}.{key}", words, whole_word) for key, words in groups.items()}
+
+
+def registered_keywords() -> set[str]:
+    """Vse ključne besede vseh skupin (npr. kot znane besede za popravke)."""
+    return {word for words, _ in _REGISTRY._groups.values() for word in words}
+
+
+def compile_keywords() -> int:
+    """Prevede avtomat vnaprej (ob uvozu detektorjev); vrne število stanj."""
+    return len(_REGISTRY.compile())
+
+
+@lru_cache(maxsize=SCAN_CACHE_SIZE)
+def scan_keywords(text: str) -> KeywordHits:
+    """En prehod čez besedilo; isto besedilo si detektorji delijo iz predpomnilnika."""
+    return _REGISTRY.scan(text)
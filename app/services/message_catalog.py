@@ -0,0 +1,133 @@
+"""
+Katalog fiksnih sporočil v si/en/de.
+
+Slovenska besedila ostanejo v kodi (INFO_RESPONSES, STATIC_REPLIES, koraki
+rezervacije ...); prevode enkrat zgradi `scripts/build_message_catalog.py` in
+jih shrani v verzionirano datoteko data/message_catalog.json. Ob odgovoru
+se fiksno besedilo poišče po ključu ali po slovenskem izvoru, zato prevod
+ne stane nobenega LLM klica. Če se izvor v kodi spremeni, vnos ne ustreza
+več (source_hash) in se uporabi LLM prevod, dokler katalog ni ponovno zgrajen.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional
+
+CATALOG_PATH = Path(__file__).resolve().parents[2] / "data" / "message_catalog.json"
+LANGUAGES = ("si", "en", "de")
+SOURCE_LANGUAGE = "si"
+# sestavljeni odgovori: najprej celotno besedilo, nato deli po teh ločilih
+SEGMENT_SEPARATORS = ("\n\n---\n\n", "\n\n", "\n")
+
+
+def source_hash(text: str) -> str:
+    return hashlib.sha1(text.strip().encode("utf-8")).hexdigest()[:12]
+
+
+class MessageCatalog:
+    def __init__(self, data: Optional[dict[str, Any]] = None) -> None:
+        data = data or {}
+        self.version = int(data.get("version") or 0)
+        self.messages: dict[str, dict[str, str]] = data.get("messages") or {}
+        self._by_source: dict[str, str] = {}
+        # posamezne vrstice večvrstičnih sporočil (za odgovore, sestavljene iz vrstic)
+        self._lines: dict[str, dict[str, str]] = {}
+        for key, entry in self.messages.items():
+            source = (entry.get(SOURCE_LANGUAGE) or "").strip()
+            if not source or entry.get("source_hash") != source_hash(source):
+                continue
+            self._by_source.setdefault(source, key)
+            source_lines = source.split("\n")
+            if len(source_lines) < 2:
+                continue
+            for lang in LANGUAGES:
+                target_lines = (entry.get(lang) or "").strip().split("\n")
+                if lang == SOURCE_LANGUAGE or len(target_lines) != len(source_lines):
+                    continue
+                for source_line, target_line in zip(source_lines, target_lines):
+                    if source_line.strip():
+                        self._lines.setdefault(source_line.strip(), {}).setdefault(lang, target_line.strip())
+
+    @classmethod
+    def load(cls, path: Path = CATALOG_PATH) -> "MessageCatalog":
+        if not path.exists():
+            print(f"[CATALOG] {path.name} ne obstaja – fiksni odgovori se prevajajo z LLM")
+            return cls()
+        try:
+            return cls(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError) as exc:
+            print(f"[CATALOG] napaka pri branju {path.name}: {exc}")
+            return cls()
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def get(self, key: str, lang: str, default: Optional[str] = None) -> Optional[str]:
+        """Sporočilo po ključu in jeziku (si, če prevoda ni)."""
+        entry = self.messages.get(key)
+        if not entry:
+            return default
+        return entry.get(lang) or entry.get(SOURCE_LANGUAGE) or default
+
+    def key_for(self, text: str) -> Optional[str]:
+        return self._by_source.get(text.strip())
+
+    def translate(self, text: str, lang: str) -> Optional[str]:
+        """
+        Prevod fiksnega besedila (ali iz fiksnih delov sestavljenega odgovora).
+        Vrne None, če katerega od delov ni v katalogu.
+        """
+        if lang == SOURCE_LANGUAGE or not text:
+            return text
+        if lang not in LANGUAGES:
+            return None
+        stripped = text.strip()
+        if not stripped:
+            return text
+        translated = self._translate_part(stripped, lang, 0)
+        if translated is None:
+            return None
+        # ohranimo začetne/končne prazne vrstice izvora
+        leading = text[: len(text) - len(text.lstrip())]
+        trailing = text[len(text.rstrip()):]
+        return f"{leading}{translated}{trailing}"
+
+    def _translate_part(self, text: str, lang: str, depth: int) -> Optional[str]:
+        key = self._by_source.get(text)
+        if key:
+            return self.messages[key].get(lang)
+        if text in self._lines:
+            return self._lines[text].get(lang)
+        for separator in SEGMENT_SEPARATORS[depth:]:
+            if separator not in text:
+                continue
+            parts = []
+            for part in text.split(separator):
+                if not part.strip():
+                    parts.append(part)
+                    continue
+                translated = self._translate_part(part.strip(), lang, SEGMENT_SEPARATORS.index(separator) + 1)
+                if translated is None:
+                    return None
+                parts.append(translated)
+            return separator.join(parts)
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_message_catalog() -> MessageCatalog:
+    catalog = MessageCatalog.load()
+    if len(catalog):
+        print(f"[CATALOG] v{catalog.version}: {len(catalog)} sporočil")
+    return catalog
+
+
+def catalog_translate(text: str, lang: str) -> Optional[str]:
+    return get_message_catalog().translate(text, lang)
+
+
+def catalog_message(key: str, lang: str, default: Optional[str] = None) -> Optional[str]:
+    return get_message_catalog().get(key, lang, default)
@@ -0,0 +1,351 @@
+"""
+Verzionirane migracije sheme (SQLite + Postgres).
+
+Vsak korak ima zaporedno številko in je idempotenten; uporabljene verzije se
+beležijo v tabeli `schema_version`. Migracije tečejo enkrat na proces
+(ob zagonu aplikacije ali ob prvi povezavi), ne ob vsakem ReservationService().
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from app.services.reservation_service import ReservationService
+
+# obdobja za statistiko uporabe: ključ je predpona + začetek created_at ("d:2025-07-14", "m:2025-07", "y:2025")
+USAGE_PERIODS = (("d:", 10), ("m:", 7), ("y:", 4))
+
+# ključ za pg_advisory_lock, da ob hkratnem zagonu več workerjev migrira le eden
+PG_MIGRATION_LOCK_ID = 7305001
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Any, "ReservationService"], None]
+
+
+def _id_column(service: "ReservationService") -> str:
+    return "SERIAL PRIMARY KEY" if service.use_postgres else "INTEGER PRIMARY KEY AUTOINCREMENT"
+
+
+def _existing_columns(cur, service: "ReservationService", table: str) -> set[str]:
+    if service.use_postgres:
+        cur.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table,)
+        )
+        return {dict(row)["column_name"] for row in cur.fetchall()}
+    cur.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cur.fetchall()}
+
+
+def _add_columns(cur, service: "ReservationService", table: str, columns: list[tuple[str, str]]) -> None:
+    existing = _existing_columns(cur, service, table)
+    for col, definition in columns:
+        if col not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {col} {definition}")
+
+
+# --- koraki --------------------------------------------------------------
+def _m001_base_tables(cur, service: "ReservationService") -> None:
+    id_col = _id_column(service)
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS reservations (
+            id {id_col},
+            date TEXT NOT NULL,
+            nights INTEGER,
+            people INTEGER NOT NULL,
+            reservation_type TEXT NOT NULL,
+            time TEXT,
+            location TEXT,
+            name TEXT,
+            phone TEXT,
+            email TEXT,
+            note TEXT,
+            created_at TEXT NOT NULL,
+            source TEXT NOT NULL
+        )
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS conversations (
+            id {id_col},
+            session_id TEXT,
+            user_message TEXT NOT NULL,
+            bot_response TEXT NOT NULL,
+            intent TEXT,
+            needs_followup BOOLEAN DEFAULT FALSE,
+            followup_email TEXT,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS inquiries (
+            id {id_col},
+            session_id TEXT,
+            details TEXT NOT NULL,
+            deadline TEXT,
+            contact_name TEXT,
+            contact_email TEXT,
+            contact_phone TEXT,
+            contact_raw TEXT,
+            status TEXT DEFAULT 'new',
+            created_at TEXT NOT NULL,
+            source TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m002_reservation_columns(cur, service: "ReservationService") -> None:
+    _add_columns(
+        cur,
+        service,
+        "reservations",
+        [
+            ("rooms", "INTEGER"),
+            ("status", "TEXT DEFAULT 'pending'"),
+            ("admin_notes", "TEXT"),
+            ("confirmed_at", "TEXT"),
+            ("confirmed_by", "TEXT"),
+            ("guest_message", "TEXT"),
+            ("country", "TEXT"),
+            ("kids", "TEXT"),
+            ("kids_small", "TEXT"),
+            ("confirm_via", "TEXT"),
+            ("event_type", "TEXT"),
+            ("special_needs", "TEXT"),
+            # Urška-specific fields
+            ("wellness_duration_hours", "INTEGER"),
+            ("meal_type", "TEXT"),
+            ("package_type", "TEXT"),
+            ("package_price", "REAL"),
+            ("room_preference", "TEXT"),
+            ("accommodation_type", "TEXT"),
+        ],
+    )
+
+
+def _m003_iso_dates(cur, service: "ReservationService") -> None:
+    # ISO datumi (yyyy-mm-dd) za range poizvedbe v SQL; end_date je ekskluziven
+    _add_columns(cur, service, "reservations", [("start_date", "TEXT"), ("end_date", "TEXT")])
+    cur.execute("SELECT id, date, nights FROM reservations WHERE start_date IS NULL")
+    updates = []
+    for row in cur.fetchall():
+        row = dict(row)
+        start_date, end_date = service._date_columns(row.get("date"), row.get("nights"))
+        if start_date:
+            updates.append((start_date, end_date, row["id"]))
+    if updates:
+        ph = service._placeholder()
+        cur.executemany(f"UPDATE reservations SET start_date = {ph}, end_date = {ph} WHERE id = {ph}", updates)
+        print(f"[DB] backfill start_date/end_date: {len(updates)} rezervacij")
+
+
+def _m004_indexes(cur, service: "ReservationService") -> None:
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reservations_type_status_start "
+        "ON reservations (reservation_type, status, start_date)"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_conversations_created_at ON conversations (created_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations (session_id)")
+
+
+def _m005_legacy_csv(cur, service: "ReservationService") -> None:
+    """Enkraten uvoz starega reservations.csv v prazno bazo."""
+    cur.execute("SELECT COUNT(1) AS n FROM reservations")
+    if dict(cur.fetchone())["n"] > 0:
+        return
+    legacy_rows = service._read_legacy_csv()
+    if not legacy_rows:
+        return
+    ph = service._placeholder()
+    insert_sql = (
+        "INSERT INTO reservations (date, nights, people, reservation_type, time, location, name, phone, email, "
+        f"created_at, source, start_date, end_date) VALUES ({', '.join([ph] * 13)})"
+    )
+    for row in legacy_rows:
+        nights = int(row.get("nights") or 0) or None
+        start_date, end_date = service._date_columns(row.get("date", ""), nights)
+        cur.execute(
+            insert_sql,
+            (
+                row.get("date", ""),
+                nights,
+                int(row.get("people") or 0),
+                row.get("reservation_type") or row.get("type") or "room",
+                row.get("time") or None,
+                row.get("location") or None,
+                row.get("name") or None,
+                row.get("phone") or None,
+                row.get("email") or None,
+                row.get("created_at") or datetime.now().isoformat(),
+                row.get("source") or "import",
+                start_date,
+                end_date,
+            ),
+        )
+    print(f"[DB] uvoz reservations.csv: {len(legacy_rows)} rezervacij")
+
+
+def _m006_usage_rollups(cur, service: "ReservationService") -> None:
+    """Rollup tabele za statistiko uporabe + izračun iz obstoječih pogovorov."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS usage_sessions (
+            period TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            PRIMARY KEY (period, session_id)
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS usage_rollup (
+            period TEXT PRIMARY KEY,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            messages INTEGER NOT NULL DEFAULT 0,
+            followups INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS usage_intents (
+            day TEXT NOT NULL,
+            intent TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, intent)
+        )
+        """
+    )
+    # backfill od začetka (idempotentno: tabele najprej izpraznimo)
+    cur.execute("DELETE FROM usage_sessions")
+    cur.execute("DELETE FROM usage_rollup")
+    cur.execute("DELETE FROM usage_intents")
+    for prefix, length in USAGE_PERIODS:
+        period_sql = f"'{prefix}' || substr(created_at, 1, {length})"
+        cur.execute(
+            f"""
+            INSERT INTO usage_sessions (period, session_id)
+            SELECT DISTINCT {period_sql}, session_id FROM conversations
+            WHERE session_id IS NOT NULL AND session_id != ''
+            """
+        )
+        cur.execute(
+            f"""
+            INSERT INTO usage_rollup (period, sessions, messages, followups)
+            SELECT p, 0, COUNT(*), SUM(CASE WHEN f THEN 1 ELSE 0 END)
+            FROM (SELECT {period_sql} AS p, needs_followup AS f FROM conversations) AS t
+            GROUP BY p
+            """
+        )
+    cur.execute(
+        """
+        UPDATE usage_rollup SET sessions = (
+            SELECT COUNT(*) FROM usage_sessions s WHERE s.period = usage_rollup.period
+        )
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO usage_intents (day, intent, count)
+        SELECT substr(created_at, 1, 10), COALESCE(intent, ''), COUNT(*)
+        FROM conversations GROUP BY substr(created_at, 1, 10), COALESCE(intent, '')
+        """
+    )
+
+
+def _m007_chat_sessions(cur, service: "ReservationService") -> None:
+    """Pogovorne seje za CHAT_SESSION_STORE=db (deljene med workerji)."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            session_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated_at ON chat_sessions (updated_at)")
+
+
+def _m008_answer_cache(cur, service: "ReservationService") -> None:
+    """Predpomnjeni LLM odgovori za ANSWER_CACHE=db (deljeni med workerji)."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS answer_cache (
+            cache_key TEXT PRIMARY KEY,
+            kb_version TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_answer_cache_expires_at ON answer_cache (expires_at)")
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "base tables", _m001_base_tables),
+    Migration(2, "reservation columns", _m002_reservation_columns),
+    Migration(3, "iso start/end dates", _m003_iso_dates),
+    Migration(4, "indexes", _m004_indexes),
+    Migration(5, "legacy csv import", _m005_legacy_csv),
+    Migration(6, "usage rollups", _m006_usage_rollups),
+    Migration(7, "chat sessions", _m007_chat_sessions),
+    Migration(8, "answer cache", _m008_answer_cache),
+]
+
+
+def run_migrations(conn, service: "ReservationService") -> list[int]:
+    """Izvede manjkajoče migracije in vrne seznam uporabljenih verzij."""
+    ph = service._placeholder()
+    cur = conn.cursor()
+    applied_now: list[int] = []
+    try:
+        if service.use_postgres:
+            cur.execute("SELECT pg_advisory_lock(%s)", (PG_MIGRATION_LOCK_ID,))
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.commit()
+        cur.execute("SELECT version FROM schema_version")
+        done = {dict(row)["version"] for row in cur.fetchall()}
+        for migration in MIGRATIONS:
+            if migration.version in done:
+                continue
+            migration.apply(cur, service)
+            cur.execute(
+                f"INSERT INTO schema_version (version, name, applied_at) VALUES ({ph}, {ph}, {ph}) "
+                "ON CONFLICT (version) DO NOTHING",
+                (migration.version, migration.name, datetime.now().isoformat(timespec="seconds")),
+            )
+            conn.commit()
+            applied_now.append(migration.version)
+        if applied_now:
+            print(f"[DB] migracije: {applied_now}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if service.use_postgres:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (PG_MIGRATION_LOCK_ID,))
+            conn.commit()
+        cur.close()
+    return applied_now
+
@@ -0,0 +1,255 @@
+"""
+Indeks zasedenosti sob v pomnilniku.
+
+Zgradi se enkrat (ob zagonu ali ob prvem poizvedovanju) iz baze, nato ga
+ReservationService sproti posodablja ob vsakem zapisu. Dnevi so ključani
+z ordinalom datuma (date.toordinal()), zato poizvedbe ne potrebujejo
+strptime/strftime in stanejo O(nočitev).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable, Iterable, Optional
+
+from app.services.room_assignment import assign_rooms
+
+
+@dataclass
+class RoomStay:
+    """Ena (nepreklicana) rezervacija sobe, pretvorjena v interval dni."""
+
+    reservation_id: int
+    start: int  # ordinal dneva prihoda
+    nights: int
+    rooms_needed: int
+    preferred: tuple[str, ...] = field(default_factory=tuple)
+
+    @property
+    def end(self) -> int:
+        """Ordinal dneva odhoda (ekskluzivno)."""
+        return self.start + self.nights
+
+    def days(self) -> range:
+        return range(self.start, self.end)
+
+
+def to_ordinal(value: date | datetime) -> int:
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal()
+
+
+class RoomOccupancyIndex:
+    """
+    Per-room in skupna zasedenost po dnevih.
+
+    - `_used[ordinal]` = število zasedenih sob na ta dan (za check_room_availability)
+    - `_calendar[room_id][ordinal]` = id rezervacije, ki zaseda sobo (za available_rooms)
+
+    Sobe se ob gradnji dodelijo z `assign_rooms` (želene sobe najprej, ostalo po
+    času prihoda). Nova rezervacija se doda v prvo prosto sobo; če ne gre, se
+    sobe nepotrjenih lokacij prerazporedijo na novo.
+    """
+
+    def __init__(self, room_ids: Iterable[str], max_age_seconds: Optional[float] = None) -> None:
+        self.room_ids: list[str] = list(room_ids)
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._stays: dict[int, RoomStay] = {}
+        self._assigned: dict[int, list[str]] = {}
+        self._used: dict[int, int] = {}
+        self._calendar: dict[str, dict[int, int]] = {rid: {} for rid in self.room_ids}
+        self._loaded_at: Optional[float] = None
+
+    # --- življenjski cikel ----------------------------------------------
+    @property
+    def is_loaded(self) -> bool:
+        if self._loaded_at is None:
+            return False
+        if self.max_age_seconds and time.monotonic() - self._loaded_at > self.max_age_seconds:
+            # drugi procesi (več workerjev) lahko pišejo v isto bazo -> občasno osvežimo
+            return False
+        return True
+
+    def ensure_loaded(self, loader: Callable[[], Iterable[RoomStay]]) -> None:
+        if self.is_loaded:
+            return
+        with self._lock:
+            if self.is_loaded:
+                return
+            self.rebuild(loader())
+
+    def rebuild(self, stays: Iterable[RoomStay]) -> None:
+        # nove strukture se zgradijo ob strani in zamenjajo naenkrat, da poizvedba
+        # med osvežitvijo ne vidi praznega ali napol zgrajenega koledarja
+        by_id: dict[int, RoomStay] = {}
+        used: dict[int, int] = {}
+        for stay in stays:
+            by_id[stay.reservation_id] = stay
+            for day in stay.days():
+                used[day] = used.get(day, 0) + stay.rooms_needed
+        assigned, calendar = self._assignment(by_id)
+        with self._lock:
+            self._stays, self._used = by_id, used
+            self._assigned, self._calendar = assigned, calendar
+            self._loaded_at = time.monotonic()
+
+    def _assignment(self, stays: dict[int, RoomStay]) -> tuple[dict[int, list[str]], dict[str, dict[int, int]]]:
+        assigned = assign_rooms(self.room_ids, stays.values())
+        calendar: dict[str, dict[int, int]] = {rid: {} for rid in self.room_ids}
+        for reservation_id, rooms in assigned.items():
+            stay = stays[reservation_id]
+            for room_id in rooms:
+                occupied = calendar[room_id]
+                for day in stay.days():
+                    occupied[day] = reservation_id
+        return assigned, calendar
+
+    def _reassign(self) -> None:
+        """Na novo razporedi vse rezervacije po sobah (klicatelj drži _lock)."""
+        self._assigned, self._calendar = self._assignment(self._stays)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    # --- posodobitve ----------------------------------------------------
+    def upsert(self, stay: RoomStay) -> None:
+        with self._lock:
+            if not self.is_loaded:
+                return
+            self._remove(stay.reservation_id)
+            self._add(stay)
+
+    def remove(self, reservation_id: int) -> None:
+        with self._lock:
+            if not self.is_loaded:
+                return
+            self._remove(reservation_id)
+
+    def _add(self, stay: RoomStay) -> None:
+        self._stays[stay.reservation_id] = stay
+        for day in stay.days():
+            self._used[day] = self._used.get(day, 0) + stay.rooms_needed
+        assigned: list[str] = []
+        # najprej želene sobe, nato preostale
+        for room_id in list(stay.preferred) + self.room_ids:
+            if len(assigned) >= stay.rooms_needed:
+                break
+            occupied = self._calendar.get(room_id)
+            if occupied is None or room_id in assigned:
+                continue
+            if all(day not in occupied for day in stay.days()):
+                assigned.append(room_id)
+        if len(assigned) < stay.rooms_needed or not set(stay.preferred[: stay.rooms_needed]) <= set(assigned):
+            # hitra pot ne zadošča -> prerazporedimo vse (lahko sprosti želeno sobo)
+            self._reassign()
+            return
+        for room_id in assigned:
+            occupied = self._calendar[room_id]
+            for day in stay.days():
+                occupied[day] = stay.reservation_id
+        self._assigned[stay.reservation_id] = assigned
+
+    def _remove(self, reservation_id: int) -> None:
+        stay = self._stays.pop(reservation_id, None)
+        if stay is None:
+            return
+        for day in stay.days():
+            left = self._used.get(day, 0) - stay.rooms_needed
+            if left > 0:
+                self._used[day] = left
+            else:
+                self._used.pop(day, None)
+        for room_id in self._assigned.pop(reservation_id, []):
+            occupied = self._calendar[room_id]
+            for day in stay.days():
+                if occupied.get(day) == reservation_id:
+                    del occupied[day]
+
+    # --- poizvedbe ------------------------------------------------------
+    # poizvedbe tečejo tudi v asyncio.to_thread, medtem ko upsert/_reassign
+    # spreminjata strukture na mestu -> branje pod istim zaklepom
+    def rooms_used(self, day: int) -> int:
+        with self._lock:
+            return self._used.get(day, 0)
+
+    def fits(self, start: int, nights: int, rooms_needed: int) -> bool:
+        """True, če je za vse noči dovolj prostih sob (skupna kapaciteta)."""
+        capacity = len(self.room_ids)
+        with self._lock:
+            used = self._used
+            return all(used.get(day, 0) + rooms_needed <= capacity for day in range(start, start + nights))
+
+    def free_rooms(self, start: int, nights: int) -> list[str]:
+        """Sobe, ki so proste vse noči [start, start + nights)."""
+        days = range(start, start + nights)
+        free: list[str] = []
+        with self._lock:
+            for room_id in self.room_ids:
+                occupied = self._calendar[room_id]
+                if all(day not in occupied for day in days):
+                    free.append(room_id)
+        return free
+
+    def used_days(self, start: int, days: int) -> list[int]:
+        """Število zasedenih sob za vsak dan okna [start, start + days)."""
+        with self._lock:
+            used = self._used
+            return [used.get(day, 0) for day in range(start, start + days)]
+
+    def free_days(self, start: int, days: int) -> dict[str, list[bool]]:
+        """Za vsako sobo seznam dolžine `days`: True, če je soba tisti dan prosta."""
+        window = range(start, start + days)
+        with self._lock:
+            return {
+                room_id: [day not in self._calendar[room_id] for day in window]
+                for room_id in self.room_ids
+            }
+
+    def assigned_rooms(self, reservation_id: int) -> list[str]:
+        with self._lock:
+            return list(self._assigned.get(reservation_id, []))
+
+
+def nearest_windows(
+    blocked: list[bool],
+    nights: int,
+    anchor: int,
+    allowed_start: list[bool],
+    limit: int = 3,
+    before: bool = True,
+    after: bool = True,
+) -> list[int]:
+    """
+    Najbližji začetki oken dolžine `nights` brez blokiranih dni.
+
+    `blocked[i]` pove, ali je dan i zaseden (premalo sob / želena soba zasedena),
+    `allowed_start[i]` pa, ali je prihod na dan i dovoljen (pravila, pretekli dnevi).
+    S prefiksnimi vsotami je preverjanje okna O(1), iskanje skupaj O(dni).
+    Vrne indekse začetkov, urejene po oddaljenosti od `anchor` (ob enaki razdalji prej kasnejši).
+    """
+    prefix = [0] * (len(blocked) + 1)
+    for i, is_blocked in enumerate(blocked):
+        prefix[i + 1] = prefix[i] + (1 if is_blocked else 0)
+    last_start = len(blocked) - nights
+
+    def feasible(i: int) -> bool:
+        return 0 <= i <= last_start and allowed_start[i] and prefix[i + nights] == prefix[i]
+
+    found: list[int] = []
+    for distance in range(1, len(blocked) + 1):
+        if len(found) >= limit:
+            break
+        if after and feasible(anchor + distance):
+            found.append(anchor + distance)
+        if len(found) >= limit:
+            break
+        if before and feasible(anchor - distance):
+            found.append(anchor - distance)
+        if anchor + distance > last_start and anchor - distance < 0:
+            break
+    return found
@@ -1,19 +1,38 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
 
 from app.models.reservation import ReservationCreate
-from app.services.reservation_service import ReservationService
+from app.services.reservation_service import ReservationService, get_reservation_service
 
 router = APIRouter(prefix="/reservations", tags=["reservations"])
-reservation_service = ReservationService()
 
 
 @router.get("")
-def list_reservations() -> list[dict]:
+def list_reservations(
+    reservation_service: ReservationService = Depends(get_reservation_service),
+) -> list[dict]:
     return reservation_service.read_reservations()
 
 
+@router.get("/availability")
+def availability(
+    start: str,
+    days: int = 31,
+    reservation_service: ReservationService = Depends(get_reservation_service),
+) -> dict:
+    """Razpoložljivost vseh sob za celo obdobje (npr. mesec) v enem klicu."""
+    if days < 1 or days > 120:
+        raise HTTPException(status_code=400, detail="days mora biti med 1 in 120")
+    matrix = reservation_service.availability_matrix(start, days)
+    if matrix is None:
+        raise HTTPException(status_code=400, detail="Neveljaven datum (DD.MM.YYYY ali YYYY-MM-DD)")
+    return matrix
+
+
 @router.post("")
-def create_reservation(payload: ReservationCreate) -> dict:
+def create_reservation(
+    payload: ReservationCreate,
+    reservation_service: ReservationService = Depends(get_reservation_service),
+) -> dict:
     new_id = reservation_service.create_reservation(
         date=payload.date,
         people=payload.people,
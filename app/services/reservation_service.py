@@ -2,8 +2,9 @@ import csv
 import math
 import os
 import re
+import threading
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Any, Dict, Optional, Tuple
 
 try:
@@ -13,9 +14,22 @@ try:
 except ImportError:
     HAS_POSTGRES = False
 
+from app.core.db_pool import BoundedConnectionPool, ThreadLocalConnectionPool, close_pool, get_pool
 from app.models.reservation import ReservationRecord
+from app.services.conversation_log import ConversationLogWriter
+from app.services.migrations import USAGE_PERIODS, run_migrations
+from app.services.occupancy_index import RoomOccupancyIndex, RoomStay, nearest_windows, to_ordinal
+from app.services.room_assignment import assign_rooms
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
+# Indeks zasedenosti se občasno zgradi na novo, ker lahko v bazo pišejo tudi drugi workerji
+OCCUPANCY_INDEX_MAX_AGE = float(os.environ.get("OCCUPANCY_INDEX_MAX_AGE", "300"))
+_OCCUPANCY_INDEXES: dict[str, RoomOccupancyIndex] = {}
+_MIGRATED: set[str] = set()
+# 0 = pogovori se zapišejo sinhrono (npr. za razhroščevanje)
+CONVERSATION_LOG_ASYNC = os.environ.get("CONVERSATION_LOG_ASYNC", "1") != "0"
+_CONVERSATION_WRITERS: dict[str, ConversationLogWriter] = {}
+_MIGRATION_LOCK = threading.Lock()
 
 # Kmetija Urška - 5 dvoposteljnih sob + 2 družinska suita
 ROOMS = [
@@ -52,6 +66,8 @@ MAX_NIGHTS = 30
 # Za nastanjene: 24/7
 ROOM_CLOSED_DAYS = set()  # Odprto vse dni po dogovoru
 MEAL_DAYS = {4, 5, 6}  # pet, sob, ned (glavni dnevi)
+TABLE_OPEN_DAYS = {5, 6}  # mize za zunanje goste: sobota, nedelja
+LAST_LUNCH_ARRIVAL_HOUR = 15
 OPENING_START_HOUR = 12
 OPENING_END_HOUR = 20
 
@@ -77,27 +93,55 @@ ACCOMMODATION_PRICES = {
 
 
 class ReservationService:
-    def __init__(self) -> None:
+    def __init__(self, db_path: Optional[str] = None) -> None:
         project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
         self.csv_path = os.path.join(project_root, "reservations.csv")
         self.backup_dir = os.path.join(project_root, "backups")
-        os.makedirs(self.backup_dir, exist_ok=True)
 
         # Če ni DATABASE_URL ali psycopg2, uporabimo SQLite (lokalni razvoj)
-        self.use_postgres = bool(DATABASE_URL and HAS_POSTGRES)
+        # Eksplicitna db_path (npr. v testih) vedno pomeni ločeno SQLite bazo
+        self.use_postgres = bool(DATABASE_URL and HAS_POSTGRES and not db_path)
         if not self.use_postgres:
             self.data_dir = os.path.join(project_root, "data")
-            os.makedirs(self.data_dir, exist_ok=True)
-            self.db_path = os.path.join(self.data_dir, "reservations.db")
-
-        self._ensure_db()
-        self._import_csv_if_empty()
+            self.db_path = db_path or os.path.join(self.data_dir, "reservations.db")
+        # shema se pripravi z migracijami ob zagonu aplikacije (ali ob prvi povezavi)
 
     # --- DB helpers ------------------------------------------------------
-    def _conn(self):
+    def _db_key(self) -> str:
+        return DATABASE_URL if self.use_postgres else self.db_path
+
+    def _pool(self):
         if self.use_postgres:
-            conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
-            return conn
+            return get_pool(
+                DATABASE_URL,
+                lambda: BoundedConnectionPool(
+                    lambda: psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+                ),
+            )
+        return get_pool(self.db_path, lambda: ThreadLocalConnectionPool(self._sqlite_connect))
+
+    def _conn(self):
+        """Povezava iz skupnega poola; `conn.close()` jo vrne v pool."""
+        if self._db_key() not in _MIGRATED:
+            self.migrate()
+        return self._pool().acquire()
+
+    def migrate(self) -> list[int]:
+        """Izvede manjkajoče migracije sheme (enkrat na proces za vsako bazo)."""
+        with _MIGRATION_LOCK:
+            if self._db_key() in _MIGRATED:
+                return []
+            if not self.use_postgres:
+                os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = self._pool().acquire()
+            try:
+                applied = run_migrations(conn, self)
+            finally:
+                conn.close()
+            _MIGRATED.add(self._db_key())
+            return applied
+
+    def _sqlite_connect(self):
         import sqlite3
 
         conn = sqlite3.connect(self.db_path)
@@ -107,248 +151,6 @@ class ReservationService:
     def _placeholder(self) -> str:
         return "%s" if self.use_postgres else "?"
 
-    def _ensure_db(self) -> None:
-        new_columns = [
-            ("rooms", "INTEGER"),
-            ("status", "TEXT DEFAULT 'pending'"),
-            ("admin_notes", "TEXT"),
-            ("confirmed_at", "TEXT"),
-            ("confirmed_by", "TEXT"),
-            ("guest_message", "TEXT"),
-            ("country", "TEXT"),
-            ("kids", "TEXT"),
-            ("kids_small", "TEXT"),
-            ("confirm_via", "TEXT"),
-            ("event_type", "TEXT"),
-            ("special_needs", "TEXT"),
-            # Urška-specific fields
-            ("wellness_duration_hours", "INTEGER"),
-            ("meal_type", "TEXT"),
-            ("package_type", "TEXT"),
-            ("package_price", "REAL"),
-            ("room_preference", "TEXT"),
-            ("accommodation_type", "TEXT"),
-        ]
-
-        if self.use_postgres:
-            conn = self._conn()
-            cur = None
-            try:
-                cur = conn.cursor()
-                cur.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS reservations (
-                        id SERIAL PRIMARY KEY,
-                        date TEXT NOT NULL,
-                        nights INTEGER,
-                        rooms INTEGER,
-                        people INTEGER NOT NULL,
-                        reservation_type TEXT NOT NULL,
-                        time TEXT,
-                        location TEXT,
-                        name TEXT,
-                        phone TEXT,
-                        email TEXT,
-                        note TEXT,
-                        status TEXT DEFAULT 'pending',
-                        created_at TEXT NOT NULL,
-                        source TEXT NOT NULL,
-                        admin_notes TEXT,
-                        confirmed_at TEXT,
-                        confirmed_by TEXT,
-                        guest_message TEXT,
-                        country TEXT,
-                        kids TEXT,
-                        kids_small TEXT,
-                        confirm_via TEXT,
-                        event_type TEXT,
-                        special_needs TEXT,
-                        wellness_duration_hours INTEGER,
-                        meal_type TEXT,
-                        package_type TEXT,
-                        package_price REAL,
-                        room_preference TEXT,
-                        accommodation_type TEXT
-                    )
-                    """
-                )
-                cur.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS conversations (
-                        id SERIAL PRIMARY KEY,
-                        session_id TEXT,
-                        user_message TEXT NOT NULL,
-                        bot_response TEXT NOT NULL,
-                        intent TEXT,
-                        needs_followup BOOLEAN DEFAULT FALSE,
-                        followup_email TEXT,
-                        created_at TEXT NOT NULL
-                    )
-                    """
-                )
-                cur.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS inquiries (
-                        id SERIAL PRIMARY KEY,
-                        session_id TEXT,
-                        details TEXT NOT NULL,
-                        deadline TEXT,
-                        contact_name TEXT,
-                        contact_email TEXT,
-                        contact_phone TEXT,
-                        contact_raw TEXT,
-                        status TEXT DEFAULT 'new',
-                        created_at TEXT NOT NULL,
-                        source TEXT NOT NULL
-                    )
-                    """
-                )
-                # dodaj manjkajoče stolpce na obstoječo tabelo (robustnost)
-                for col, definition in new_columns:
-                    cur.execute(
-                        f"ALTER TABLE reservations ADD COLUMN IF NOT EXISTS {col} {definition}"
-                    )
-                conn.commit()
-            finally:
-                if cur:
-                    cur.close()
-                conn.close()
-        else:
-            import sqlite3
-
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS reservations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL,
-                    nights INTEGER,
-                    rooms INTEGER,
-                    people INTEGER NOT NULL,
-                    reservation_type TEXT NOT NULL,
-                    time TEXT,
-                    location TEXT,
-                    name TEXT,
-                    phone TEXT,
-                    email TEXT,
-                    note TEXT,
-                    status TEXT DEFAULT 'pending',
-                    created_at TEXT NOT NULL,
-                    source TEXT NOT NULL,
-                    admin_notes TEXT,
-                    confirmed_at TEXT,
-                    confirmed_by TEXT,
-                    guest_message TEXT,
-                    country TEXT,
-                    kids TEXT,
-                    kids_small TEXT,
-                    confirm_via TEXT,
-                    event_type TEXT,
-                    special_needs TEXT,
-                    wellness_duration_hours INTEGER,
-                    meal_type TEXT,
-                    package_type TEXT,
-                    package_price REAL,
-                    room_preference TEXT,
-                    accommodation_type TEXT
-                )
-                """
-            )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS conversations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT,
-                    user_message TEXT NOT NULL,
-                    bot_response TEXT NOT NULL,
-                    intent TEXT,
-                    needs_followup BOOLEAN DEFAULT FALSE,
-                    followup_email TEXT,
-                    created_at TEXT NOT NULL
-                )
-                """
-            )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS inquiries (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT,
-                    details TEXT NOT NULL,
-                    deadline TEXT,
-                    contact_name TEXT,
-                    contact_email TEXT,
-                    contact_phone TEXT,
-                    contact_raw TEXT,
-                    status TEXT DEFAULT 'new',
-                    created_at TEXT NOT NULL,
-                    source TEXT NOT NULL
-                )
-                """
-            )
-            # dodaj manjkajoče stolpce za stare tabele
-            info = conn.execute("PRAGMA table_info(reservations)").fetchall()
-            existing_cols = {row[1] for row in info}
-            for col, definition in new_columns:
-                if col not in existing_cols:
-                    conn.execute(f"ALTER TABLE reservations ADD COLUMN {col} {definition};")
-            conn.commit()
-            conn.close()
-
-    def _import_csv_if_empty(self) -> None:
-        conn = self._conn()
-        try:
-            cur = conn.cursor()
-            cur.execute("SELECT COUNT(1) FROM reservations")
-            row = cur.fetchone()
-            if isinstance(row, dict):
-                count = list(row.values())[0]
-            elif isinstance(row, (list, tuple)):
-                count = row[0]
-            elif hasattr(row, "__getitem__"):
-                count = row[0]
-            else:
-                count = 0
-            if count > 0 or not os.path.exists(self.csv_path):
-                return
-        finally:
-            cur.close()
-            conn.close()
-        # preberi obstoječi csv in ga zapiši v sqlite
-        legacy_rows = self._read_legacy_csv()
-        if not legacy_rows:
-            return
-        conn = self._conn()
-        ph = self._placeholder()
-        placeholders = ", ".join([ph] * 11)
-        insert_sql = (
-            f"INSERT INTO reservations (date, nights, people, reservation_type, time, location, name, phone, email, created_at, source) "
-            f"VALUES ({placeholders})"
-        )
-        try:
-            cur = conn.cursor()
-            for row in legacy_rows:
-                cur.execute(
-                    insert_sql,
-                    (
-                        row.get("date", ""),
-                        int(row.get("nights") or 0) or None,
-                        int(row.get("people") or 0),
-                        row.get("reservation_type") or row.get("type") or "room",
-                        row.get("time") or None,
-                        row.get("location") or None,
-                        row.get("name") or None,
-                        row.get("phone") or None,
-                        row.get("email") or None,
-                        row.get("created_at") or datetime.now().isoformat(),
-                        row.get("source") or "import",
-                    ),
-                )
-            conn.commit()
-        finally:
-            cur.close()
-            conn.close()
-
     # --- helpers ---------------------------------------------------------
     def _parse_date(self, date_str: str) -> Optional[datetime]:
         try:
@@ -371,8 +173,19 @@ class ReservationService:
             return None
         return f"{hour:02d}:{minute:02d}"
 
-    def _room_min_nights(self, arrival: datetime) -> int:
-        return 3 if arrival.month in {6, 7, 8} else 2
+    def _date_columns(self, date_str: Optional[str], nights: Any) -> tuple[Optional[str], Optional[str]]:
+        """dd.mm.yyyy + nočitve -> (start_date, end_date) v ISO obliki; end_date je ekskluziven."""
+        arrival = self._parse_date(date_str or "")
+        if not arrival:
+            return None, None
+        try:
+            nights_int = int(nights or 1)
+        except (TypeError, ValueError):
+            match = re.search(r"\d+", str(nights or ""))
+            nights_int = int(match.group(0)) if match else 1
+        nights_int = max(1, nights_int)
+        start = arrival.date()
+        return start.isoformat(), (start + timedelta(days=nights_int)).isoformat()
 
     def _rooms_needed(self, people: int) -> int:
         return max(1, math.ceil(people / 4))
@@ -380,85 +193,168 @@ class ReservationService:
     def _normalize_room_location(self, location: Optional[str]) -> list[str]:
         if not location:
             return []
-        lowered = location.lower()
+        # cele besede, sicer "hana" zadene tudi "ana" (URSKA_SUITE -> "urska suite")
+        words = set(re.findall(r"\w+", location.lower().replace("_", " ")))
         selected = []
         for key, rid in ROOM_NAME_MAP.items():
-            if key in lowered and rid not in selected:
+            if key in words and rid not in selected:
                 selected.append(rid)
         return selected
 
-    def _room_calendar(self) -> dict[str, set[str]]:
-        """Vrne slovar room_id -> set datumov (dd.mm.yyyy) ki so zasedeni."""
-        calendar: dict[str, set[str]] = {r["id"]: set() for r in ROOMS}
-        for reservation in self._fetch_reservations():
-            if reservation.reservation_type != "room":
-                continue
-            if reservation.status == "cancelled":
-                continue
-            if not reservation.nights:
-                continue
-            if reservation.nights > MAX_NIGHTS:
-                continue
-            if reservation.nights > MAX_NIGHTS:
-                continue
-            arrival = self._parse_date(reservation.date)
-            if not arrival:
+    # --- occupancy index -------------------------------------------------
+    def _occupancy_index(self) -> RoomOccupancyIndex:
+        """Vrne (po potrebi zgradi) indeks zasedenosti, skupen za cel proces."""
+        key = self._db_key()
+        index = _OCCUPANCY_INDEXES.get(key)
+        if index is None:
+            index = _OCCUPANCY_INDEXES.setdefault(
+                key, RoomOccupancyIndex([r["id"] for r in ROOMS], max_age_seconds=OCCUPANCY_INDEX_MAX_AGE)
+            )
+        index.ensure_loaded(self._load_room_stays)
+        return index
+
+    def warm_occupancy_index(self) -> None:
+        """Zgradi indeks zasedenosti vnaprej (ob zagonu aplikacije)."""
+        self._occupancy_index()
+
+    # --- življenjski cikel ------------------------------------------------
+    def startup(self) -> None:
+        """Ob zagonu aplikacije: migracije, pool povezav in indeks zasedenosti."""
+        self.migrate()
+        self.warm_occupancy_index()
+        print(f"[DB] ReservationService pripravljen ({'postgres' if self.use_postgres else 'sqlite'})")
+
+    def shutdown(self) -> None:
+        """Ob zaustavitvi: sprosti povezave in predpomnilnike te baze."""
+        key = self._db_key()
+        writer = _CONVERSATION_WRITERS.pop(key, None)
+        if writer:
+            writer.close()
+        _OCCUPANCY_INDEXES.pop(key, None)
+        close_pool(key)
+
+    def _room_stay(self, row: Dict[str, Any]) -> Optional[RoomStay]:
+        """Pretvori vrstico rezervacije v RoomStay (None, če ne zaseda sob)."""
+        if row.get("reservation_type") != "room":
+            return None
+        if row.get("status") in ("cancelled", "rejected"):
+            return None
+        try:
+            nights = int(row.get("nights") or 0)
+        except (TypeError, ValueError):
+            return None
+        if nights < 1 or nights > MAX_NIGHTS:
+            return None
+        if row.get("start_date"):
+            arrival = datetime.fromisoformat(row["start_date"])
+        else:
+            arrival = self._parse_date(row.get("date") or "")
+        if not arrival:
+            return None
+        try:
+            rooms = int(row.get("rooms") or 0)
+        except (TypeError, ValueError):
+            rooms = 0
+        try:
+            people = int(row.get("people") or 0)
+        except (TypeError, ValueError):
+            people = 0
+        return RoomStay(
+            reservation_id=int(row["id"]),
+            start=to_ordinal(arrival),
+            nights=nights,
+            rooms_needed=rooms or self._rooms_needed(people),
+            preferred=tuple(
+                self._normalize_room_location(row.get("location"))
+                or self._normalize_room_location(row.get("room_preference"))
+            ),
+        )
+
+    def _load_room_stays(self) -> list[RoomStay]:
+        conn = self._conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SELECT id, date, start_date, nights, rooms, people, reservation_type, location,
+                       room_preference, status
+                FROM reservations
+                WHERE reservation_type = 'room' AND status NOT IN ('cancelled', 'rejected')
+                """
+            )
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+            conn.close()
+        stays = []
+        for row in rows:
+            stay = self._room_stay(dict(row))
+            if stay:
+                stays.append(stay)
+        return stays
+
+    def _refresh_occupancy(self, reservation_id: int, row: Optional[Dict[str, Any]] = None) -> None:
+        """Posodobi indeks za eno rezervacijo po zapisu v bazo."""
+        key = self._db_key()
+        index = _OCCUPANCY_INDEXES.get(key)
+        if index is None or not index.is_loaded:
+            return
+        if row is None:
+            row = self.get_reservation(reservation_id)
+        stay = self._room_stay(row) if row else None
+        if stay:
+            index.upsert(stay)
+        else:
+            index.remove(reservation_id)
+
+    def auto_assign_rooms(self, apply: bool = False) -> list[dict[str, Any]]:
+        """
+        Predlaga (in ob `apply` zapiše) sobe za prihajajoče pending rezervacije brez sobe.
+
+        Upošteva vse aktivne rezervacije sob; tiste z izbrano sobo ostanejo v njej.
+        """
+        rows = self.read_reservations(
+            limit=5000,
+            reservation_type="room",
+            statuses=["pending", "processing", "confirmed"],
+            date_from=datetime.now().date().isoformat(),
+            include_undated=False,
+        )
+        stays = {}
+        targets = []
+        for row in rows:
+            stay = self._room_stay(row)
+            if not stay:
                 continue
-            dates = [(arrival + timedelta(days=offset)).strftime("%d.%m.%Y") for offset in range(reservation.nights)]
-            assigned = self._normalize_room_location(reservation.location)
-            rooms_to_mark = assigned if assigned else [r["id"] for r in ROOMS]
-            rooms_needed = reservation.rooms or self._rooms_needed(reservation.people)
-            # če nimamo točne sobe, zapolnimo prve proste
-            filled = 0
-            for room_id in rooms_to_mark:
-                if filled >= rooms_needed:
-                    break
-                # preveri, ali je soba prosta za vse datume
-                if all(date not in calendar[room_id] for date in dates):
-                    for d in dates:
-                        calendar[room_id].add(d)
-                    filled += 1
-            # če še vedno kaj manjka, zapolnimo preostale
-            if filled < rooms_needed:
-                for room_id in [r["id"] for r in ROOMS]:
-                    if filled >= rooms_needed:
-                        break
-                    if all(date not in calendar[room_id] for date in dates):
-                        for d in dates:
-                            calendar[room_id].add(d)
-                        filled += 1
-        return calendar
+            stays[stay.reservation_id] = stay
+            if row.get("status") == "pending" and not stay.preferred:
+                targets.append(row)
+        assignment = assign_rooms([r["id"] for r in ROOMS], stays.values())
+        proposals = []
+        for row in sorted(targets, key=lambda r: (r.get("start_date") or "", r["id"])):
+            rooms = assignment.get(row["id"], [])
+            proposals.append(
+                {
+                    "id": row["id"],
+                    "name": row.get("name"),
+                    "date": row.get("date"),
+                    "nights": row.get("nights"),
+                    "people": row.get("people"),
+                    "rooms": rooms,
+                    "complete": len(rooms) >= stays[row["id"]].rooms_needed,
+                }
+            )
+        if apply:
+            for proposal in proposals:
+                if proposal["complete"]:
+                    self.update_reservation(proposal["id"], location=", ".join(proposal["rooms"]))
+        return proposals
 
     def available_rooms(self, arrival_str: str, nights: int) -> list[str]:
         arrival = self._parse_date(arrival_str)
         if not arrival:
             return []
-        dates = [(arrival + timedelta(days=offset)).strftime("%d.%m.%Y") for offset in range(nights)]
-        calendar = self._room_calendar()
-        free = []
-        for room_id in [r["id"] for r in ROOMS]:
-            occupied = calendar.get(room_id, set())
-            if all(d not in occupied for d in dates):
-                free.append(room_id)
-        return free
-
-    def _room_occupancy(self) -> dict[str, int]:
-        occupancy: dict[str, int] = defaultdict(int)
-        for reservation in self._fetch_reservations():
-            if reservation.reservation_type != "room":
-                continue
-            if reservation.status == "cancelled":
-                continue
-            if not reservation.nights:
-                continue
-            arrival = self._parse_date(reservation.date)
-            if not arrival:
-                continue
-            rooms_needed = reservation.rooms or self._rooms_needed(reservation.people)
-            for offset in range(reservation.nights):
-                day = (arrival + timedelta(days=offset)).strftime("%d.%m.%Y")
-                occupancy[day] += rooms_needed
-        return occupancy
+        return self._occupancy_index().free_rooms(to_ordinal(arrival), nights)
 
     def _table_room_occupancy(self) -> dict[tuple[str, str, str], int]:
         occupancy: dict[tuple[str, str, str], int] = defaultdict(int)
@@ -490,7 +386,7 @@ class ReservationService:
         if nights > MAX_NIGHTS:
             return False, f"Maksimalno število nočitev v eni rezervaciji je {MAX_NIGHTS}. Prosimo izberite manj dni."
         # Minimalno bivanje: julij/avg = 5 noči, ostalo = 2 noči
-        min_nights = 5 if arrival.month in {7, 8} else 2
+        min_nights = self._min_nights_for(arrival)
         if nights < min_nights:
             if arrival.month in {7, 8}:
                 return (
@@ -500,6 +396,70 @@ class ReservationService:
             return False, "Minimalno bivanje je 2 noči. Prosimo izberite vsaj 2 nočitvi."
         return True, ""
 
+    def _min_nights_for(self, arrival: date | datetime) -> int:
+        """Minimalno bivanje po validate_room_rules (julij/avg = 5, sicer 2)."""
+        return 5 if arrival.month in {7, 8} else 2
+
+    def availability_matrix(self, start_str: str, days: int = 31) -> Optional[dict[str, Any]]:
+        """
+        Matrika sobe × dnevi za okno [start, start + days).
+
+        Vrne proste dni po sobah, najdaljše možno bivanje od vsakega dne, minimalno
+        bivanje za prihod na ta dan in najzgodnejši možen prihod za vsako dolžino bivanja.
+        Vse se izračuna iz indeksa zasedenosti v enem prehodu nazaj po dnevih.
+        """
+        start = self._parse_date(start_str)
+        if not start:
+            try:
+                start = datetime.fromisoformat(start_str)
+            except ValueError:
+                return None
+        days = max(1, days)
+        start_ord = to_ordinal(start)
+        today_ord = to_ordinal(datetime.now())
+        # okno podaljšamo za MAX_NIGHTS, da so dolžine prostih nizov na koncu okna točne
+        horizon = days + MAX_NIGHTS
+        free = self._occupancy_index().free_days(start_ord, horizon)
+
+        max_stay: dict[str, list[int]] = {}
+        for room_id, row in free.items():
+            runs = [0] * (horizon + 1)
+            for i in range(horizon - 1, -1, -1):
+                runs[i] = runs[i + 1] + 1 if row[i] else 0
+            max_stay[room_id] = [min(run, MAX_NIGHTS) for run in runs[:days]]
+
+        day_labels: list[str] = []
+        min_nights: list[Optional[int]] = []
+        free_count: list[int] = []
+        best_stay: list[int] = []
+        earliest: dict[int, Optional[str]] = {n: None for n in range(1, MAX_NIGHTS + 1)}
+        for i in range(days):
+            day = start + timedelta(days=i)
+            label = day.strftime("%d.%m.%Y")
+            day_labels.append(label)
+            free_count.append(sum(1 for row in free.values() if row[i]))
+            best = max((stays[i] for stays in max_stay.values()), default=0)
+            best_stay.append(best)
+            if start_ord + i < today_ord:
+                min_nights.append(None)
+                continue
+            required = self._min_nights_for(day)
+            min_nights.append(required)
+            for nights in range(required, best + 1):
+                if earliest[nights] is None:
+                    earliest[nights] = label
+
+        return {
+            "start": day_labels[0],
+            "days": day_labels,
+            "rooms": {room_id: row[:days] for room_id, row in free.items()},
+            "max_stay": max_stay,
+            "free_rooms": free_count,
+            "best_stay": best_stay,
+            "min_nights": min_nights,
+            "earliest_arrival": {str(n): label for n, label in earliest.items() if label},
+        }
+
     def check_room_availability(
         self, arrival_str: str, nights: int, people: int, rooms: Optional[int] = None
     ) -> tuple[bool, Optional[str]]:
@@ -512,35 +472,84 @@ class ReservationService:
         if rooms_needed > len(ROOMS):
             return False, None
 
-        occupancy = self._room_occupancy()
-        for offset in range(nights):
-            day = (arrival + timedelta(days=offset)).strftime("%d.%m.%Y")
-            used = occupancy.get(day, 0)
-            if used + rooms_needed > len(ROOMS):
-                alternative = self.suggest_room_alternative(arrival, nights, rooms_needed)
-                return False, alternative
+        if not self._occupancy_index().fits(to_ordinal(arrival), nights, rooms_needed):
+            alternative = self.suggest_room_alternative(arrival, nights, rooms_needed)
+            return False, alternative
         return True, None
 
     def suggest_room_alternative(
         self, arrival: datetime, nights: int, rooms_needed: int
     ) -> Optional[str]:
-        occupancy = self._room_occupancy()
-        for delta in range(1, 31):
-            candidate = arrival + timedelta(days=delta)
-            if candidate.weekday() in ROOM_CLOSED_DAYS:
-                continue
-            min_nights = self._room_min_nights(candidate)
-            if nights < min_nights:
-                continue
-            fits = True
-            for offset in range(nights):
-                day = (candidate + timedelta(days=offset)).strftime("%d.%m.%Y")
-                if occupancy.get(day, 0) + rooms_needed > len(ROOMS):
-                    fits = False
-                    break
-            if fits:
-                return candidate.strftime("%d.%m.%Y")
-        return None
+        """Prvi kasnejši prihod (do 30 dni), ko je dovolj prostih sob za vse noči."""
+        windows = self._room_windows(arrival, nights, rooms_needed, limit=1, before=False)
+        return windows[0].strftime("%d.%m.%Y") if windows else None
+
+    def suggest_room_windows(
+        self,
+        arrival_str: str,
+        nights: int,
+        people: int,
+        rooms: Optional[int] = None,
+        limit: int = 3,
+        room_preference: Optional[str] = None,
+        search_days: int = 30,
+    ) -> list[str]:
+        """N najbližjih prostih terminov (pred in po želenem datumu), po želji za izbrano sobo."""
+        arrival = self._parse_date(arrival_str)
+        if not arrival or nights < 1 or people <= 0:
+            return []
+        rooms_needed = rooms or self._rooms_needed(people)
+        windows = self._room_windows(
+            arrival,
+            nights,
+            rooms_needed,
+            limit=limit,
+            preferred=self._normalize_room_location(room_preference),
+            search_days=search_days,
+        )
+        return [w.strftime("%d.%m.%Y") for w in windows]
+
+    def _room_windows(
+        self,
+        arrival: datetime,
+        nights: int,
+        rooms_needed: int,
+        limit: int = 3,
+        before: bool = True,
+        after: bool = True,
+        preferred: Optional[list[str]] = None,
+        search_days: int = 30,
+    ) -> list[datetime]:
+        if rooms_needed > len(ROOMS) or nights < 1:
+            return []
+        index = self._occupancy_index()
+        window_start = arrival - timedelta(days=search_days)
+        start_ord = to_ordinal(window_start)
+        today_ord = to_ordinal(datetime.now())
+        span = 2 * search_days + nights + 1
+        allowed_start = []
+        for i in range(span):
+            day = date.fromordinal(start_ord + i)
+            allowed_start.append(
+                start_ord + i >= today_ord
+                and day.weekday() not in ROOM_CLOSED_DAYS
+                and nights >= self._min_nights_for(day)
+            )
+        capacity = len(ROOMS)
+        blocked = [used + rooms_needed > capacity for used in index.used_days(start_ord, span)]
+        if preferred:
+            # okno mora biti prosto v vsaj eni od želenih sob
+            free = index.free_days(start_ord, span)
+            starts: set[int] = set()
+            for room_id in preferred:
+                room_blocked = [b or not f for b, f in zip(blocked, free[room_id])]
+                starts.update(
+                    nearest_windows(room_blocked, nights, search_days, allowed_start, limit, before, after)
+                )
+            found = sorted(starts, key=lambda i: (abs(i - search_days), i < search_days))[:limit]
+        else:
+            found = nearest_windows(blocked, nights, search_days, allowed_start, limit, before, after)
+        return [window_start + timedelta(days=i) for i in found]
 
     def validate_table_rules(self, date_str: str, time_str: str) -> Tuple[bool, str]:
         dining_day = self._parse_date(date_str)
@@ -589,7 +598,10 @@ class ReservationService:
         return False, None, suggestions
 
     def suggest_table_slots(self, date_str: str, people: int, limit: int = 3) -> list[str]:
+        """Prosti termini za mizo: najprej isti dan, nato odprti dnevi v naslednjih dveh tednih."""
         slots: list[str] = []
+        if not DINING_ROOMS:
+            return slots
         occupancy = self._table_room_occupancy()
         start_times = []
         for hour in range(OPENING_START_HOUR, LAST_LUNCH_ARRIVAL_HOUR + 1):
@@ -597,30 +609,21 @@ class ReservationService:
             if hour != LAST_LUNCH_ARRIVAL_HOUR:
                 start_times.append(f"{hour:02d}:30")
 
-        # 1) isti dan
-        for t in start_times:
-            for room in DINING_ROOMS:
-                used = occupancy.get((date_str, t, room["name"]), 0)
-                if used + people <= room["capacity"]:
-                    slots.append(f"{date_str} ob {t} ({room['name']})")
-                    break
-            if len(slots) >= limit:
-                return slots
-
-        # 2) najbližji vikend v prihodnjih dveh tednih
+        # kandidatni dnevi: isti dan + odprti dnevi (datumski niz se izračuna enkrat na dan)
+        candidate_days = [date_str]
         parsed_date = self._parse_date(date_str)
-        if not parsed_date:
-            return slots
-        for delta in range(1, 15):
-            candidate = parsed_date + timedelta(days=delta)
-            if candidate.weekday() not in TABLE_OPEN_DAYS:
-                continue
-            candidate_str = candidate.strftime("%d.%m.%Y")
+        if parsed_date:
+            first = to_ordinal(parsed_date)
+            for ordinal in range(first + 1, first + 15):
+                day = date.fromordinal(ordinal)
+                if day.weekday() in TABLE_OPEN_DAYS:
+                    candidate_days.append(day.strftime("%d.%m.%Y"))
+
+        for day_str in candidate_days:
             for t in start_times:
                 for room in DINING_ROOMS:
-                    used = occupancy.get((candidate_str, t, room["name"]), 0)
-                    if used + people <= room["capacity"]:
-                        slots.append(f"{candidate_str} ob {t} ({room['name']})")
+                    if occupancy.get((day_str, t, room["name"]), 0) + people <= room["capacity"]:
+                        slots.append(f"{day_str} ob {t} ({room['name']})")
                         break
                 if len(slots) >= limit:
                     return slots
@@ -666,12 +669,14 @@ class ReservationService:
             status = "confirmed"
         conn = self._conn()
         ph = self._placeholder()
-        placeholders = ", ".join([ph] * 30)  # Changed from 24 to 30
+        placeholders = ", ".join([ph] * 32)
+        start_date, end_date = self._date_columns(date, nights)
         sql = (
             f"INSERT INTO reservations "
             f"(date, nights, rooms, people, reservation_type, time, location, name, phone, email, note, status, created_at, source, "
             f"admin_notes, confirmed_at, confirmed_by, guest_message, country, kids, kids_small, confirm_via, event_type, special_needs, "
-            f"wellness_duration_hours, meal_type, package_type, package_price, room_preference, accommodation_type) "
+            f"wellness_duration_hours, meal_type, package_type, package_price, room_preference, accommodation_type, "
+            f"start_date, end_date) "
             f"VALUES ({placeholders})"
         )
         if self.use_postgres:
@@ -711,6 +716,8 @@ class ReservationService:
                     package_price,
                     room_preference,
                     accommodation_type,
+                    start_date,
+                    end_date,
                 ),
             )
             if self.use_postgres:
@@ -723,6 +730,22 @@ class ReservationService:
             cur.close()
             conn.close()
 
+        if reservation_type == "room":
+            self._refresh_occupancy(
+                int(new_id),
+                {
+                    "id": new_id,
+                    "date": date,
+                    "start_date": start_date,
+                    "nights": nights,
+                    "rooms": rooms,
+                    "people": people,
+                    "reservation_type": reservation_type,
+                    "location": location,
+                    "room_preference": room_preference,
+                    "status": status,
+                },
+            )
         return int(new_id)
 
     def update_status(self, reservation_id: int, new_status: str) -> bool:
@@ -736,10 +759,13 @@ class ReservationService:
             cur = conn.cursor()
             cur.execute(sql, (new_status, reservation_id))
             conn.commit()
-            return cur.rowcount > 0
+            updated = cur.rowcount > 0
         finally:
             cur.close()
             conn.close()
+        if updated:
+            self._refresh_occupancy(reservation_id)
+        return updated
 
     def get_reservation(self, reservation_id: int) -> Optional[Dict[str, Any]]:
         conn = self._conn()
@@ -758,7 +784,18 @@ class ReservationService:
         status: Optional[str] = None,
         reservation_type: Optional[str] = None,
         source: Optional[str] = None,
+        statuses: Optional[list[str]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        include_undated: bool = True,
     ) -> list[Dict[str, Any]]:
+        """
+        Prebere rezervacije s filtri.
+
+        `date_from`/`date_to` (ISO, vključno) vrneta rezervacije, katerih bivanje
+        se prekriva z obdobjem; rezervacije brez razumljivega datuma se obdržijo,
+        če je `include_undated`.
+        """
         conn = self._conn()
         try:
             cur = conn.cursor()
@@ -769,12 +806,28 @@ class ReservationService:
             if status:
                 conditions.append(f"status = {ph}")
                 params.append(status)
+            if statuses:
+                conditions.append(f"status IN ({', '.join([ph] * len(statuses))})")
+                params.extend(statuses)
             if reservation_type:
                 conditions.append(f"reservation_type = {ph}")
                 params.append(reservation_type)
             if source:
                 conditions.append(f"source = {ph}")
                 params.append(source)
+            if date_from or date_to:
+                overlap: list[str] = []
+                if date_to:
+                    end_exclusive = datetime.fromisoformat(date_to).date() + timedelta(days=1)
+                    overlap.append(f"start_date < {ph}")
+                    params.append(end_exclusive.isoformat())
+                if date_from:
+                    overlap.append(f"end_date > {ph}")
+                    params.append(datetime.fromisoformat(date_from).date().isoformat())
+                range_sql = " AND ".join(overlap)
+                if include_undated:
+                    range_sql = f"(start_date IS NULL OR ({range_sql}))"
+                conditions.append(range_sql)
             if conditions:
                 sql += " WHERE " + " AND ".join(conditions)
             sql += " ORDER BY created_at DESC LIMIT " + str(int(limit))
@@ -821,6 +874,11 @@ class ReservationService:
         updates = {k: v for k, v in fields.items() if k in allowed_fields and v is not None}
         if not updates:
             return False
+        if "date" in updates or "nights" in updates:
+            current = self.get_reservation(reservation_id) or {}
+            updates["start_date"], updates["end_date"] = self._date_columns(
+                updates.get("date", current.get("date")), updates.get("nights", current.get("nights"))
+            )
         ph = self._placeholder()
         set_parts = [f"{k} = {ph}" for k in updates.keys()]
         params = list(updates.values())
@@ -831,10 +889,13 @@ class ReservationService:
             sql = f"UPDATE reservations SET {', '.join(set_parts)} WHERE id = {ph}"
             cur.execute(sql, tuple(params))
             conn.commit()
-            return cur.rowcount > 0
+            updated = cur.rowcount > 0
         finally:
             cur.close()
             conn.close()
+        if updated:
+            self._refresh_occupancy(reservation_id)
+        return updated
 
     def _fetch_reservations(self) -> list[ReservationRecord]:
         records: list[ReservationRecord] = []
@@ -919,6 +980,7 @@ class ReservationService:
 
     def create_backup_csv(self) -> str:
         """Ustvari CSV backup iz SQLite in vrne pot do datoteke."""
+        os.makedirs(self.backup_dir, exist_ok=True)
         today_str = datetime.now().strftime("%Y%m%d")
         backup_path = os.path.join(self.backup_dir, f"reservations-{today_str}.csv")
         rows = self.read_reservations()
@@ -994,34 +1056,77 @@ class ReservationService:
         intent: Optional[str] = None,
         needs_followup: bool = False,
         followup_email: Optional[str] = None,
+        sync: bool = False,
     ) -> Optional[int]:
-        """Shrani pogovor v bazo in vrne ID vrstice."""
+        """
+        Shrani pogovor v bazo.
+
+        Privzeto gre zapis v write-behind vrsto in funkcija vrne None. ID vrstice
+        se vrne le pri sinhronem zapisu (`sync`, pogovori za followup ali polna vrsta).
+        """
         created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        row = (session_id, user_message, bot_response, intent, needs_followup, followup_email, created_at)
+        if not sync and not needs_followup and CONVERSATION_LOG_ASYNC:
+            if self._conversation_writer().enqueue(row):
+                return None
+        return self._insert_conversation(row)
+
+    def _conversation_writer(self) -> ConversationLogWriter:
+        key = self._db_key()
+        writer = _CONVERSATION_WRITERS.get(key)
+        if writer is None:
+            writer = _CONVERSATION_WRITERS.setdefault(key, ConversationLogWriter(self._insert_conversations))
+        return writer
+
+    def flush_conversation_log(self, timeout: float = 5.0) -> bool:
+        writer = _CONVERSATION_WRITERS.get(self._db_key())
+        return writer.flush(timeout) if writer else True
+
+    def conversation_log_stats(self) -> dict:
+        writer = _CONVERSATION_WRITERS.get(self._db_key())
+        return dict(writer.stats) if writer else {}
+
+    def _conversation_insert_sql(self) -> str:
         ph = self._placeholder()
+        return (
+            "INSERT INTO conversations (session_id, user_message, bot_response, intent, needs_followup, followup_email, created_at) "
+            f"VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})"
+        )
+
+    def _insert_conversation(self, row: tuple) -> Optional[int]:
         conn = self._conn()
         conv_id: Optional[int] = None
         try:
             cur = conn.cursor()
-            sql = (
-                "INSERT INTO conversations (session_id, user_message, bot_response, intent, needs_followup, followup_email, created_at) "
-                f"VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})"
-            )
-            params = (session_id, user_message, bot_response, intent, needs_followup, followup_email, created_at)
+            sql = self._conversation_insert_sql()
             if self.use_postgres:
                 sql += " RETURNING id"
-            cur.execute(sql, params)
+            cur.execute(sql, row)
             if self.use_postgres:
                 fetched = cur.fetchone()
                 if fetched:
                     conv_id = fetched["id"] if isinstance(fetched, dict) else fetched[0]
             else:
                 conv_id = cur.lastrowid
+            self._update_usage_rollups(cur, [row])
             conn.commit()
         finally:
             cur.close()
             conn.close()
         return conv_id
 
+    def _insert_conversations(self, rows: list[tuple]) -> None:
+        """Več vrstic v eni transakciji (write-behind writer)."""
+        conn = self._conn()
+        try:
+            cur = conn.cursor()
+            cur.executemany(self._conversation_insert_sql(), rows)
+            self._update_usage_rollups(cur, rows)
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+
     def get_conversations(self, limit: int = 100, needs_followup_only: bool = False) -> list[dict]:
         """Vrne zadnje pogovore, opcijsko filtrirane po potrebi po followupu."""
         conn = self._conn()
@@ -1153,26 +1258,78 @@ class ReservationService:
             conn.close()
 
     def get_usage_stats(self) -> dict:
-        """Vrne unikatne session_id za danes/ta mesec/letos."""
+        """Unikatni session_id (in število sporočil) za danes/ta mesec/letos iz rollup tabele."""
+        now = datetime.now()
+        keys = {
+            "today": "d:" + now.strftime("%Y-%m-%d"),
+            "month": "m:" + now.strftime("%Y-%m"),
+            "year": "y:" + now.strftime("%Y"),
+        }
+        ph = self._placeholder()
         conn = self._conn()
         try:
             cur = conn.cursor()
-            today_prefix = datetime.now().strftime("%Y-%m-%d")
-            month_prefix = datetime.now().strftime("%Y-%m")
-            year_prefix = datetime.now().strftime("%Y")
-            ph = self._placeholder()
-            sql_base = "SELECT DISTINCT session_id FROM conversations WHERE session_id IS NOT NULL AND session_id != '' AND created_at LIKE "
-            cur.execute(sql_base + ph, (today_prefix + "%",))
-            today_sessions = {row["session_id"] if isinstance(row, dict) else row[0] for row in cur.fetchall()}
-            cur.execute(sql_base + ph, (month_prefix + "%",))
-            month_sessions = {row["session_id"] if isinstance(row, dict) else row[0] for row in cur.fetchall()}
-            cur.execute(sql_base + ph, (year_prefix + "%",))
-            year_sessions = {row["session_id"] if isinstance(row, dict) else row[0] for row in cur.fetchall()}
-            return {
-                "today": len(today_sessions),
-                "month": len(month_sessions),
-                "year": len(year_sessions),
-            }
+            cur.execute(
+                f"SELECT period, sessions, messages, followups FROM usage_rollup WHERE period IN ({ph}, {ph}, {ph})",
+                tuple(keys.values()),
+            )
+            rows = {row["period"]: dict(row) for row in cur.fetchall()}
         finally:
             cur.close()
             conn.close()
+        stats: dict[str, Any] = {"messages": {}, "followups": {}}
+        for name, period in keys.items():
+            row = rows.get(period, {})
+            stats[name] = int(row.get("sessions") or 0)
+            stats["messages"][name] = int(row.get("messages") or 0)
+            stats["followups"][name] = int(row.get("followups") or 0)
+        return stats
+
+    def _update_usage_rollups(self, cur, rows: list[tuple]) -> None:
+        """Posodobi rollup tabele za nove pogovore (v isti transakciji kot INSERT)."""
+        ph = self._placeholder()
+        counts: dict[str, list[int]] = {}
+        sessions: set[tuple[str, str]] = set()
+        intents: dict[tuple[str, str], int] = defaultdict(int)
+        for session_id, _, _, intent, needs_followup, _, created_at in rows:
+            for prefix, length in USAGE_PERIODS:
+                period = prefix + created_at[:length]
+                entry = counts.setdefault(period, [0, 0, 0])
+                entry[1] += 1
+                entry[2] += 1 if needs_followup else 0
+                if session_id:
+                    sessions.add((period, session_id))
+            intents[(created_at[:10], intent or "")] += 1
+        for period, session_id in sorted(sessions):
+            cur.execute(
+                f"INSERT INTO usage_sessions (period, session_id) VALUES ({ph}, {ph}) ON CONFLICT DO NOTHING",
+                (period, session_id),
+            )
+            if cur.rowcount == 1:
+                counts[period][0] += 1
+        cur.executemany(
+            f"INSERT INTO usage_rollup (period, sessions, messages, followups) VALUES ({ph}, {ph}, {ph}, {ph}) "
+            "ON CONFLICT (period) DO UPDATE SET sessions = usage_rollup.sessions + excluded.sessions, "
+            "messages = usage_rollup.messages + excluded.messages, "
+            "followups = usage_rollup.followups + excluded.followups",
+            [(period, *entry) for period, entry in counts.items()],
+        )
+        cur.executemany(
+            f"INSERT INTO usage_intents (day, intent, count) VALUES ({ph}, {ph}, {ph}) "
+            "ON CONFLICT (day, intent) DO UPDATE SET count = usage_intents.count + excluded.count",
+            [(day, intent, count) for (day, intent), count in intents.items()],
+        )
+
+
+_SERVICE: Optional[ReservationService] = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_reservation_service() -> ReservationService:
+    """Ena instanca ReservationService za celo aplikacijo (tudi FastAPI dependency)."""
+    global _SERVICE
+    if _SERVICE is None:
+        with _SERVICE_LOCK:
+            if _SERVICE is None:
+                _SERVICE = ReservationService()
+    return _SERVICE
@@ -0,0 +1,78 @@
+"""
+Dodeljevanje sob rezervacijam (interval scheduling nad bitseti).
+
+Vsaka soba ima bitset zasedenih dni (bit i = dan base + i). Najprej se
+upoštevajo želene/izbrane sobe (location, room_preference), nato se preostale
+rezervacije razporedijo po času prihoda v sobo z najmanjšo vrzeljo pred
+prihodom (best fit). Razporejanje po prihodu je optimalno za intervalne
+grafe, zato "polno" ne javimo, dokler res ni premalo sob.
+Rezultat je determinističen (ni odvisen od vrstnega reda vrstic v bazi).
+"""
+from __future__ import annotations
+
+from typing import Iterable, Protocol
+
+
+class StayLike(Protocol):
+    reservation_id: int
+    start: int
+    nights: int
+    rooms_needed: int
+    preferred: tuple[str, ...]
+
+
+def _mask(start: int, nights: int, base: int) -> int:
+    return ((1 << nights) - 1) << (start - base)
+
+
+def _gap_before(room_mask: int, offset: int) -> int:
+    """Število prostih dni med zadnjo zasedbo sobe pred `offset` in `offset`."""
+    below = room_mask & ((1 << offset) - 1)
+    return offset - below.bit_length() if below else offset + 1
+
+
+def assign_rooms(room_ids: Iterable[str], stays: Iterable[StayLike]) -> dict[int, list[str]]:
+    """
+    Vrne {reservation_id: [room_id, ...]}.
+
+    Če za rezervacijo ni dovolj prostih sob, dobi manj sob (lahko tudi nobene);
+    klicatelj to vidi kot prezasedenost.
+    """
+    rooms = list(room_ids)
+    stays = list(stays)
+    if not stays:
+        return {}
+    base = min(stay.start for stay in stays)
+    masks: dict[str, int] = {room_id: 0 for room_id in rooms}
+    result: dict[int, list[str]] = {stay.reservation_id: [] for stay in stays}
+
+    def take(stay: StayLike, room_id: str, mask: int) -> None:
+        masks[room_id] |= mask
+        result[stay.reservation_id].append(room_id)
+
+    # 1) želene sobe
+    for stay in sorted((s for s in stays if s.preferred), key=lambda s: (s.start, s.reservation_id)):
+        mask = _mask(stay.start, stay.nights, base)
+        for room_id in stay.preferred:
+            if len(result[stay.reservation_id]) >= stay.rooms_needed:
+                break
+            if room_id in masks and not masks[room_id] & mask:
+                take(stay, room_id, mask)
+
+    # 2) ostalo po času prihoda, best fit
+    ordered = sorted(stays, key=lambda s: (s.start, s.start + s.nights, s.reservation_id))
+    for stay in ordered:
+        missing = stay.rooms_needed - len(result[stay.reservation_id])
+        if missing <= 0:
+            continue
+        offset = stay.start - base
+        mask = _mask(stay.start, stay.nights, base)
+        candidates = [
+            (_gap_before(masks[room_id], offset), position, room_id)
+            for position, room_id in enumerate(rooms)
+            if not masks[room_id] & mask and room_id not in result[stay.reservation_id]
+        ]
+        for _, _, room_id in sorted(candidates)[:missing]:
+            take(stay, room_id, mask)
+    return result
+
@@ -11,6 +11,9 @@ from pathlib import Path
 import re
 from typing import Any, Dict, Optional
 
+from app.services.keyword_matcher import keyword_group, keyword_groups, scan_keywords
+from app.services.typo_index import correct_typos
+
 
 def _extract_date(text: str) -> Optional[str]:
     match = re.search(r"\b(\d{1,2})[./](\d{1,2})[./](\d{2,4})\b", text)
@@ -39,61 +42,63 @@ def _extract_people(text: str) -> Optional[int]:
     return None
 
 
-def _has_word(text: str, word: str) -> bool:
-    return re.search(rf"\b{re.escape(word)}\b", text) is not None
+_INFO_KEYWORDS = keyword_groups(
+    "agent.info",
+    {
+        "kdo_si": ["kdo si", "kdo ste", "predstavi se", "kdo si ti"],
+        "odpiralni_cas": ["odpiralni", "kdaj ste odprti", "delovni čas", "odprti", "odprite", "kdaj odprete", "ob kateri uri odprete", "do kdaj ste odprti", "zadnji prihod"],
+        "prazniki": ["praznik", "prazniki"],
+        "rezervacija_vnaprej": ["rezervirati vnaprej", "brez rezervacije", "ali moram rezervirati", "rezervacija vnaprej"],
+        "zajtrk": ["zajtrk"],
+        "vecerj": ["večerj"],
+        "vecerja": ["večerja", "vecerja", "cena večerje", "cena vecerje", "večerjo"],
+        "cena_sobe": ["cena sobe", "cenik", "koliko stane noč", "nočitev", "nocitev", "soba za 2", "soba za dve", "za 2 osebi", "za dve osebi", "vključeno v ceno", "v ceno sobe", "kaj je vključeno v ceno"],
+        "sobe": ["koliko sob", "katere sobe", "kakšne sobe", "družinska soba", "družinsko sobo", "balkon", "koliko oseb v sobi", "koliko oseb v sobo", "koliko oseb gre v eno sobo", "kapaciteta sobe", "najboljša soba", "najboljša za družino"],
+        "soba": ["soba"],
+        "druzin": ["družin"],
+        "klima": ["klima", "klimatiz"],
+        "wifi": ["wifi", "wi-fi", "internet"],
+        "prijava_odjava": ["prijava", "odjava", "check in", "check out"],
+        "parking": ["parkir", "parking"],
+        "zivali_kmetija": ["katere živali", "kakšne živali", "zivali imate", "živali na kmetiji", "živali na domačiji", "otroci vidijo živali", "lahko otroci vidijo živali"],
+        "zivali": ["pes", "psom", "mačk", "ljubljenč", "hišni ljubljenčki", "pripeljem", "s sabo", "dovolite živali", "sprejemate živali"],
+        "telefon": ["telefon", "telefonsko", "številka", "stevilka", "gsm", "mobitel", "mobile", "phone"],
+        "email": ["email", "e-mail", "epošta", "e-pošta"],
+        "placilo": ["plačilo", "plačam", "placam", "gotovina", "kartic"],
+        "min_nocitve": ["minimal", "min nočit", "najmanj noč", "min noce"],
+        "jedilnik": ["jedilnik", "meniju", "menu", "kaj ponujate", "kaj strežete", "degustacijski", "degustacija", "koliko hodov", "kosilo", "vikend kosilo", "koliko stane kosilo"],
+        "alergije": ["alergij", "alergik", "gluten", "lakto", "vegan", "vegetar", "vegansko"],
+        "lokacija": ["nadmorski", "višina"],
+        "kmetija": ["zemlje", "krav", "krave", "kmetij", "kmetijo"],
+        "gibanica": ["gibanica"],
+    },
+)
+_GREETING_WORDS = keyword_group("agent.info.pozdrav", ["zdravo", "živjo", "pozdrav", "dober", "dan", "hey", "hello"], whole_word=True)
 
 
 def _detect_info_intent(text: str) -> Optional[str]:
-    if any(_has_word(text, w) for w in ["zdravo", "živjo", "pozdrav", "dober", "dan", "hey", "hello"]):
+    hits = scan_keywords(text)
+    keys = _INFO_KEYWORDS
+    if hits.has(_GREETING_WORDS):
         return "pozdrav"
-    if any(w in text for w in ["kdo si", "kdo ste", "predstavi se", "kdo si ti"]):
-        return "kdo_si"
-    if any(w in text for w in ["odpiralni", "kdaj ste odprti", "delovni čas", "odprti", "odprite", "kdaj odprete", "ob kateri uri odprete", "do kdaj ste odprti", "zadnji prihod"]):
-        return "odpiralni_cas"
-    if any(w in text for w in ["praznik", "prazniki"]):
-        return "prazniki"
-    if any(w in text for w in ["rezervirati vnaprej", "brez rezervacije", "ali moram rezervirati", "rezervacija vnaprej"]):
-        return "rezervacija_vnaprej"
-    if "zajtrk" in text and "večerj" not in text:
+    for key in ("kdo_si", "odpiralni_cas", "prazniki", "rezervacija_vnaprej"):
+        if hits.has(keys[key]):
+            return key
+    if hits.has(keys["zajtrk"]) and not hits.has(keys["vecerj"]):
         return "zajtrk"
-    if any(w in text for w in ["večerja", "vecerja", "cena večerje", "cena vecerje", "večerjo"]):
-        return "vecerja"
-    if any(w in text for w in ["cena sobe", "cenik", "koliko stane noč", "nočitev", "nocitev", "soba za 2", "soba za dve", "za 2 osebi", "za dve osebi", "vključeno v ceno", "v ceno sobe", "kaj je vključeno v ceno"]):
-        return "cena_sobe"
-    if any(w in text for w in ["koliko sob", "katere sobe", "kakšne sobe", "družinska soba", "družinsko sobo", "balkon", "koliko oseb v sobi", "koliko oseb v sobo", "koliko oseb gre v eno sobo", "kapaciteta sobe", "najboljša soba", "najboljša za družino"]):
-        return "sobe"
-    if "soba" in text and "družin" in text:
+    for key in ("vecerja", "cena_sobe", "sobe"):
+        if hits.has(keys[key]):
+            return key
+    if hits.has(keys["soba"]) and hits.has(keys["druzin"]):
         return "sobe"
-    if any(w in text for w in ["klima", "klimatiz"]):
-        return "klima"
-    if any(w in text for w in ["wifi", "wi-fi", "internet"]):
-        return "wifi"
-    if any(w in text for w in ["prijava", "odjava", "check in", "check out"]):
-        return "prijava_odjava"
-    if any(w in text for w in ["parkir", "parking"]):
-        return "parking"
-    if any(w in text for w in ["katere živali", "kakšne živali", "zivali imate", "živali na kmetiji", "živali na domačiji", "otroci vidijo živali", "lahko otroci vidijo živali"]):
-        return "zivali_kmetija"
-    if any(w in text for w in ["pes", "psom", "mačk", "ljubljenč", "hišni ljubljenčki", "pripeljem", "s sabo", "dovolite živali", "sprejemate živali"]):
-        return "zivali"
-    if any(w in text for w in ["telefon", "telefonsko", "številka", "stevilka", "gsm", "mobitel", "mobile", "phone"]):
-        return "kontakt"
-    if any(w in text for w in ["email", "e-mail", "epošta", "e-pošta"]):
+    for key in ("klima", "wifi", "prijava_odjava", "parking", "zivali_kmetija", "zivali"):
+        if hits.has(keys[key]):
+            return key
+    if hits.has(keys["telefon"], keys["email"]):
         return "kontakt"
-    if any(w in text for w in ["plačilo", "plačam", "placam", "gotovina", "kartic"]):
-        return "placilo"
-    if any(w in text for w in ["minimal", "min nočit", "najmanj noč", "min noce"]):
-        return "min_nocitve"
-    if any(w in text for w in ["jedilnik", "menij", "meniju", "menu", "koslo", "kaj ponujate", "kaj strežete", "degustacijski", "degustacija", "koliko hodov", "kosilo", "vikend kosilo", "koliko stane kosilo"]):
-        return "jedilnik"
-    if any(w in text for w in ["alergij", "alergik", "gluten", "lakto", "vegan", "vegetar", "vegansko"]):
-        return "alergije"
-    if any(w in text for w in ["nadmorski", "višina"]):
-        return "lokacija"
-    if any(w in text for w in ["zemlje", "krav", "krave", "kmetij", "kmetijo"]):
-        return "kmetija"
-    if "gibanica" in text:
-        return "gibanica"
+    for key in ("placilo", "min_nocitve", "jedilnik", "alergije", "lokacija", "kmetija", "gibanica"):
+        if hits.has(keys[key]):
+            return key
     return None
 
 
@@ -109,6 +114,8 @@ def _load_topics() -> list[dict[str, Any]]:
         _topics_cache = json.loads(topics_path.read_text(encoding="utf-8"))
     except Exception:
         _topics_cache = []
+    for topic in _topics_cache:
+        keyword_group(f"agent.topic.{topic.get('key')}", topic.get("triggers", []))
     return _topics_cache
 
 
@@ -116,14 +123,17 @@ def _detect_topic_intent(text: str) -> Optional[str]:
     topics = _load_topics()
     if not topics:
         return None
+    hits = scan_keywords(text)
     best_key = None
     best_score = -1
     for topic in topics:
         key = topic.get("key")
-        triggers = topic.get("triggers", [])
+        matched = hits.matched(f"agent.topic.{key}")
+        if not matched:
+            continue
         priority = int(topic.get("priority", 0))
-        for trig in triggers:
-            if trig in text:
+        for trig in topic.get("triggers", []):
+            if trig in matched:
                 score = priority * 100 + len(trig)
                 if score > best_score:
                     best_score = score
@@ -131,100 +141,96 @@ def _detect_topic_intent(text: str) -> Optional[str]:
     return best_key
 
 
+_PRODUCT_KEYWORDS = keyword_groups(
+    "agent.product",
+    {
+        "marmelada": ["marmelad", "džem", "dzem", "jagod", "malin"],
+        "liker": ["liker", "žgan", "zgan", "borovnič", "orehov", "tepk"],
+        "gibanica": ["gibanica"],
+        "bunka": ["bunka", "bunko", "bunke", "salama", "salam", "klobas", "klobasa"],
+        "izdelki_splosno": ["izdelek", "trgovin", "katalog", "prodajate", "naroč", "naroc"],
+    },
+)
+
+
 def _detect_product_intent(text: str) -> Optional[str]:
-    if any(w in text for w in ["marmelad", "džem", "dzem", "jagod", "malin"]):
-        return "marmelada"
-    if any(w in text for w in ["liker", "žgan", "zgan", "borovnič", "orehov", "tepk"]):
-        return "liker"
-    if "gibanica" in text:
-        return "gibanica"
-    if any(w in text for w in ["bunka", "bunko", "bunke", "salama", "salam", "klobas", "klobasa"]):
-        return "bunka"
-    if any(w in text for w in ["izdelek", "trgovin", "katalog", "prodajate", "naroč", "naroc"]):
-        return "izdelki_splosno"
+    hits = scan_keywords(text)
+    for key, group in _PRODUCT_KEYWORDS.items():
+        if hits.has(group):
+            return key
     return None
 
 
-def _detect_booking_intent(text: str, has_active_booking: bool) -> str:
-    booking_tokens = {
-        "rezerv",
-        "rezev",
-        "rezer",
-        "rezeriv",
-        "rezerver",
-        "rezerveru",
-        "rezr",
-        "rezrv",
-        "rezrvat",
-        "rezerveir",
-        "reserv",
-        "reservier",
-        "book",
-        "buking",
-        "booking",
-        "bukng",
-    }
-    room_tokens = {
-        "soba",
-        "sobe",
-        "sobo",
-        "room",
-        "zimmer",
-        "zimmern",
-        "rum",
-        "camer",
-        "camera",
-        "accom",
-        "nocit",
-        "nočit",
-        "nočitev",
-        "nocitev",
-        "night",
-    }
-    table_tokens = {
-        "miza",
-        "mize",
-        "mizo",
-        "miz",
-        "table",
-        "tabl",
-        "tabel",
-        "tble",
-        "tablle",
-        "tafel",
-        "tisch",
-        "koslo",
-        "kosilo",
-        "vecerj",
-        "veceja",
-        "vecher",
-        "dinner",
-        "lunch",
-    }
+# tipkarske napake popravi correct_typos (route_message); ostanejo le kratke oblike
+_BOOKING_TOKENS = {
+    "rezerv",
+    "rezer",
+    "rezr",
+    "reserv",
+    "reservier",
+    "book",
+    "buking",
+    "booking",
+}
+_BOOKING_PHRASES = [
+    "rezerviram sobo",
+    "rezerviral sobo",
+    "rezervirala sobo",
+    "rezervacija sobe",
+    "rezerviram mizo",
+    "rezerviral mizo",
+    "rezervirala mizo",
+    "rezervacija mize",
+    "ali lahko rezerviram sobo",
+    "ali lahko rezerviram mizo",
+]
+_ROOM_TOKENS = {
+    "soba",
+    "sobe",
+    "sobo",
+    "room",
+    "zimmer",
+    "zimmern",
+    "rum",
+    "camer",
+    "camera",
+    "accom",
+    "nocit",
+    "nočit",
+    "nočitev",
+    "nocitev",
+    "night",
+}
+_TABLE_TOKENS = {
+    "miza",
+    "mize",
+    "mizo",
+    "miz",
+    "table",
+    "tafel",
+    "tisch",
+    "kosilo",
+    "vecerj",
+    "vecher",
+    "dinner",
+    "lunch",
+}
+# cele besede (soba ≠ "sobahn"), ostalo kot koreni
+_ROOM_WORDS = {"soba", "sobe", "sobo", "room", "zimmer", "zimmern", "camera"}
+_TABLE_WORDS = {"miza", "mize", "mizo", "table", "tisch"}
+
+_BOOKING_KEYWORDS = keyword_group("agent.booking", _BOOKING_TOKENS | set(_BOOKING_PHRASES))
+_ROOM_WORD_KEYWORDS = keyword_group("agent.room_word", _ROOM_WORDS, whole_word=True)
+_ROOM_STEM_KEYWORDS = keyword_group("agent.room_stem", _ROOM_TOKENS - _ROOM_WORDS)
+_TABLE_WORD_KEYWORDS = keyword_group("agent.table_word", _TABLE_WORDS, whole_word=True)
+_TABLE_STEM_KEYWORDS = keyword_group("agent.table_stem", _TABLE_TOKENS - _TABLE_WORDS)
 
-    has_booking = any(tok in text for tok in booking_tokens) or any(
-        phrase in text
-        for phrase in [
-            "rezerviram sobo",
-            "rezerviral sobo",
-            "rezervirala sobo",
-            "rezervacija sobe",
-            "rezerviram mizo",
-            "rezerviral mizo",
-            "rezervirala mizo",
-            "rezervacija mize",
-            "ali lahko rezerviram sobo",
-            "ali lahko rezerviram mizo",
-        ]
-    )
-    room_words = {"soba", "sobe", "sobo", "room", "zimmer", "zimmern", "camera"}
-    table_words = {"miza", "mize", "mizo", "table", "tisch"}
-    has_room = any(_has_word(text, tok) for tok in room_words) or any(
-        stem in text for stem in room_tokens if stem not in room_words
-    )
-    has_table = any(_has_word(text, tok) for tok in table_words) or any(
-        stem in text for stem in table_tokens if stem not in table_words
-    )
+
+def _detect_booking_intent(text: str, has_active_booking: bool) -> str:
+    hits = scan_keywords(text)
+    has_booking = hits.has(_BOOKING_KEYWORDS)
+    has_room = hits.has(_ROOM_WORD_KEYWORDS, _ROOM_STEM_KEYWORDS)
+    has_table = hits.has(_TABLE_WORD_KEYWORDS, _TABLE_STEM_KEYWORDS)
 
     # Med aktivno rezervacijo: če jasno pove nov tip (soba/miza), začni novo,
     # sicer nadaljuj obstoječi flow.
@@ -267,11 +273,12 @@ def route_message(
     booking_step: Optional[str] = None,
 ) -> Dict[str, Any]:
     text = message.lower()
+    corrected = correct_typos(text)
 
-    intent = _detect_booking_intent(text, has_active_booking)
-    topic_key = _detect_topic_intent(text)
-    info_key = f"topic:{topic_key}" if topic_key else _detect_info_intent(text)
-    product_key = _detect_product_intent(text)
+    intent = _detect_booking_intent(corrected, has_active_booking)
+    topic_key = _detect_topic_intent(corrected)
+    info_key = f"topic:{topic_key}" if topic_key else _detect_info_intent(corrected)
+    product_key = _detect_product_intent(corrected)
 
     needs_soft_sell = info_key in {"sobe", "sobe_info", "vecerja", "cena_sobe", "min_nocitve", "kapaciteta_mize"}
 
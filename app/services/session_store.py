@@ -0,0 +1,257 @@
+"""
+Shramba pogovornih sej (zgodovina + stanje rezervacije/povpraševanja).
+
+Privzeto je v pomnilniku: LRU z omejenim številom sej in TTL za neaktivne.
+Z `CHAT_SESSION_STORE=db` se seje hranijo v tabeli `chat_sessions`
+(SQLite/Postgres), tako da več uvicorn workerjev streže isto sejo.
+Zgodovina je krožni buffer zadnjih `CHAT_HISTORY_MAX` sporočil.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+SESSION_STORE_BACKEND = os.environ.get("CHAT_SESSION_STORE", "memory").strip().lower()
+SESSION_MAX = int(os.environ.get("CHAT_SESSION_MAX", "5000"))
+SESSION_TTL_HOURS = float(os.environ.get("CHAT_SESSION_TTL_HOURS", "48"))
+HISTORY_MAX = int(os.environ.get("CHAT_HISTORY_MAX", "12"))
+SHOWN_PRODUCTS_MAX = 15
+
+
+def _history() -> deque:
+    return deque(maxlen=HISTORY_MAX)
+
+
+@dataclass
+class ChatSession:
+    session_id: str
+    history: deque = field(default_factory=_history)
+    last_product_query: Optional[str] = None
+    last_wine_query: Optional[str] = None
+    last_info_query: Optional[str] = None
+    last_menu_query: bool = False
+    last_shown_products: list[str] = field(default_factory=list)
+    last_interaction: Optional[datetime] = None
+    reservation: dict[str, Any] = field(default_factory=dict)
+    inquiry: dict[str, Any] = field(default_factory=dict)
+    unknown_question: Optional[dict[str, Any]] = None
+
+    def add_message(self, role: str, content: str) -> None:
+        self.history.append({"role": role, "content": content})
+
+    def reset(self) -> None:
+        """Počisti sejo na mestu (reference na reservation/inquiry ostanejo veljavne)."""
+        self.history.clear()
+        self.last_product_query = None
+        self.last_wine_query = None
+        self.last_info_query = None
+        self.last_menu_query = False
+        self.last_shown_products.clear()
+        self.last_interaction = None
+        self.reservation.clear()
+        self.inquiry.clear()
+        self.unknown_question = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "history": list(self.history),
+            "last_product_query": self.last_product_query,
+            "last_wine_query": self.last_wine_query,
+            "last_info_query": self.last_info_query,
+            "last_menu_query": self.last_menu_query,
+            "last_shown_products": self.last_shown_products[-SHOWN_PRODUCTS_MAX:],
+            "last_interaction": self.last_interaction.isoformat() if self.last_interaction else None,
+            "reservation": self.reservation,
+            "inquiry": self.inquiry,
+            "unknown_question": self.unknown_question,
+        }
+
+    @classmethod
+    def from_dict(cls, session_id: str, data: dict[str, Any]) -> "ChatSession":
+        session = cls(session_id=session_id)
+        session.history.extend(data.get("history") or [])
+        session.last_product_query = data.get("last_product_query")
+        session.last_wine_query = data.get("last_wine_query")
+        session.last_info_query = data.get("last_info_query")
+        session.last_menu_query = bool(data.get("last_menu_query"))
+        session.last_shown_products = list(data.get("last_shown_products") or [])
+        last = data.get("last_interaction")
+        session.last_interaction = datetime.fromisoformat(last) if last else None
+        session.reservation = dict(data.get("reservation") or {})
+        session.inquiry = dict(data.get("inquiry") or {})
+        session.unknown_question = data.get("unknown_question")
+        return session
+
+
+class InMemorySessionStore:
+    """LRU + TTL v pomnilniku procesa (en worker)."""
+
+    def __init__(self, max_sessions: int = SESSION_MAX, ttl_hours: float = SESSION_TTL_HOURS) -> None:
+        self.max_sessions = max(1, max_sessions)
+        self.ttl_seconds = ttl_hours * 3600
+        self._sessions: "OrderedDict[str, tuple[ChatSession, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "expired": 0, "evicted": 0}
+
+    def _expire(self, now: float) -> None:
+        # najstarejše so na začetku; ustavimo se pri prvi še živi
+        while self._sessions:
+            session_id, (_, touched) = next(iter(self._sessions.items()))
+            if now - touched <= self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self.stats["expired"] += 1
+
+    def get(self, session_id: str) -> ChatSession:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                session = ChatSession(session_id=session_id)
+                self.stats["created"] += 1
+            else:
+                session = entry[0]
+            self._sessions[session_id] = (session, now)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.stats["evicted"] += 1
+            return session
+
+    def save(self, session: ChatSession) -> None:
+        with self._lock:
+            self._sessions[session.session_id] = (session, time.monotonic())
+            self._sessions.move_to_end(session.session_id)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class DatabaseSessionStore:
+    """Seje v tabeli chat_sessions (JSON), deljene med workerji."""
+
+    PURGE_EVERY = 200
+
+    def __init__(self, service_factory: Callable[[], Any], ttl_hours: float = SESSION_TTL_HOURS) -> None:
+        self._service_factory = service_factory
+        self.ttl = timedelta(hours=ttl_hours)
+        self._saves = 0
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "expired": 0, "evicted": 0}
+
+    @property
+    def _service(self):
+        return self._service_factory()
+
+    def get(self, session_id: str) -> ChatSession:
+        service = self._service
+        ph = service._placeholder()
+        conn = service._conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(f"SELECT data, updated_at FROM chat_sessions WHERE session_id = {ph}", (session_id,))
+            row = cur.fetchone()
+        finally:
+            conn.close()
+        if row:
+            row = dict(row)
+            if datetime.fromisoformat(row["updated_at"]) >= datetime.now() - self.ttl:
+                try:
+                    return ChatSession.from_dict(session_id, json.loads(row["data"]))
+                except (ValueError, TypeError) as exc:
+                    print(f"[SESSION] neveljavna seja {session_id}: {exc}")
+            else:
+                self.stats["expired"] += 1
+        self.stats["created"] += 1
+        return ChatSession(session_id=session_id)
+
+    def save(self, session: ChatSession) -> None:
+        service = self._service
+        ph = service._placeholder()
+        now = datetime.now().isoformat(timespec="seconds")
+        conn = service._conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                f"INSERT INTO chat_sessions (session_id, data, updated_at) VALUES ({ph}, {ph}, {ph}) "
+                "ON CONFLICT (session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (session.session_id, json.dumps(session.to_dict(), ensure_ascii=False), now),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self._saves += 1
+            purge = self._saves % self.PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        service = self._service
+        ph = service._placeholder()
+        cutoff = (datetime.now() - self.ttl).isoformat(timespec="seconds")
+        conn = service._conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(f"DELETE FROM chat_sessions WHERE updated_at < {ph}", (cutoff,))
+            removed = cur.rowcount or 0
+            conn.commit()
+        finally:
+            conn.close()
+        self.stats["expired"] += removed
+        return removed
+
+    def delete(self, session_id: str) -> None:
+        service = self._service
+        ph = service._placeholder()
+        conn = service._conn()
+        try:
+            cur = conn.cursor()
+            cur.execute(f"DELETE FROM chat_sessions WHERE session_id = {ph}", (session_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def clear(self) -> None:
+        conn = self._service._conn()
+        try:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM chat_sessions")
+            conn.commit()
+        finally:
+            conn.close()
+
+
+_STORE: Optional[InMemorySessionStore | DatabaseSessionStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_session_store() -> InMemorySessionStore | DatabaseSessionStore:
+    """Ena shramba sej na proces; backend izbere CHAT_SESSION_STORE (memory|db)."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                if SESSION_STORE_BACKEND in {"db", "database", "sql"}:
+                    from app.services.reservation_service import get_reservation_service
+
+                    _STORE = DatabaseSessionStore(get_reservation_service)
+                else:
+                    _STORE = InMemorySessionStore()
+                print(f"[SESSION] shramba sej: {type(_STORE).__name__}")
+    return _STORE
@@ -0,0 +1,370 @@
+"""
+Pravilni razčlenjevalnik datumov, nočitev, oseb in ure (si/en/de).
+
+En preveden regex z imenovanimi alternativami pregleda sporočilo enkrat
+(brez šumnikov, male črke) in vrne BookingEntities: datum oz. interval,
+nočitve, odrasle/otroke/osebe in uro. Pokriva tudi "naslednji petek",
+"from 3rd to 6th of May", "vom 3. bis 6. Mai", "čez 5 dni", "konec julija",
+"über Ostern" ... Ohlapni izrazi (del meseca, mesec, prazniki) vrnejo okno
+z approximate=True – točen dan mora še potrditi gost.
+
+Rezultat je predpomnjen po (besedilo, danes), zato ga extract_date,
+extract_nights, parse_people_count ... v chat_router uporabijo brez
+ponovnega pregleda.
+"""
+from __future__ import annotations
+
+import calendar
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+
+# --- slovarji (brez šumnikov) -----------------------------------------------
+NUMBER_WORDS = {
+    # si
+    "en": 1, "ena": 1, "eno": 1, "enega": 1, "dva": 2, "dve": 2, "dvema": 2, "tri": 3, "trije": 3,
+    "stiri": 4, "pet": 5, "sest": 6, "sedem": 7, "osem": 8, "devet": 9, "deset": 10,
+    # en
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10,
+    # de
+    "ein": 1, "eine": 1, "einen": 1, "einem": 1, "zwei": 2, "drei": 3, "vier": 4, "funf": 5,
+    "sechs": 6, "sieben": 7, "acht": 8, "neun": 9, "zehn": 10,
+}
+
+MONTHS = {
+    1: ["januar", "januarja", "januarju", "january", "janner", "jan"],
+    2: ["februar", "februarja", "februarju", "february", "feb"],
+    3: ["marec", "marca", "marcu", "march", "marz"],
+    4: ["april", "aprila", "aprilu", "apr"],
+    5: ["maj", "maja", "maju", "may", "mai"],
+    6: ["junij", "junija", "juniju", "june", "juni", "jun"],
+    7: ["julij", "julija", "juliju", "july", "juli", "jul"],
+    8: ["avgust", "avgusta", "avgustu", "august", "aug"],
+    9: ["september", "septembra", "septembru", "sept", "sep"],
+    10: ["oktober", "oktobra", "oktobru", "october", "okt", "oct"],
+    11: ["november", "novembra", "novembru", "nov"],
+    12: ["december", "decembra", "decembru", "dezember", "dec", "dez"],
+}
+# kratice le ob številki ("3. jul"), sam mesec samo s polnim imenom
+MONTH_ABBREVIATIONS = {"jan", "feb", "apr", "jun", "jul", "aug", "sep", "sept", "okt", "oct", "nov", "dec", "dez"}
+
+WEEKDAYS = {
+    0: ["ponedeljek", "ponedeljka", "monday", "montag"],
+    1: ["torek", "torka", "tuesday", "dienstag"],
+    2: ["sreda", "sredo", "srede", "wednesday", "mittwoch"],
+    3: ["cetrtek", "cetrtka", "thursday", "donnerstag"],
+    4: ["petek", "petka", "friday", "freitag"],
+    5: ["sobota", "soboto", "sobote", "saturday", "samstag", "sonnabend"],
+    6: ["nedelja", "nedeljo", "nedelje", "sunday", "sonntag"],
+}
+WEEKEND_WORDS = ["vikend", "weekend", "wochenende"]
+NEXT_WORDS = ["naslednji", "naslednjo", "naslednjega", "prihodnji", "prihodnjo", "next", "nachsten", "nachste", "nachstes", "kommenden", "kommendes"]
+THIS_WORDS = ["ta", "to", "ti", "this", "diesen", "diese", "dieses", "am", "v", "on"]
+
+RELATIVE_DAYS = {
+    "pojutrisnjem": 2, "pojutri": 2, "day after tomorrow": 2, "ubermorgen": 2,
+    "danes": 0, "today": 0, "heute": 0,
+    "jutri": 1, "tomorrow": 1, "morgen": 1,
+}
+
+MONTH_PARTS = {
+    "start": ["zacetek", "zacetka", "zacetku", "v zacetku", "na zacetku", "zacetkom", "beginning of", "early", "start of", "anfang"],
+    "middle": ["sredi", "sredina", "sredino", "mid", "middle of", "mitte"],
+    "end": ["konec", "konca", "koncu", "ob koncu", "koncem", "end of", "late", "ende"],
+}
+
+HOLIDAYS = {
+    "easter": ["velika noc", "veliko noc", "velikonocn\\w*", "easter", "ostern"],
+    "pentecost": ["binkosti", "pentecost", "whitsun", "pfingsten"],
+    "christmas": ["bozic\\w*", "christmas", "weihnacht\\w*"],
+    "new_year": ["novo leto", "novoletn\\w*", "silvestrov\\w*", "new year'?s?( eve)?", "silvester", "neujahr"],
+}
+
+NIGHT_WORDS = r"(?:noc\w*|nights?|nachte?|ubernachtung\w*)"
+ADULT_WORDS = r"(?:odrasl\w*|adults?|erwachsene\w*)"
+KID_WORDS = r"(?:otrok\w*|otroci\w*|children|child|kids?|kinder\w*|kind)"
+PEOPLE_WORDS = r"(?:oseb\w*|ljudi|people|persons?|guests?|gostov|gostje|personen|person|leute|gaste)"
+
+
+def _alternation(words) -> str:
+    return "|".join(sorted(words, key=len, reverse=True))
+
+
+_NUM = rf"(?:\d{{1,2}}|{_alternation(re.escape(word) for word in NUMBER_WORDS)})"
+_MONTH_NAME = _alternation(word for names in MONTHS.values() for word in names)
+_MONTH_FULL = _alternation(word for names in MONTHS.values() for word in names if word not in MONTH_ABBREVIATIONS)
+_DAY = r"\d{1,2}(?:st|nd|rd|th|\.)?"
+_YEAR = r"(?:20\d{2})"
+_WEEKDAY = _alternation(word for names in WEEKDAYS.values() for word in names)
+
+_PATTERNS = [
+    # ura (pred datumi, da "ob 13.30" ni datum)
+    ("time", rf"\b(?:ob|at|um|okoli|okrog|around|gegen)\s+(?P<t_h>\d{{1,2}})(?:\s*[:.]\s*(?P<t_m>\d{{2}}))?\s*(?P<t_ampm>am|pm|a\.m\.|p\.m\.|h|uri|uhr)?\b"),
+    ("time_suffix", rf"\b(?P<ts_h>\d{{1,2}})(?:[:.](?P<ts_m>\d{{2}}))?\s*(?P<ts_ampm>am|pm|a\.m\.|p\.m\.|uhr|h)(?![a-z])"),
+    ("time_noon", r"\b(?:opoldne|opoldan|noon|mittags?)\b"),
+    # intervali
+    (
+        "range",
+        rf"\b(?:od\s+|from\s+|vom\s+|von\s+|between\s+)?(?P<r_d1>\d{{1,2}})(?:st|nd|rd|th)?"
+        rf"(?:\s*[./]\s*(?P<r_m1>\d{{1,2}})(?:\s*[./]\s*(?P<r_y1>\d{{2,4}}))?)?\.?"
+        rf"(?:\s+(?:of\s+)?(?P<r_mn1>{_MONTH_NAME})\.?(?:\s+(?P<r_yn1>{_YEAR}))?)?"
+        rf"\s*(?:do|to|till|until|bis|-|–|—)\s*(?:the\s+)?(?P<r_d2>\d{{1,2}})(?:st|nd|rd|th)?"
+        rf"(?:\s*[./]\s*(?P<r_m2>\d{{1,2}})(?:\s*[./]\s*(?P<r_y2>\d{{2,4}}))?\.?"
+        rf"|\.?\s*(?:of\s+)?(?P<r_mn2>{_MONTH_NAME})\b\.?(?:\s+(?P<r_yn2>{_YEAR}))?)",
+    ),
+    (
+        "range_en",
+        rf"\b(?P<re_mn>{_MONTH_NAME})\.?\s+(?P<re_d1>\d{{1,2}})(?:st|nd|rd|th)?\s*(?:-|–|to|till|until)\s*(?P<re_d2>\d{{1,2}})(?:st|nd|rd|th)?\b(?:,?\s+(?P<re_y>{_YEAR}))?",
+    ),
+    # posamezni datumi
+    ("date_num", rf"\b(?P<dn_d>\d{{1,2}})\s*[./]\s*(?P<dn_m>\d{{1,2}})(?:\s*[./]\s*(?P<dn_y>\d{{4}}|\d{{2}})?)?(?![\d:])"),
+    ("date_name", rf"\b(?P<dm_d>\d{{1,2}})(?:st|nd|rd|th)?\.?\s*(?:of\s+)?(?P<dm_mn>{_MONTH_NAME})\b\.?(?:\s+(?P<dm_y>{_YEAR}))?"),
+    ("date_name_en", rf"\b(?P<de_mn>{_MONTH_NAME})\.?\s+(?P<de_d>\d{{1,2}})(?:st|nd|rd|th)?\b(?:,?\s+(?P<de_y>{_YEAR}))?"),
+    ("relative", rf"(?<!guten )\b(?P<rel>{_alternation(RELATIVE_DAYS)})\b"),
+    (
+        "in_days",
+        rf"\b(?:cez|in|za)\s+(?P<in_n>{_NUM})\s+(?P<in_unit>dni|dan|dneva|days?|tage?n?|tedn\w*|teden|weeks?|wochen?)\b",
+    ),
+    (
+        "weekday",
+        rf"\b(?:(?P<wd_next>{_alternation(NEXT_WORDS)})|(?:{_alternation(THIS_WORDS)}))?\s*(?P<wd>{_WEEKDAY}|{_alternation(WEEKEND_WORDS)})\b",
+    ),
+    ("month_part", rf"\b(?P<mp>{_alternation(word for words in MONTH_PARTS.values() for word in words)})\s+(?P<mp_mn>{_MONTH_FULL})\b(?:\s+(?P<mp_y>{_YEAR}))?"),
+    ("holiday", rf"\b(?P<hol>{_alternation(word for words in HOLIDAYS.values() for word in words)})\b"),
+    ("month", rf"\b(?:v|in|im|za|for|during)\s+(?P<mo_mn>{_MONTH_FULL})\b(?:\s+(?P<mo_y>{_YEAR}))?"),
+    # količine
+    ("plus", r"\b(?P<pl_a>\d{1,2})\s*\+\s*(?P<pl_k>\d{1,2})\b"),
+    ("nights", rf"\b(?P<n_n>{_NUM})\s*{NIGHT_WORDS}\b"),
+    ("adults", rf"\b(?P<a_n>{_NUM})\s*{ADULT_WORDS}\b"),
+    ("kids", rf"\b(?P<k_n>{_NUM})\s*{KID_WORDS}\b"),
+    ("people", rf"\b(?P<p_n>{_NUM})\s*{PEOPLE_WORDS}\b"),
+    ("time_colon", r"\b(?P<tc_h>\d{1,2}):(?P<tc_m>\d{2})\b"),
+]
+_MASTER = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in _PATTERNS))
+_MONTH_LOOKUP = {word: month for month, names in MONTHS.items() for word in names}
+_WEEKDAY_LOOKUP = {word: day for day, names in WEEKDAYS.items() for word in names}
+_HOLIDAY_PATTERNS = [(key, re.compile(rf"^(?:{_alternation(words)})$")) for key, words in HOLIDAYS.items()]
+_MONTH_PART_LOOKUP = {word: part for part, words in MONTH_PARTS.items() for word in words}
+
+
+@dataclass
+class BookingEntities:
+    date: Optional[str] = None  # DD.MM.YYYY (prihod oz. dan)
+    end_date: Optional[str] = None  # odhod pri intervalu
+    approximate: bool = False  # okno ("konec julija"), ne točen dan
+    nights: Optional[int] = None
+    adults: Optional[int] = None
+    kids: Optional[int] = None
+    people: Optional[int] = None
+    time: Optional[str] = None
+
+    @property
+    def total_people(self) -> Optional[int]:
+        if self.adults is not None or self.kids is not None:
+            return (self.adults or 0) + (self.kids or 0)
+        return self.people
+
+    @property
+    def exact_date(self) -> Optional[str]:
+        return None if self.approximate else self.date
+
+
+def fold(text: str) -> str:
+    """Male črke brez šumnikov/preglasov (nočitev -> nocitev, für -> fur)."""
+    folded = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(ch for ch in folded if not unicodedata.combining(ch))
+
+
+def parse_number(word: str) -> Optional[int]:
+    word = fold(word).strip()
+    if word.isdigit():
+        return int(word)
+    return NUMBER_WORDS.get(word)
+
+
+def easter_sunday(year: int) -> date:
+    """Velikonočna nedelja (gregorijanski koledar, anonimni algoritem)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = ((h + l - 7 * m + 114) % 31) + 1
+    return date(year, month, day)
+
+
+def _fmt(value: date) -> str:
+    return value.strftime("%d.%m.%Y")
+
+
+def _year(raw: Optional[str], default: int) -> int:
+    if not raw:
+        return default
+    value = int(raw)
+    return value + 2000 if value < 100 else value
+
+
+def _make_date(day: int, month: int, year: Optional[int], today: date) -> Optional[date]:
+    """Datum; brez leta prvi tak dan od danes naprej."""
+    try:
+        value = date(year or today.year, month, day)
+    except ValueError:
+        return None
+    if year is None and value < today:
+        try:
+            value = date(today.year + 1, month, day)
+        except ValueError:
+            return None
+    return value
+
+
+def _month(raw: Optional[str]) -> Optional[int]:
+    if not raw:
+        return None
+    return _MONTH_LOOKUP.get(raw.rstrip("."))
+
+
+def _month_window(month: int, year: Optional[int], today: date, part: Optional[str] = None) -> tuple[date, date]:
+    year_value = year or (today.year if month >= today.month else today.year + 1)
+    last = calendar.monthrange(year_value, month)[1]
+    first_day, last_day = {"start": (1, 10), "middle": (11, 20), "end": (21, last)}.get(part or "", (1, last))
+    start = max(date(year_value, month, first_day), today) if year_value == today.year and month == today.month else date(year_value, month, first_day)
+    return start, date(year_value, month, last_day)
+
+
+def _holiday_window(key: str, today: date) -> tuple[date, date]:
+    for year in (today.year, today.year + 1):
+        if key == "easter":
+            sunday = easter_sunday(year)
+            start, end = sunday - timedelta(days=2), sunday + timedelta(days=1)
+        elif key == "pentecost":
+            sunday = easter_sunday(year) + timedelta(days=49)
+            start, end = sunday - timedelta(days=1), sunday + timedelta(days=1)
+        elif key == "christmas":
+            start, end = date(year, 12, 24), date(year, 12, 26)
+        else:  # new_year
+            start, end = date(year, 12, 31), date(year + 1, 1, 1)
+        if end >= today:
+            return start, end
+    return start, end
+
+
+def _weekday_date(target: int, today: date, strictly_after: bool) -> date:
+    delta = (target - today.weekday()) % 7
+    if delta == 0 and strictly_after:
+        delta = 7
+    return today + timedelta(days=delta)
+
+
+def _hour_minute(hour: str, minute: Optional[str], suffix: Optional[str]) -> Optional[str]:
+    h, m = int(hour), int(minute or 0)
+    suffix = (suffix or "").replace(".", "")
+    if suffix == "pm" and h < 12:
+        h += 12
+    elif suffix == "am" and h == 12:
+        h = 0
+    if h > 23 or m > 59:
+        return None
+    return f"{h:02d}:{m:02d}"
+
+
+@lru_cache(maxsize=256)
+def _parse(text: str, today: date) -> BookingEntities:
+    entities = BookingEntities()
+    folded = fold(text)
+    exact: Optional[tuple[date, Optional[date]]] = None
+    window: Optional[tuple[date, date]] = None
+
+    for match in _MASTER.finditer(folded):
+        kind, groups = match.lastgroup, match.groupdict()
+        if kind == "time" and entities.time is None:
+            entities.time = _hour_minute(groups["t_h"], groups["t_m"], groups["t_ampm"])
+        elif kind == "time_suffix" and entities.time is None:
+            entities.time = _hour_minute(groups["ts_h"], groups["ts_m"], groups["ts_ampm"])
+        elif kind == "time_noon" and entities.time is None:
+            entities.time = "12:00"
+        elif kind == "time_colon" and entities.time is None:
+            entities.time = _hour_minute(groups["tc_h"], groups["tc_m"], None)
+        elif kind == "range" and exact is None:
+            month2 = int(groups["r_m2"]) if groups["r_m2"] else _month(groups["r_mn2"])
+            month1 = int(groups["r_m1"]) if groups["r_m1"] else (_month(groups["r_mn1"]) or month2)
+            year2 = _year(groups["r_y2"] or groups["r_yn2"], 0) or None
+            year1 = _year(groups["r_y1"] or groups["r_yn1"], 0) or year2
+            start = _make_date(int(groups["r_d1"]), month1, year1, today) if month1 and month2 else None
+            end = _make_date(int(groups["r_d2"]), month2, year2, today) if start and month2 else None
+            if start and end:
+                if end <= start:
+                    end = _make_date(end.day, end.month, start.year + 1, today)
+                if end:
+                    exact = (start, end)
+        elif kind == "range_en" and exact is None:
+            month = _month(groups["re_mn"])
+            year = _year(groups["re_y"], 0) or None
+            start = _make_date(int(groups["re_d1"]), month, year, today) if month else None
+            end = _make_date(int(groups["re_d2"]), month, start.year, today) if start else None
+            if start and end and end > start:
+                exact = (start, end)
+        elif kind == "date_num" and exact is None:
+            year = _year(groups["dn_y"], 0) or None
+            value = _make_date(int(groups["dn_d"]), int(groups["dn_m"]), year, today)
+            if value:
+                exact = (value, None)
+        elif kind in {"date_name", "date_name_en"} and exact is None:
+            prefix = "dm" if kind == "date_name" else "de"
+            month = _month(groups[f"{prefix}_mn"])
+            value = _make_date(int(groups[f"{prefix}_d"]), month, _year(groups[f"{prefix}_y"], 0) or None, today) if month else None
+            if value:
+                exact = (value, None)
+        elif kind == "relative" and exact is None:
+            exact = (today + timedelta(days=RELATIVE_DAYS[groups["rel"]]), None)
+        elif kind == "in_days" and exact is None:
+            amount = parse_number(groups["in_n"]) or 0
+            unit = groups["in_unit"]
+            weeks = unit.startswith(("ted", "week", "woch"))
+            exact = (today + timedelta(weeks=amount) if weeks else today + timedelta(days=amount), None)
+        elif kind == "weekday" and exact is None:
+            word = groups["wd"]
+            target = 5 if word in WEEKEND_WORDS else _WEEKDAY_LOOKUP[word]
+            exact = (_weekday_date(target, today, strictly_after=bool(groups["wd_next"])), None)
+        elif kind == "month_part" and window is None:
+            month = _month(groups["mp_mn"])
+            window = _month_window(month, _year(groups["mp_y"], 0) or None, today, _MONTH_PART_LOOKUP[groups["mp"]])
+        elif kind == "holiday" and window is None:
+            for key, pattern in _HOLIDAY_PATTERNS:
+                if pattern.match(groups["hol"]):
+                    window = _holiday_window(key, today)
+                    break
+        elif kind == "month" and window is None:
+            window = _month_window(_month(groups["mo_mn"]), _year(groups["mo_y"], 0) or None, today)
+        elif kind == "plus" and entities.adults is None:
+            entities.adults, entities.kids = int(groups["pl_a"]), int(groups["pl_k"])
+        elif kind == "nights" and entities.nights is None:
+            entities.nights = parse_number(groups["n_n"])
+        elif kind == "adults" and entities.adults is None:
+            entities.adults = parse_number(groups["a_n"])
+        elif kind == "kids" and entities.kids is None:
+            entities.kids = parse_number(groups["k_n"])
+        elif kind == "people" and entities.people is None:
+            entities.people = parse_number(groups["p_n"])
+
+    if exact:
+        entities.date = _fmt(exact[0])
+        entities.end_date = _fmt(exact[1]) if exact[1] else None
+    elif window:
+        entities.date, entities.end_date, entities.approximate = _fmt(window[0]), _fmt(window[1]), True
+    if entities.people is None and entities.total_people:
+        entities.people = entities.total_people
+    return entities
+
+
+def parse_booking_entities(text: str, today: Optional[date] = None) -> BookingEntities:
+    """Vse entitete rezervacije iz sporočila v enem prehodu (predpomnjeno)."""
+    return _parse(text or "", today or datetime.now().date())
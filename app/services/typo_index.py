@@ -0,0 +1,204 @@
+"""
+Popravljanje tipkarskih napak v sporočilih (SymSpell, simetrično brisanje).
+
+Namesto `difflib` za vsako besedo proti vsakemu cilju in ročnih seznamov
+napak ("rezev", "bukng", "tablle") se ob uvozu zgradi indeks iz domenskega
+besedišča (rezervacijski glagoli, sobe iz ROOMS, izdelki, jedilnik). Za vsako
+besedo so vnaprej izračunana brisanja do MAX_EDIT_DISTANCE znakov; beseda iz
+sporočila se popravi z nekaj vpogledi v slovar, ne glede na velikost besedišča.
+
+Znane besede (baza znanja, ključne besede detektorjev) se ne popravljajo in
+ščitijo pred napačnimi popravki ("sobota" ostane "sobota"). Dovoljena razdalja
+je omejena z dolžino besede, prva črka se mora ujemati.
+
+    correct_typos("rezevacija sobe") -> "rezervacija sobe"
+"""
+from __future__ import annotations
+
+import re
+import threading
+from functools import lru_cache
+from typing import Iterable, Optional
+
+MAX_EDIT_DISTANCE = 2
+TYPO_CACHE_SIZE = 512
+LOOKUP_CACHE_SIZE = 4096
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_MISSING = object()
+
+
+def allowed_distance(word: str) -> int:
+    """Kratke besede brez popravkov, srednje 1, dolge 2."""
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 7:
+        return 1
+    return MAX_EDIT_DISTANCE
+
+
+def _deletes(word: str, distance: int) -> set[str]:
+    result = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {item[:index] + item[index + 1:] for item in frontier for index in range(len(item))}
+        result |= frontier
+    return result
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Damerau-Levenshtein (zamenjava sosednjih črk = 1); nad mejo vrne limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # skupni začetek in konec ne vplivata na razdaljo
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return min(max(len(a), len(b)), limit + 1)
+    over = limit + 1
+    previous2: list[int] = []
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        # le pas okoli diagonale – ostale celice so že nad mejo
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = min(value, over)
+        if min(current) > limit:
+            return over
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _is_inflection(token: str, word: str) -> bool:
+    """Razlika le v končnici (salamo/salame, marmelade/marmelad) – ni napaka."""
+    stem = min(len(token), len(word)) - (len(token) == len(word))
+    return stem >= 4 and token[:stem] == word[:stem] and abs(len(token) - len(word)) <= 1
+
+
+class TypoIndex:
+    """Besede -> predizračunana brisanja; popravek le v ciljno besedo."""
+
+    def __init__(self, max_distance: int = MAX_EDIT_DISTANCE) -> None:
+        self.max_distance = max_distance
+        self.targets: set[str] = set()
+        self.known: set[str] = set()
+        self._deletes: dict[str, set[str]] = {}
+        self._lookups: dict[str, Optional[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._deletes)
+
+    def add(self, word: str, target: bool = True) -> None:
+        word = word.lower()
+        if not word:
+            return
+        if target:
+            self.targets.add(word)
+        if word in self.known:
+            return
+        self.known.add(word)
+        for variant in _deletes(word, min(allowed_distance(word), self.max_distance)):
+            self._deletes.setdefault(variant, set()).add(word)
+
+    def lookup(self, token: str) -> Optional[str]:
+        """Najbližja ciljna beseda ali None (znana beseda, ni kandidata)."""
+        token = token.lower()
+        limit = min(allowed_distance(token), self.max_distance)
+        if not limit or token in self.known:
+            return None
+        # detektorji tečejo tudi v asyncio.to_thread – drug nit lahko vmes
+        # izprazni memo, zato vrnemo lokalni rezultat, ne self._lookups[token]
+        cached = self._lookups.get(token, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        result = self._closest_target(token, limit)
+        if len(self._lookups) >= LOOKUP_CACHE_SIZE:
+            self._lookups.clear()
+        self._lookups[token] = result
+        return result
+
+    def _closest_target(self, token: str, limit: int) -> Optional[str]:
+        candidates: set[str] = set()
+        for variant in _deletes(token, limit):
+            candidates |= self._deletes.get(variant, set())
+        best: Optional[tuple[int, bool, str]] = None
+        for word in candidates:
+            if word[0] != token[0]:
+                continue
+            distance = edit_distance(token, word, limit)
+            if distance > limit:
+                continue
+            rank = (distance, word not in self.targets, word)
+            if best is None or rank < best:
+                best = rank
+        if best is None or best[1]:
+            # najbližja je navadna znana beseda -> ni tipkarska napaka domenske
+            return None
+        if _is_inflection(token, best[2]):
+            return None
+        return best[2]
+
+
+class TypoRegistry:
+    """Poimenovana besedišča; indeks se zgradi ob prvi uporabi oz. build()."""
+
+    def __init__(self) -> None:
+        self._vocabularies: dict[str, tuple[frozenset[str], bool]] = {}
+        self._index: Optional[TypoIndex] = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, words: Iterable[str], target: bool = True) -> bool:
+        vocabulary = (frozenset(word.lower() for word in words if word), target)
+        with self._lock:
+            if self._vocabularies.get(name) == vocabulary:
+                return False
+            self._vocabularies[name] = vocabulary
+            self._index = None
+            return True
+
+    def build(self) -> TypoIndex:
+        with self._lock:
+            if self._index is None:
+                index = TypoIndex()
+                # cilji prej, da znane besede ne prepišejo ciljev
+                for words, target in sorted(self._vocabularies.values(), key=lambda item: not item[1]):
+                    for word in words:
+                        index.add(word, target)
+                self._index = index
+                print(f"[TYPO] {len(index.targets)} ciljnih, {len(index.known)} znanih besed, {len(index)} brisanj")
+            return self._index
+
+
+_REGISTRY = TypoRegistry()
+
+
+def typo_vocabulary(name: str, words: Iterable[str], target: bool = True) -> None:
+    """Registrira besedišče: target=True -> vanj se popravlja, sicer le zaščita."""
+    if _REGISTRY.register(name, words, target):
+        correct_typos.cache_clear()
+
+
+def build_typo_index() -> int:
+    """Zgradi indeks vnaprej (ob uvozu detektorjev); vrne število brisanj."""
+    return len(_REGISTRY.build())
+
+
+def correct_word(word: str) -> str:
+    return _REGISTRY.build().lookup(word) or word
+
+
+@lru_cache(maxsize=TYPO_CACHE_SIZE)
+def correct_typos(text: str) -> str:
+    """Besedilo s popravljenimi tipkarskimi napakami (ločila in ostalo ostanejo)."""
+    index = _REGISTRY.build()
+    return _WORD_RE.sub(lambda match: index.lookup(match.group(0)) or match.group(0), text)
@@ -1,25 +1,58 @@
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 
-from app.core.config import Settings
+from app.core.config import get_settings
+from app.core.llm_client import close_llm_clients
+from app.core.metrics import render_metrics
+from app.services.answer_cache import DatabaseAnswerCache, get_answer_cache
+from app.services.intent_classifier import get_intent_classifier
 from app.services.chat_router import router as chat_router
 from app.services.reservation_router import router as reservation_router
+from app.services.reservation_service import get_reservation_service
 from app.services.admin_router import router as admin_router
 from app.services.webhook_router import router as webhook_router
 
 # Naloži .env v okolje ob zagonu (za SMTP ipd.)
 load_dotenv()
 
-settings = Settings()
-app = FastAPI(title=settings.project_name)
+settings = get_settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ena instanca storitve za vse routerje: migracije, pool in indeks zasedenosti ob zagonu
+    service = get_reservation_service()
+    service.startup()
+    # le pretečeni/odvečni odgovori deljenega predpomnilnika: vnosov drugih verzij KB
+    # ne brišemo, ker jih ob rolling deployu še berejo stari workerji (ključ vsebuje
+    # verzijo, zato se ne postrežejo napačno); te počistita scrape_kb.py in warmer
+    cache = get_answer_cache()
+    if isinstance(cache, DatabaseAnswerCache):
+        removed = cache.purge()
+        if removed:
+            print(f"[CACHE] odstranjenih {removed} pretečenih odgovorov")
+    # lokalni klasifikator rezervacijske namere se naloži enkrat, ne ob prvem sporočilu
+    get_intent_classifier()
+    yield
+    service.shutdown()
+    await close_llm_clients()
+
+
+app = FastAPI(title=settings.project_name, lifespan=lifespan)
 
 @app.get("/health")
 def health_check() -> dict[str, str]:
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Histogrami faz chat cevovoda in LLM klicev (Prometheus tekstovni format)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/", response_class=HTMLResponse)
 def chat_ui() -> HTMLResponse:
     """
@@ -0,0 +1,108 @@
+"""
+Mikro-benchmark: cena detekcije namer na eno sporočilo.
+
+Primerja linearni pregled (`any(kw in text for kw in skupina)` za vse
+registrirane skupine, kot so to delali detektorji) z enim prehodom
+Aho-Corasick avtomata ter izmeri celotno verigo detektorjev (s popravki
+tipkarskih napak), ki jo sproži eno sporočilo (predpomnilnika pregleda in
+popravkov se pred vsakim sporočilom izpraznita).
+
+    python scripts/bench_keyword_matcher.py
+    python scripts/bench_keyword_matcher.py --rounds 2000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+MESSAGES = [
+    "Pozdravljeni, koliko stane nočitev za 2 osebi?",
+    "Rad bi rezerviral sobo za vikend 14.6. za 4 osebe",
+    "ali imate wifi v sobah",
+    "Kdaj ste odprti ob nedeljah?",
+    "Imate kakšno vinsko karto? Zanima me tudi liker.",
+    "Rezerviram mizo za 6 oseb ob 13:00",
+    "kaj je na jedilniku ta vikend",
+    "Ali lahko pripeljem psa?",
+    "Bi naročil 30 paketov salame za teambuilding",
+    "Hvala, nasvidenje!",
+    "Do you have a room for two nights in July?",
+    "I would like to book a table for dinner",
+    "What is the price of breakfast?",
+    "Haben Sie ein Zimmer frei für 3 Nächte?",
+    "Ich möchte einen Tisch reservieren, bitte",
+    "Gibt es Parkplätze bei Ihnen?",
+    "kje ste, kako pridem do vas",
+    "izleti v okolici, slap skalca?",
+    "darilni bon za 100 eur",
+    "koliko sob imate in ali imajo klimo",
+]
+
+
+def detector_chain(message: str) -> None:
+    from app.services import chat_router as cr
+    from app.services import router_agent
+    from app.services.typo_index import correct_typos
+
+    state = {"step": None}
+    cr.detect_language(message)
+    cr.detect_router_intent(message, state)
+    cr.detect_intent(message, state)
+    cr.detect_info_intent(message)
+    cr.is_info_only_question(message)
+    cr.is_inquiry_trigger(message)
+    # route_message brez zapisovanja v router_debug.log
+    lowered = correct_typos(message.lower())
+    router_agent._detect_booking_intent(lowered, False)
+    router_agent._detect_topic_intent(lowered)
+    router_agent._detect_info_intent(lowered)
+    router_agent._detect_product_intent(lowered)
+
+
+def per_message_us(fn, messages: list[str], rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - started) / (rounds * len(messages)) * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+
+    from app.services import chat_router  # noqa: F401 (registrira skupine)
+    from app.services.keyword_matcher import _REGISTRY, scan_keywords
+    from app.services.typo_index import _REGISTRY as _TYPOS, correct_typos
+
+    groups = [words for words, _ in _REGISTRY._groups.values()]
+    lowered = [message.lower() for message in MESSAGES]
+
+    def linear(text: str) -> None:
+        for words in groups:
+            any(word in text for word in words)
+
+    def cold_chain(message: str) -> None:
+        scan_keywords.cache_clear()
+        correct_typos.cache_clear()
+        _TYPOS.build()._lookups.clear()
+        detector_chain(message)
+
+    # ogrevanje (prevajanje avtomata, uvozi)
+    for message in MESSAGES:
+        detector_chain(message)
+
+    print(f"{len(groups)} skupin, {sum(len(words) for words in groups)} ključnih besed, {len(MESSAGES)} sporočil")
+    print(f"linearni pregled vseh skupin:   {per_message_us(linear, lowered, args.rounds):8.1f} µs/sporočilo")
+    print(f"en prehod avtomata:             {per_message_us(_REGISTRY.scan, lowered, args.rounds):8.1f} µs/sporočilo")
+    print(f"veriga detektorjev (hladno):    {per_message_us(cold_chain, MESSAGES, args.rounds):8.1f} µs/sporočilo")
+    print(f"veriga detektorjev (predpomn.): {per_message_us(detector_chain, MESSAGES, args.rounds):8.1f} µs/sporočilo")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
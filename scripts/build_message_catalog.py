@@ -0,0 +1,154 @@
+"""
+Zgradi katalog fiksnih sporočil (data/message_catalog.json) v si/en/de.
+
+Slovenski izvori se preberejo iz kode (chat_router), manjkajoči ali
+spremenjeni vnosi (drug source_hash) se prevedejo z LLM, nespremenjeni
+ostanejo, kot so. Ob vsaki spremembi se poveča `version`.
+
+    python scripts/build_message_catalog.py          # posodobi katalog
+    python scripts/build_message_catalog.py --check  # exit 1, če katalog ni ažuren
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from app.services.message_catalog import CATALOG_PATH, LANGUAGES, SOURCE_LANGUAGE, source_hash
+
+TRANSLATE_INSTRUCTIONS = {
+    "en": "Translate the Slovenian text to natural, friendly English.",
+    "de": "Übersetze den slowenischen Text in natürliches, freundliches Deutsch.",
+}
+TRANSLATE_RULES = (
+    " Keep markdown (**bold**), emojis, line breaks, URLs, e-mail addresses, phone numbers, "
+    "prices, times, room names (ALJAŽ, JULIJA, ANA) and formats like DD.MM.YYYY unchanged. "
+    "Return only the translation."
+)
+
+
+def catalog_sources() -> dict[str, str]:
+    """Ključ -> slovensko besedilo za vse fiksne odgovore."""
+    from app.services import chat_router as cr
+
+    sources: dict[str, str] = {}
+    for key, text in cr.INFO_RESPONSES.items():
+        sources[f"info.{key}"] = text
+    for key, text in cr.STATIC_REPLIES.items():
+        sources[f"reply.{key}"] = text
+    for step, text in cr.BOOKING_CONTINUATIONS.items():
+        sources[f"continuation.{step}"] = text
+    sources["continuation.default"] = cr.BOOKING_CONTINUATION_DEFAULT
+    for prefix, prompts in (
+        ("prompt.room", cr.ROOM_STEP_PROMPTS),
+        ("prompt.table", cr.TABLE_STEP_PROMPTS),
+        ("prompt", cr.COMMON_STEP_PROMPTS),
+    ):
+        for step, text in prompts.items():
+            sources[f"{prefix}.{step}"] = text
+    sources["prompt.default"] = cr.STEP_PROMPT_DEFAULT
+    sources["reservation.pending"] = cr.RESERVATION_PENDING_MESSAGE
+    sources["intro.room"] = cr.room_intro_text()
+    sources["intro.table"] = cr.table_intro_text()
+    for name, texts in (
+        ("greeting", cr.GREETING_RESPONSES),
+        ("thanks", cr.THANKS_RESPONSES),
+        ("unknown", cr.UNKNOWN_RESPONSES),
+    ):
+        for index, text in enumerate(texts):
+            sources[f"{name}.{index}"] = text
+    for key, texts in cr.PRODUCT_RESPONSES.items():
+        for index, text in enumerate(texts):
+            sources[f"product.{key}.{index}"] = text
+    return {key: text.strip() for key, text in sources.items() if text and text.strip()}
+
+
+def translate(text: str, lang: str) -> str:
+    from app.core.config import get_settings
+    from app.core.llm_client import create_response
+
+    response = create_response(
+        "catalog_build",
+        kind="translate",
+        model=getattr(get_settings(), "openai_model", "gpt-4.1-mini"),
+        input=[
+            {"role": "system", "content": TRANSLATE_INSTRUCTIONS[lang] + TRANSLATE_RULES},
+            {"role": "user", "content": text},
+        ],
+        temperature=0,
+        max_output_tokens=600,
+    )
+    return (getattr(response, "output_text", "") or "").strip()
+
+
+def load_catalog(path: Path) -> dict:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {"version": 0, "messages": {}}
+
+
+def stale_keys(sources: dict[str, str], messages: dict[str, dict]) -> list[str]:
+    stale = []
+    for key, text in sources.items():
+        entry = messages.get(key) or {}
+        if entry.get("source_hash") != source_hash(text) or any(not entry.get(lang) for lang in LANGUAGES):
+            stale.append(key)
+    return stale
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="samo preveri, ali je katalog ažuren")
+    parser.add_argument("--path", type=Path, default=CATALOG_PATH)
+    args = parser.parse_args()
+
+    sources = catalog_sources()
+    catalog = load_catalog(args.path)
+    messages: dict[str, dict] = catalog.get("messages") or {}
+    stale = stale_keys(sources, messages)
+    removed = sorted(set(messages) - set(sources))
+
+    if args.check:
+        for key in stale:
+            print(f"zastarelo: {key}")
+        for key in removed:
+            print(f"odveč: {key}")
+        return 1 if stale or removed else 0
+
+    if not stale and not removed:
+        print(f"Katalog v{catalog.get('version', 0)} je ažuren ({len(messages)} sporočil).")
+        return 0
+
+    # isto slovensko besedilo pod več ključi prevedemo enkrat
+    translated: dict[tuple[str, str], str] = {}
+    for key in stale:
+        text = sources[key]
+        entry = {"source_hash": source_hash(text), SOURCE_LANGUAGE: text}
+        for lang in LANGUAGES:
+            if lang == SOURCE_LANGUAGE:
+                continue
+            if (text, lang) not in translated:
+                translated[(text, lang)] = translate(text, lang)
+            entry[lang] = translated[(text, lang)]
+        messages[key] = entry
+        print(f"preveden: {key}")
+    for key in removed:
+        messages.pop(key, None)
+
+    catalog = {
+        "version": int(catalog.get("version") or 0) + 1,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "languages": list(LANGUAGES),
+        "messages": {key: messages[key] for key in sorted(messages)},
+    }
+    args.path.parent.mkdir(parents=True, exist_ok=True)
+    args.path.write_text(json.dumps(catalog, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print(f"Katalog v{catalog['version']}: {len(messages)} sporočil ({len(stale)} novih/spremenjenih).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
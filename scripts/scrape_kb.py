@@ -133,6 +133,22 @@ def write_jsonl(pages: List[PageData], path: Path) -> None:
     print(f"Wrote {len(pages)} records to {path}")
 
 
+def invalidate_answer_cache() -> None:
+    """Nova baza znanja -> deljeni predpomnjeni odgovori (ANSWER_CACHE=db) ne veljajo več."""
+    import sys
+
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    try:
+        from app.services.answer_cache import DatabaseAnswerCache, get_answer_cache
+
+        cache = get_answer_cache()
+        if isinstance(cache, DatabaseAnswerCache):
+            print(f"Answer cache: removed {cache.invalidate()} entries")
+    except Exception as exc:
+        print(f"Answer cache not invalidated: {exc}")
+
+
 if __name__ == "__main__":
     data = scrape_all()
     write_jsonl(data, OUTPUT_PATH)
+    invalidate_answer_cache()
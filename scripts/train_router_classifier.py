@@ -0,0 +1,126 @@
+"""
+Nauči lokalni klasifikator rezervacijske namere in ga shrani v
+data/reservation_classifier.json (glej app/services/intent_classifier.py).
+
+Učni primeri:
+- data/router_debug.log: odločitve routerja brez aktivne rezervacije
+  (BOOKING_ROOM / BOOKING_TABLE, vse ostalo NONE; BOOKING_CONTINUE se izpusti),
+- tests/fixtures/router_intents.jsonl: ročno označeni primeri (imajo prednost).
+
+    python scripts/train_router_classifier.py
+    python scripts/train_router_classifier.py --dry-run   # samo ocena, brez zapisa
+"""
+import argparse
+import json
+import random
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from app.services.intent_classifier import (  # noqa: E402
+    CLASSIFIER_PATH,
+    LABELS,
+    ROUTER_CLASSIFIER_THRESHOLD,
+    normalize_text,
+    train,
+)
+
+ROUTER_LOG = BASE_DIR / "data" / "router_debug.log"
+FIXTURES = BASE_DIR / "tests" / "fixtures" / "router_intents.jsonl"
+HOLDOUT_SHARE = 0.2
+
+
+def log_examples(path: Path = ROUTER_LOG) -> dict[str, str]:
+    """Normalizirano sporočilo -> najpogostejša oznaka v logu."""
+    votes: dict[str, Counter] = defaultdict(Counter)
+    messages: dict[str, str] = {}
+    if not path.exists():
+        return {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if "{" not in line:
+            continue
+        try:
+            record = json.loads(line[line.index("{"):])
+        except ValueError:
+            continue
+        intent = record.get("intent")
+        message = (record.get("message") or "").strip()
+        if not message or record.get("booking_step") is not None or intent == "BOOKING_CONTINUE":
+            continue
+        key = normalize_text(message)
+        messages.setdefault(key, message)
+        votes[key][intent if intent in LABELS else "NONE"] += 1
+    return {messages[key]: counter.most_common(1)[0][0] for key, counter in votes.items()}
+
+
+def fixture_examples(path: Path = FIXTURES) -> dict[str, str]:
+    examples = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            row = json.loads(line)
+            examples[row["message"]] = row["label"]
+    return examples
+
+
+def collect_examples() -> list[tuple[str, str]]:
+    merged: dict[str, tuple[str, str]] = {}
+    for message, label in log_examples().items():
+        merged[normalize_text(message)] = (message, label)
+    for message, label in fixture_examples().items():
+        merged[normalize_text(message)] = (message, label)
+    return sorted(merged.values())
+
+
+def evaluate(classifier, examples: list[tuple[str, str]], threshold: float) -> dict[str, float]:
+    correct = confident = confident_correct = 0
+    for message, label in examples:
+        predicted, confidence = classifier.predict(message)
+        correct += predicted == label
+        if confidence >= threshold:
+            confident += 1
+            confident_correct += predicted == label
+    total = len(examples) or 1
+    return {
+        "accuracy": round(correct / total, 3),
+        "coverage": round(confident / total, 3),
+        "confident_accuracy": round(confident_correct / confident, 3) if confident else 0.0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="ne zapiši modela")
+    parser.add_argument("--threshold", type=float, default=ROUTER_CLASSIFIER_THRESHOLD)
+    args = parser.parse_args()
+
+    examples = collect_examples()
+    print(f"Primerov: {len(examples)} {dict(Counter(label for _, label in examples))}")
+
+    # ocena na odloženih primerih (po razredih), nato učenje na vseh
+    rnd = random.Random(42)
+    holdout: list[tuple[str, str]] = []
+    training: list[tuple[str, str]] = []
+    for label in LABELS:
+        rows = [example for example in examples if example[1] == label]
+        rnd.shuffle(rows)
+        cut = max(1, int(len(rows) * HOLDOUT_SHARE)) if len(rows) > 2 else 0
+        holdout.extend(rows[:cut])
+        training.extend(rows[cut:])
+    holdout_metrics = evaluate(train(training), holdout, args.threshold)
+    print(f"Odloženi primeri ({len(holdout)}): {holdout_metrics}")
+
+    classifier = train(examples)
+    classifier.meta["holdout"] = holdout_metrics
+    print(f"Učni primeri: {evaluate(classifier, examples, args.threshold)}")
+    if args.dry_run:
+        return 0
+    classifier.save(CLASSIFIER_PATH)
+    print(f"Shranjeno: {CLASSIFIER_PATH.relative_to(BASE_DIR)} ({classifier.version})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
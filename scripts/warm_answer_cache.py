@@ -0,0 +1,143 @@
+"""
+Vnaprej odgovori na najpogostejša vprašanja gostov in jih shrani v
+predpomnilnik odgovorov (tabela answer_cache, verzija trenutne baze znanja).
+
+Prvi obiskovalec po deployu ali osvežitvi baze znanja tako ne čaka na model.
+Koristno le, če aplikacija teče z ANSWER_CACHE=db (skripta vedno piše v tabelo).
+
+    python scripts/warm_answer_cache.py                 # top 20 na jezik
+    python scripts/warm_answer_cache.py --top 50 --concurrency 8
+    python scripts/warm_answer_cache.py --refresh       # tudi že predpomnjene
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from app.services.answer_cache import cache_key  # noqa: E402
+
+# koliko surovih sporočil preberemo na eno izbrano vprašanje (ista vprašanja z različnim zapisom)
+RAW_ROWS_PER_QUESTION = 5
+
+
+def select_questions(rows: list[dict], per_language: int, detect_language) -> list[tuple[str, str, int]]:
+    """
+    Iz (user_message, count) izbere do `per_language` najpogostejših vprašanj na
+    jezik; sporočila z istim normaliziranim ključem se seštejejo.
+    Vrne [(vprašanje, jezik, število)].
+    """
+    grouped: dict[str, list] = {}
+    for row in rows:
+        message = (row.get("user_message") or "").strip()
+        if not message:
+            continue
+        language = detect_language(message)
+        key = cache_key(message, language, "")
+        if key is None:
+            continue
+        entry = grouped.setdefault(key, [message, language, 0])
+        entry[2] += int(row.get("count") or 0)
+    selected: list[tuple[str, str, int]] = []
+    by_language: dict[str, int] = {}
+    for message, language, count in sorted(grouped.values(), key=lambda item: item[2], reverse=True):
+        if by_language.get(language, 0) >= per_language:
+            continue
+        by_language[language] = by_language.get(language, 0) + 1
+        selected.append((message, language, count))
+    return selected
+
+
+async def warm(
+    questions: list[tuple[str, str, int]],
+    answer_fn,
+    cache,
+    kb_version: str,
+    concurrency: int = 4,
+    refresh: bool = False,
+) -> dict[str, int]:
+    """
+    Vsako vprašanje pošlje skozi `answer_fn(vprašanje, jezik)` (vrne odgovor ali
+    None, če vprašanje ni informativno) z največ `concurrency` hkratnimi klici.
+    """
+    report = {"refreshed": 0, "skipped": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def warm_one(question: str, language: str) -> None:
+        if not refresh and cache.get(question, language, kb_version):
+            report["skipped"] += 1
+            return
+        async with semaphore:
+            try:
+                answer = await answer_fn(question, language)
+            except Exception as exc:
+                print(f"napaka: {question!r}: {exc}")
+                report["failed"] += 1
+                return
+        if not answer:
+            # rezervacija, pozdrav ipd. -> ni za predpomnilnik
+            report["skipped"] += 1
+            return
+        cache.set(question, language, kb_version, answer)
+        report["refreshed"] += 1
+        print(f"[{language}] {question}")
+
+    await asyncio.gather(*(warm_one(question, language) for question, language, _ in questions))
+    return report
+
+
+async def pipeline_answer(question: str, language: str):
+    """Ista pot kot v klepetu: one-shot klic, sicer odgovor iz baze znanja."""
+    from app.services import chat_router as cr
+
+    if cr.USE_ONE_SHOT_LLM:
+        result = await cr._llm_one_shot_async(question, language)
+        if result is None:
+            raise RuntimeError("one-shot klic ni uspel")
+        return result["answer"].strip() if result["intent"] == "INFO" else None
+    answer = await cr._llm_answer_full_kb_async(question, language)
+    if answer in {cr.FULL_KB_EMPTY_ANSWER, cr.FULL_KB_ERROR_ANSWER}:
+        raise RuntimeError("ni odgovora")
+    return answer
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=20, help="število vprašanj na jezik")
+    parser.add_argument("--concurrency", type=int, default=4, help="največ hkratnih LLM klicev")
+    parser.add_argument("--refresh", action="store_true", help="ponovno odgovori tudi na že predpomnjena")
+    args = parser.parse_args()
+
+    from app.core.llm_client import close_llm_clients
+    from app.rag.knowledge_base import KB_VERSION
+    from app.services.answer_cache import DatabaseAnswerCache
+    from app.services.chat_router import detect_language
+    from app.services.reservation_service import get_reservation_service
+
+    service = get_reservation_service()
+    service.startup()
+    # deljen predpomnilnik; ogrevanje v pomnilniku skripte nima smisla
+    cache = DatabaseAnswerCache(lambda: service)
+    removed = cache.invalidate(KB_VERSION)
+    if removed:
+        print(f"Odstranjenih {removed} odgovorov stare baze znanja.")
+
+    rows = service.get_top_questions(limit=args.top * RAW_ROWS_PER_QUESTION * 3)
+    questions = select_questions(rows, args.top, detect_language)
+    print(f"Baza znanja {KB_VERSION}: {len(questions)} vprašanj za ogrevanje.")
+
+    async def run() -> dict[str, int]:
+        try:
+            return await warm(questions, pipeline_answer, cache, KB_VERSION, args.concurrency, args.refresh)
+        finally:
+            await close_llm_clients()
+
+    report = asyncio.run(run())
+    print(f"Osveženih: {report['refreshed']}, preskočenih: {report['skipped']}, neuspešnih: {report['failed']}")
+    return 1 if report["failed"] and not report["refreshed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,3 +18,14 @@ except ModuleNotFoundError:
     psycopg2_extras_stub = types.SimpleNamespace(RealDictCursor=None)
     sys.modules["psycopg2"] = psycopg2_stub
     sys.modules["psycopg2.extras"] = psycopg2_extras_stub
+
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _fresh_answer_cache(monkeypatch):
+    """Vsak test začne s praznim predpomnilnikom odgovorov."""
+    from app.services import answer_cache
+
+    monkeypatch.setattr(answer_cache, "_CACHE", None)
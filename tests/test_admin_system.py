@@ -206,6 +206,21 @@ class TestAdminAPI:
         assert "confirmed" in stats
         assert "today" in stats
 
+    def test_availability_matrix_endpoint(self):
+        """Preveri matriko razpoložljivosti za cel mesec."""
+        response = client.get("/reservations/availability?start=2030-12-01&days=31")
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["days"]) == 31
+        assert set(data["rooms"]) == {"MARIJA", "TINKARA", "CILKA", "HANA", "MANCA", "URSKA_SUITE", "ANA_SUITE"}
+        assert all(len(row) == 31 for row in data["rooms"].values())
+        assert data["min_nights"][0] == 2
+
+    def test_availability_matrix_invalid_date(self):
+        """Neveljaven datum vrne 400."""
+        response = client.get("/reservations/availability?start=jutri")
+        assert response.status_code == 400
+
 
 # ============================================================
 # 4. TESTI ZA RESERVATION SERVICE
@@ -215,6 +230,15 @@ class TestAdminAPI:
 class TestReservationService:
     """Testi za ReservationService."""
 
+    def test_single_shared_instance(self):
+        """Vsi routerji uporabljajo isto instanco storitve."""
+        from app.services import admin_router, chat_router
+        from app.services.reservation_service import get_reservation_service
+
+        service = get_reservation_service()
+        assert admin_router.service is service
+        assert chat_router.reservation_service is service
+
     def test_create_reservation(self, sample_chat_reservation):
         """Preveri ustvarjanje rezervacije."""
         from app.services.reservation_service import ReservationService
@@ -461,3 +461,1016 @@ class TestEdgeCases:
         assert detect_intent("REZERVACIJA SOBE") == "reservation"
         assert detect_intent("Rdeča Vina") == "wine"
         assert detect_intent("KJE STE") == "farm_info"
+
+
+class TestSessionStore:
+    """Testi za shrambo pogovornih sej (LRU + TTL, DB backend)."""
+
+    def test_sessions_are_isolated(self):
+        from app.services.session_store import InMemorySessionStore
+
+        store = InMemorySessionStore(max_sessions=10)
+        a = store.get("a")
+        a.last_product_query = "salama"
+        a.add_message("user", "živjo")
+        b = store.get("b")
+        assert b.last_product_query is None
+        assert len(b.history) == 0
+        assert store.get("a") is a
+
+    def test_history_is_bounded(self):
+        from app.services.session_store import HISTORY_MAX, InMemorySessionStore
+
+        session = InMemorySessionStore().get("x")
+        for i in range(HISTORY_MAX + 5):
+            session.add_message("user", str(i))
+        assert len(session.history) == HISTORY_MAX
+        assert session.history[-1]["content"] == str(HISTORY_MAX + 4)
+
+    def test_lru_eviction(self):
+        from app.services.session_store import InMemorySessionStore
+
+        store = InMemorySessionStore(max_sessions=2)
+        first = store.get("1")
+        store.get("2")
+        store.get("1")  # "1" je zdaj najnovejša
+        store.get("3")
+        assert len(store) == 2
+        assert store.get("1") is first
+        assert store.stats["evicted"] >= 1
+
+    def test_ttl_expiry(self):
+        from app.services.session_store import InMemorySessionStore
+
+        store = InMemorySessionStore(ttl_hours=0)
+        old = store.get("a")
+        old.last_info_query = "wellness"
+        store.get("b")
+        assert store.get("a") is not old
+        assert store.stats["expired"] >= 1
+
+    def test_database_store_roundtrip(self, tmp_path):
+        from app.services.reservation_service import ReservationService
+        from app.services.session_store import DatabaseSessionStore
+
+        service = ReservationService(db_path=str(tmp_path / "sessions.db"))
+        store = DatabaseSessionStore(lambda: service)
+        session = store.get("s1")
+        session.reservation.update({"step": "awaiting_room_date", "type": "room"})
+        session.add_message("user", "rad bi sobo")
+        session.last_interaction = datetime.now()
+        store.save(session)
+
+        # drug worker dobi isto sejo
+        other = DatabaseSessionStore(lambda: service).get("s1")
+        assert other is not session
+        assert other.reservation["step"] == "awaiting_room_date"
+        assert list(other.history) == [{"role": "user", "content": "rad bi sobo"}]
+        store.delete("s1")
+        assert store.get("s1").reservation == {}
+
+    def test_reset_conversation_context_per_session(self):
+        from app.services.chat_router import get_reservation_state, get_session, reset_conversation_context
+
+        state = get_reservation_state("reset-a")
+        state["step"] = "awaiting_people"
+        get_session("reset-a").last_product_query = "bunka"
+        other = get_reservation_state("reset-b")
+        other["step"] = "awaiting_room_date"
+        reset_conversation_context("reset-a")
+        assert get_reservation_state("reset-a")["step"] is None
+        assert get_session("reset-a").last_product_query is None
+        assert get_reservation_state("reset-b")["step"] == "awaiting_room_date"
+
+
+class TestAsyncLLM:
+    """Testi za async LLM klice (brez pravega OpenAI)."""
+
+    class _FakeResponses:
+        def __init__(self, delay: float = 0.0):
+            self.delay = delay
+            self.calls = 0
+
+        async def create(self, **kwargs):
+            import asyncio
+            from types import SimpleNamespace
+
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            if kwargs.get("tools"):
+                call = SimpleNamespace(type="function_call", name="reservation_intent", arguments='{"action": "BOOKING_ROOM"}')
+                return SimpleNamespace(output=[SimpleNamespace(content=[call])])
+            return SimpleNamespace(output_text="Odgovor iz modela.", output=[])
+
+    def _patch(self, monkeypatch, delay: float = 0.0):
+        from types import SimpleNamespace
+        import app.core.llm_client as llm_client
+
+        responses = self._FakeResponses(delay)
+        client = SimpleNamespace(responses=responses)
+        client.with_options = lambda **kwargs: client
+        monkeypatch.setattr(llm_client, "get_async_llm_client", lambda: client)
+        return responses
+
+    def test_route_and_answer(self, monkeypatch):
+        import asyncio
+        from app.services.chat_router import _llm_answer_full_kb_async, _llm_route_reservation_async
+
+        self._patch(monkeypatch)
+        assert asyncio.run(_llm_route_reservation_async("rad bi sobo"))["action"] == "BOOKING_ROOM"
+        assert asyncio.run(_llm_answer_full_kb_async("kje ste")) == "Odgovor iz modela."
+
+    def test_concurrent_calls_do_not_block(self, monkeypatch):
+        """Deset hkratnih klicev po 0.2 s mora trajati približno 0.2 s, ne 2 s."""
+        import asyncio
+        import time
+        from app.services.chat_router import _llm_answer_full_kb_async
+
+        responses = self._patch(monkeypatch, delay=0.2)
+
+        async def run_all():
+            return await asyncio.gather(*[_llm_answer_full_kb_async(f"vprašanje {i}") for i in range(10)])
+
+        started = time.monotonic()
+        replies = asyncio.run(run_all())
+        assert len(replies) == 10
+        assert responses.calls == 10
+        assert time.monotonic() - started < 1.0
+
+
+class TestLLMClient:
+    """Testi za skupni LLM odjemalec (ponovni poskusi, timeouti, števci)."""
+
+    @staticmethod
+    def _error(status: int):
+        import httpx
+        from openai import APIStatusError, RateLimitError
+
+        response = httpx.Response(status, request=httpx.Request("POST", "https://api.openai.com/v1/responses"))
+        cls = RateLimitError if status == 429 else APIStatusError
+        return cls("napaka", response=response, body=None)
+
+    def _patch(self, monkeypatch, outcomes):
+        from types import SimpleNamespace
+        import app.core.llm_client as llm_client
+
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        client = SimpleNamespace(responses=SimpleNamespace(create=create))
+        client.with_options = lambda **kwargs: client
+        monkeypatch.setattr(llm_client, "get_llm_client", lambda: client)
+        monkeypatch.setattr(llm_client, "LLM_BACKOFF_BASE", 0.0)
+        llm_client.reset_llm_stats()
+        return calls
+
+    def test_retry_on_rate_limit_and_server_error(self, monkeypatch):
+        from types import SimpleNamespace
+        from app.core.llm_client import create_response, llm_stats
+
+        usage = SimpleNamespace(input_tokens=120, output_tokens=30)
+        calls = self._patch(monkeypatch, [self._error(429), self._error(503), SimpleNamespace(output_text="ok", usage=usage)])
+        response = create_response("test_site", model="m", input=[])
+        assert response.output_text == "ok"
+        assert len(calls) == 3
+        stats = llm_stats()["test_site"]
+        assert stats["calls"] == 1
+        assert stats["retries"] == 2
+        assert stats["errors"] == 0
+        assert stats["input_tokens"] == 120
+        assert stats["output_tokens"] == 30
+
+    def test_client_error_is_not_retried(self, monkeypatch):
+        import pytest
+        from openai import APIStatusError
+        from app.core.llm_client import create_response, llm_stats
+
+        calls = self._patch(monkeypatch, [self._error(400)])
+        with pytest.raises(APIStatusError):
+            create_response("test_site", model="m", input=[])
+        assert len(calls) == 1
+        assert llm_stats()["test_site"]["errors"] == 1
+
+    def test_timeout_per_call_kind(self, monkeypatch):
+        from app.core.llm_client import CALL_TIMEOUTS, call_timeout
+
+        assert call_timeout("route") == CALL_TIMEOUTS["route"]
+        assert call_timeout("route") < call_timeout("stream")
+        monkeypatch.setenv("LLM_TIMEOUT_ROUTE", "3")
+        assert call_timeout("route") == 3.0
+
+    def test_settings_are_cached(self):
+        from app.core.config import get_settings
+
+        assert get_settings() is get_settings()
+
+    def test_cached_input_tokens(self, monkeypatch):
+        from types import SimpleNamespace
+        from app.core.llm_client import create_response, llm_stats
+
+        usage = SimpleNamespace(
+            input_tokens=1000, output_tokens=50, input_tokens_details=SimpleNamespace(cached_tokens=768)
+        )
+        self._patch(monkeypatch, [SimpleNamespace(output_text="ok", usage=usage)])
+        create_response("test_site", model="m", input=[])
+        stats = llm_stats()["test_site"]
+        assert stats["cached_input_tokens"] == 768
+        assert stats["uncached_input_tokens"] == 232
+        assert stats["cache_hit_ratio"] == 0.768
+
+    def test_full_kb_prompt_prefix_is_stable(self, monkeypatch):
+        import app.services.chat_router as chat_router
+        from app.core.config import get_settings
+
+        monkeypatch.setattr(chat_router, "USE_BOUNDED_CONTEXT", False)
+        from app.services.chat_router import (
+            FULL_KB_VERSION,
+            _full_kb_prefix,
+            _full_kb_request,
+            _llm_system_prompt_full_kb,
+            _one_shot_request,
+        )
+
+        prefix = _full_kb_prefix(FULL_KB_VERSION)
+        assert _full_kb_prefix(FULL_KB_VERSION) is prefix
+        prompts = [_llm_system_prompt_full_kb(lang) for lang in ("si", "en", "de")]
+        assert all(prompt.startswith(prefix) for prompt in prompts)
+        assert len(set(prompts)) == 3
+        settings = get_settings()
+        full_kb = _full_kb_request("Kje ste?", settings, "en")
+        one_shot = _one_shot_request("Wo sind Sie?", settings, "de")
+        assert full_kb["prompt_cache_key"] == one_shot["prompt_cache_key"]
+        assert full_kb["input"][0]["content"].startswith(prefix)
+
+
+class TestMessageCatalog:
+    """Testi za katalog fiksnih sporočil (si/en/de brez LLM)."""
+
+    def test_static_reply_translated_without_llm(self, monkeypatch):
+        import asyncio
+        import app.services.chat_router as chat_router
+
+        async def no_llm(*args, **kwargs):
+            raise AssertionError("fiksni odgovor ne sme klicati LLM")
+
+        monkeypatch.setattr(chat_router, "generate_llm_answer_async", no_llm)
+        reply = asyncio.run(chat_router.maybe_translate_async(chat_router.STATIC_REPLIES["switch_topic"], "de"))
+        assert reply == "Natürlich — wechseln wir das Thema. Wie kann ich Ihnen helfen?"
+        reply = asyncio.run(chat_router.maybe_translate_async(chat_router.INFO_RESPONSES["kontakt"], "en"))
+        assert reply.startswith("📞 Phone:")
+
+    def test_lookup_by_key(self):
+        from app.services.message_catalog import get_message_catalog
+
+        catalog = get_message_catalog()
+        assert catalog.get("reply.clarify_reservation", "en") == "Would you like to book a **room** or a **table**?"
+        assert catalog.get("reply.clarify_reservation", "xx").startswith("Želite")
+        assert catalog.get("ne.obstaja", "en") is None
+
+    def test_composite_reply(self):
+        from app.services.chat_router import BOOKING_CONTINUATIONS, INFO_RESPONSES, STATIC_REPLIES
+        from app.services.message_catalog import get_message_catalog
+
+        text = (
+            f"{INFO_RESPONSES['parking']}\n\n---\n\n"
+            f"{STATIC_REPLIES['booking_continue_header']}\n{BOOKING_CONTINUATIONS['awaiting_email']}"
+        )
+        translated = get_message_catalog().translate(text, "en")
+        assert translated is not None
+        assert "Your **e-mail**?" in translated
+        # neznan del -> celoten odgovor gre v LLM prevod
+        assert get_message_catalog().translate(text + "\nNekaj novega.", "en") is None
+
+    def test_changed_source_is_not_used(self):
+        from app.services.message_catalog import MessageCatalog, source_hash
+
+        catalog = MessageCatalog(
+            {
+                "version": 1,
+                "messages": {
+                    "reply.x": {"source_hash": source_hash("Staro besedilo."), "si": "Novo besedilo.", "en": "Old text."},
+                },
+            }
+        )
+        assert catalog.translate("Novo besedilo.", "en") is None
+
+    def test_catalog_is_up_to_date(self):
+        """Po spremembi fiksnih besedil je treba pognati scripts/build_message_catalog.py."""
+        import sys
+        from pathlib import Path
+        from app.services.message_catalog import get_message_catalog
+
+        sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+        from build_message_catalog import catalog_sources, stale_keys
+
+        assert stale_keys(catalog_sources(), get_message_catalog().messages) == []
+
+
+class TestNativeLanguage:
+    """Testi za odgovore neposredno v jeziku gosta (brez naknadnega prevoda)."""
+
+    def test_language_instruction_in_request(self):
+        from app.rag.knowledge_base import LANGUAGE_INSTRUCTIONS, _llm_answer_request
+
+        request = _llm_answer_request("Where can I park?", 3, None, "de")
+        contents = [item["content"] for item in request["input"]]
+        assert LANGUAGE_INSTRUCTIONS["de"] in contents
+        request = _llm_answer_request("Kje lahko parkiram?", 3, None)
+        contents = [item["content"] for item in request["input"]]
+        assert not any(text in contents for text in LANGUAGE_INSTRUCTIONS.values())
+
+    def test_llm_answer_is_not_translated_again(self, monkeypatch):
+        import asyncio
+        import app.services.chat_router as chat_router
+
+        calls = []
+
+        async def fake_answer(question, **kwargs):
+            calls.append(kwargs)
+            if kwargs.get("call_site") == "translate":
+                raise AssertionError("odgovor modela se ne sme ponovno prevajati")
+            return "You can park right in front of the house."
+
+        monkeypatch.setattr(chat_router, "generate_llm_answer_async", fake_answer)
+        reply = asyncio.run(chat_router._llm_answer_async("Where can I park?", [], "en"))
+        reply = chat_router.with_booking_continuation(reply, "awaiting_email", {}, "en")
+        assert calls == [{"history": [], "language": "en"}]
+        assert reply.startswith("You can park right in front of the house.\n\n---\n\n")
+        assert reply.endswith("Your **e-mail**?")
+        assert chat_router.STATIC_REPLIES["booking_continue_header"] not in reply
+
+    def test_fragments_in_guest_language(self):
+        from app.services.chat_router import get_booking_continuation, static_reply
+
+        assert static_reply("offer_prompt", "en") == "Would you like me to prepare an **offer**?"
+        assert static_reply("offer_prompt", "si").startswith("Želite")
+        assert get_booking_continuation("ne_obstaja", {}, "de") != get_booking_continuation("ne_obstaja", {})
+
+    def test_unknown_response_in_english_and_german(self):
+        from app.services.chat_router import is_unknown_response
+
+        assert is_unknown_response("I'm not sure about that, sorry.")
+        assert is_unknown_response("Dazu habe ich leider keine Informationen.")
+        assert not is_unknown_response("You can park right in front of the house.")
+
+
+class TestOneShotLLM:
+    """Testi za en strukturiran LLM klic (namen + entitete + odgovor)."""
+
+    def _patch(self, monkeypatch, payload: dict):
+        import json
+        from types import SimpleNamespace
+        import app.core.llm_client as llm_client
+        import app.services.chat_router as chat_router
+
+        requests = []
+
+        async def create(**kwargs):
+            requests.append(kwargs)
+            return SimpleNamespace(output_text=json.dumps(payload), output=[])
+
+        client = SimpleNamespace(responses=SimpleNamespace(create=create))
+        client.with_options = lambda **kwargs: client
+        monkeypatch.setattr(llm_client, "get_async_llm_client", lambda: client)
+        monkeypatch.setattr(chat_router.reservation_service, "log_conversation", lambda **kwargs: 1)
+        return requests
+
+    def test_request_uses_json_schema(self):
+        from app.core.config import get_settings
+        from app.services.chat_router import ONE_SHOT_SCHEMA, _one_shot_request
+
+        request = _one_shot_request("Imate prosto sobo?", get_settings(), "en")
+        assert request["text"]["format"]["type"] == "json_schema"
+        assert request["text"]["format"]["strict"] is True
+        assert set(ONE_SHOT_SCHEMA["required"]) == set(ONE_SHOT_SCHEMA["properties"])
+        assert "tools" not in request
+
+    def test_parse_and_decision(self):
+        from types import SimpleNamespace
+        from app.services.chat_router import _parse_one_shot, one_shot_decision
+
+        result = _parse_one_shot(SimpleNamespace(
+            output_text='{"intent": "BOOKING_ROOM", "date": "12.06.2026", "nights": 3, "people_count": 2, "time": null, "answer": ""}'
+        ))
+        decision = one_shot_decision(result, {"step": None})
+        assert decision["routing"]["intent"] == "BOOKING_ROOM"
+        assert decision["entities"] == {"date": "12.06.2026", "nights": 3, "people_count": 2}
+        assert decision["context"]["answer"] is None
+        assert _parse_one_shot(SimpleNamespace(output_text="ni json")) is None
+        assert _parse_one_shot(SimpleNamespace(output_text='{"intent": "INFO", "answer": ""}')) is None
+
+    def test_entities_fill_only_what_parser_missed(self):
+        from app.services.chat_router import _blank_reservation_state, seed_booking_entities
+
+        state = _blank_reservation_state()
+        entities = {"date": "12.06.2027", "nights": 3, "people_count": 4, "time": "25:00"}
+        seed_booking_entities("Rad bi rezerviral sobo za 2 osebi", state, entities)
+        assert (state["date"], state["nights"]) == ("12.06.2027", 3)
+        assert state["people"] is None  # razčlenjevalnik je našel 2 osebi, prednost ima on
+        assert state["time"] is None  # neveljavna ura iz modela
+
+    def test_booking_entities_reach_reservation_flow(self):
+        import app.services.chat_router as cr
+        from app.services.executor_v2 import execute_decision
+
+        def run(intent, message, entities):
+            state = cr._blank_reservation_state()
+            execute_decision(
+                decision=cr.one_shot_decision({"intent": intent, "answer": "", **entities}, state),
+                message=message,
+                state=state,
+                translate_fn=lambda text: text,
+                info_responder=None,
+                product_responder=None,
+                reservation_flow_fn=cr.handle_reservation_flow,
+                reset_fn=cr.reset_reservation_state,
+                continuation_fn=None,
+                entities_fn=cr.seed_booking_entities,
+            )
+            return state
+
+        room = run("BOOKING_ROOM", "Rad bi rezerviral sobo za 2 osebi", {"date": "12.06.2027", "nights": 3})
+        assert (room["date"], room["nights"], room["people"], room["step"]) == ("12.06.2027", 3, 2, "awaiting_kids_info")
+        table = run("BOOKING_TABLE", "Rezerviram mizo", {"date": "12.06.2027", "time": "13:00", "people_count": 4})
+        assert (table["date"], table["time"], table["people"], table["step"]) == ("12.06.2027", "13:00", 4, "awaiting_kids_info")
+
+    def test_executor_uses_answer_directly(self):
+        from app.services.chat_router import one_shot_decision
+        from app.services.executor_v2 import execute_decision
+
+        def fail(*args, **kwargs):
+            raise AssertionError("odgovor že obstaja")
+
+        decision = one_shot_decision({"intent": "INFO", "answer": "Pri nas je lep razgled."}, {"step": None})
+        reply = execute_decision(
+            decision=decision,
+            message="razgled?",
+            state={"step": None},
+            translate_fn=fail,
+            info_responder=fail,
+            product_responder=fail,
+            reservation_flow_fn=fail,
+            reset_fn=fail,
+            continuation_fn=fail,
+        )
+        assert reply == "Pri nas je lep razgled."
+
+    def test_info_turn_is_one_model_call(self, monkeypatch):
+        import asyncio
+        import uuid
+        import app.services.chat_router as chat_router
+
+        answer = "From the farm you can see the whole Pohorje ridge."
+        requests = self._patch(
+            monkeypatch,
+            {"intent": "INFO", "date": None, "nights": None, "people_count": None, "time": None, "answer": answer},
+        )
+        payload = chat_router.ChatRequestWithSession(
+            message="What is the view like from your farm?", session_id=f"one-shot-{uuid.uuid4()}"
+        )
+        response = asyncio.run(chat_router.chat_endpoint(payload))
+        assert response.reply == answer
+        assert len(requests) == 1
+        assert requests[0]["text"]["format"]["name"] == "chat_turn"
+
+
+class TestBoundedContext:
+    """Testi za kontekst v proračunu tokenov (namesto celega KB)."""
+
+    @staticmethod
+    def _patch_search(monkeypatch, scored):
+        import app.rag.context_builder as context_builder
+
+        monkeypatch.setattr(context_builder, "search_knowledge_scored", lambda question, top_k=8: scored)
+
+    @staticmethod
+    def _chunk(title: str, words: int):
+        from app.rag.knowledge_base import KnowledgeChunk
+
+        return KnowledgeChunk(url=f"https://kmetija-urska.si/{title}", title=title, paragraph=" ".join(["beseda"] * words))
+
+    def test_count_tokens(self):
+        from app.rag.context_builder import count_tokens
+
+        assert count_tokens("") == 0
+        assert 0 < count_tokens("Dober dan") < count_tokens("Dober dan, imate proste sobe za vikend?")
+
+    def test_budget_and_facts(self, monkeypatch):
+        from app.rag.context_builder import build_bounded_context, count_tokens
+
+        chunks = [(0.9, self._chunk("sobe", 300)), (0.8, self._chunk("cenik", 40)), (0.7, self._chunk("cenik", 40))]
+        self._patch_search(monkeypatch, chunks)
+        facts = {"cena_sobe": "50€/osebo/noč z zajtrkom"}
+        budget = count_tokens("Cena: 50€/osebo/noč z zajtrkom") + 200
+        context = build_bounded_context("Koliko stane soba?", facts, max_tokens=budget)
+        assert context is not None
+        assert "50€/osebo/noč" in context.facts
+        # prevelik odstavek izpade, podvojeni se ne ponovi
+        assert context.chunks == 1
+        assert "cenik" in context.passages
+        assert context.tokens <= budget
+
+    def test_low_score_falls_back_to_full_kb(self, monkeypatch):
+        import app.services.chat_router as chat_router
+        from app.core.config import get_settings
+
+        self._patch_search(monkeypatch, [(0.1, self._chunk("sobe", 20))])
+        request = chat_router._full_kb_request("xyz?", get_settings())
+        assert request["input"][0]["content"] == chat_router._llm_system_prompt_full_kb("si")
+
+        self._patch_search(monkeypatch, [(0.9, self._chunk("sobe", 20))])
+        request = chat_router._full_kb_request("Kakšne so sobe?", get_settings(), "en")
+        system, developer = request["input"][0]["content"], request["input"][1]["content"]
+        assert "VSE informacije" not in system
+        assert chat_router.INFO_RESPONSES["cena_sobe"].strip() in system
+        assert developer.startswith("Izbrani odlomki")
+        assert request["prompt_cache_key"].startswith("urska-bounded-")
+
+
+class TestAnswerCache:
+    """Testi za predpomnilnik odgovorov (normalizacija, LRU/TTL, deljena baza)."""
+
+    def test_normalized_key(self):
+        from app.services.answer_cache import cache_key, normalize_question
+
+        assert normalize_question("Koliko STANE soba?") == normalize_question("koliko stane sóba")
+        assert normalize_question("Ali imate wifi?") == "imate wifi"
+        assert normalize_question("Kje ste?") == "kje"
+        assert cache_key("Imate wifi?", "si", "v1") != cache_key("Imate wifi?", "en", "v1")
+        assert cache_key("Imate wifi?", "si", "v1") != cache_key("Imate wifi?", "si", "v2")
+        assert cache_key("?!", "si", "v1") is None
+
+    def test_lru_and_ttl(self, monkeypatch):
+        import app.services.answer_cache as answer_cache
+
+        cache = answer_cache.InMemoryAnswerCache(max_entries=2, ttl_hours=1)
+        cache.set("prvo vprašanje", "si", "v1", "ena")
+        cache.set("drugo vprašanje", "si", "v1", "dva")
+        assert cache.get("Prvo vprašanje?", "si", "v1") == "ena"
+        cache.set("tretje vprašanje", "si", "v1", "tri")
+        assert cache.get("drugo vprašanje", "si", "v1") is None
+        assert cache.stats["evicted"] == 1
+
+        now = answer_cache.time.monotonic()
+        monkeypatch.setattr(answer_cache.time, "monotonic", lambda: now + 7200)
+        assert cache.get("prvo vprašanje", "si", "v1") is None
+        assert cache.stats["expired"] == 1
+
+    def test_database_cache_shared_and_invalidated(self, tmp_path):
+        from app.services.answer_cache import DatabaseAnswerCache
+        from app.services.reservation_service import ReservationService
+
+        service = ReservationService(db_path=str(tmp_path / "cache.db"))
+        DatabaseAnswerCache(lambda: service).set("Imate wifi?", "si", "v1", "Da, brezplačen.")
+        other = DatabaseAnswerCache(lambda: service)
+        assert other.get("imate WIFI", "si", "v1") == "Da, brezplačen."
+        assert other.get("imate wifi", "si", "v2") is None
+        assert other.invalidate("v2") == 1
+        assert other.get("imate wifi", "si", "v1") is None
+
+    def test_database_cache_read_only_hits_and_bounded_size(self, tmp_path):
+        from app.services.answer_cache import DatabaseAnswerCache
+        from app.services.reservation_service import ReservationService
+
+        service = ReservationService(db_path=str(tmp_path / "cache.db"))
+
+        def rows():
+            conn = service._conn()
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT cache_key, hits FROM answer_cache")
+                return {dict(row)["cache_key"].split(":")[-1]: dict(row)["hits"] for row in cur.fetchall()}
+            finally:
+                conn.close()
+
+        cache = DatabaseAnswerCache(lambda: service, max_entries=2)
+        cache.PURGE_EVERY = 1000
+        for question in ["wifi", "parking", "zajtrk"]:
+            cache.set(question, "si", "v1", f"odgovor {question}")
+        assert cache.get("wifi", "si", "v1") == "odgovor wifi"
+        assert cache.get("zajtrk", "si", "v1") == "odgovor zajtrk"
+        # branje ne piše v bazo, zadetki čakajo na paketni zapis
+        assert set(rows().values()) == {0}
+        assert cache.purge() == 1
+        assert rows() == {"wifi": 1, "zajtrk": 1}
+        assert cache.stats["evicted"] == 1
+
+    def test_full_kb_answer_served_from_cache(self, monkeypatch):
+        import asyncio
+        from types import SimpleNamespace
+        import app.core.llm_client as llm_client
+        from app.services.chat_router import _llm_answer_full_kb_async
+
+        calls = []
+
+        async def create(**kwargs):
+            calls.append(kwargs)
+            return SimpleNamespace(output_text="Wi-Fi je brezplačen.", output=[])
+
+        client = SimpleNamespace(responses=SimpleNamespace(create=create))
+        client.with_options = lambda **kwargs: client
+        monkeypatch.setattr(llm_client, "get_async_llm_client", lambda: client)
+
+        assert asyncio.run(_llm_answer_full_kb_async("Imate wifi?")) == "Wi-Fi je brezplačen."
+        assert asyncio.run(_llm_answer_full_kb_async("ali imate WiFi")) == "Wi-Fi je brezplačen."
+        assert len(calls) == 1
+        # drug jezik je drug ključ
+        asyncio.run(_llm_answer_full_kb_async("Imate wifi?", "en"))
+        assert len(calls) == 2
+
+
+class TestCacheWarmer:
+    """scripts/warm_answer_cache.py – izbor vprašanj in omejena sočasnost."""
+
+    @staticmethod
+    def _warmer():
+        import sys
+        from pathlib import Path
+
+        sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+        import warm_answer_cache
+
+        return warm_answer_cache
+
+    def test_select_questions_groups_and_limits_per_language(self):
+        warmer = self._warmer()
+        rows = [
+            {"user_message": "Imate wifi?", "count": 3},
+            {"user_message": "ali imate WiFi", "count": 4},
+            {"user_message": "Koliko stane soba?", "count": 5},
+            {"user_message": "Do you have wifi?", "count": 2},
+            {"user_message": "   ", "count": 9},
+        ]
+        detect = lambda text: "en" if "you" in text.lower() else "si"
+        selected = warmer.select_questions(rows, 1, detect)
+        assert selected == [("Imate wifi?", "si", 7), ("Do you have wifi?", "en", 2)]
+
+    def test_warm_reports_refreshed_skipped_failed(self):
+        import asyncio
+        from app.services.answer_cache import InMemoryAnswerCache
+
+        warmer = self._warmer()
+        cache = InMemoryAnswerCache()
+        cache.set("Imate wifi?", "si", "v1", "Da.")
+        running = {"now": 0, "max": 0}
+
+        async def answer(question, language):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            if "napaka" in question:
+                raise RuntimeError("timeout")
+            if "rezerv" in question.lower():
+                return None
+            return f"odgovor: {question}"
+
+        questions = [
+            ("Imate wifi?", "si", 9),
+            ("Rezerviram sobo", "si", 5),
+            ("napaka pri klicu", "si", 4),
+        ] + [(f"vprašanje {i}", "si", 1) for i in range(6)]
+        report = asyncio.run(warmer.warm(questions, answer, cache, "v1", concurrency=2))
+        assert report == {"refreshed": 6, "skipped": 2, "failed": 1}
+        assert running["max"] <= 2
+        assert cache.get("vprašanje 3", "si", "v1") == "odgovor: vprašanje 3"
+        assert cache.get("Imate wifi?", "si", "v1") == "Da."
+
+        report = asyncio.run(warmer.warm(questions[:1], answer, cache, "v1", refresh=True))
+        assert report["refreshed"] == 1
+        assert cache.get("Imate wifi?", "si", "v1") == "odgovor: Imate wifi?"
+
+
+class TestKeywordMatcher:
+    """En Aho-Corasick prehod namesto `any(kw in text ...)` v vsakem detektorju."""
+
+    def test_finds_overlapping_keywords(self):
+        from app.services.keyword_matcher import AhoCorasick
+
+        automaton = AhoCorasick(["he", "she", "hers", "his", "rezer", "rezerv"])
+        found = sorted(automaton.iter_matches("ushers rezerviram"))
+        assert found == [(1, "she"), (2, "he"), (2, "hers"), (7, "rezer"), (7, "rezerv")]
+
+    def test_matches_same_as_substring_and_word_regex(self):
+        import random
+        import re
+        from app.services.keyword_matcher import KeywordRegistry
+
+        words = ["soba", "sob", "ob ", "i", "noč", "a-b", "room"]
+        registry = KeywordRegistry()
+        registry.register("sub", words)
+        registry.register("word", words, whole_word=True)
+        rnd = random.Random(7)
+        pieces = words + [" ", "x", "š", "-", "1", "SOBA"]
+        for _ in range(500):
+            text = "".join(rnd.choice(pieces) for _ in range(rnd.randint(0, 6))).lower()
+            hits = registry.scan(text)
+            assert hits.matched("sub") == {w for w in words if w in text}
+            assert hits.matched("word") == {w for w in words if re.search(rf"\b{re.escape(w)}\b", text)}
+
+    def test_detectors_share_one_scan(self):
+        from app.services.chat_router import detect_info_intent, detect_language, is_info_only_question
+        from app.services.keyword_matcher import scan_keywords
+
+        scan_keywords.cache_clear()
+        message = "ali imate wifi"
+        assert detect_info_intent(message) == "wifi"
+        assert is_info_only_question(message) is True
+        assert detect_language(message) == "si"
+        info = scan_keywords.cache_info()
+        assert info.misses == 1 and info.hits == 2
+
+    def test_language_counts_distinct_keywords(self):
+        from app.services.chat_router import detect_language
+
+        assert detect_language("Ich möchte ein Zimmer") == "de"
+        assert detect_language("I want a room") == "en"
+        assert detect_language("Imate sobo za vikend?") == "si"
+
+
+class TestIntentClassifier:
+    """Lokalni klasifikator rezervacijske namere namesto LLM klica route_reservation."""
+
+    EXAMPLES = [
+        ("rad bi rezerviral sobo", "BOOKING_ROOM"),
+        ("rezerviram sobo za 2 noči", "BOOKING_ROOM"),
+        ("book a room for two nights", "BOOKING_ROOM"),
+        ("rezerviram mizo za kosilo", "BOOKING_TABLE"),
+        ("mizo za 6 oseb ob 13:00", "BOOKING_TABLE"),
+        ("book a table for lunch", "BOOKING_TABLE"),
+        ("ali imate wifi", "NONE"),
+        ("kdaj ste odprti", "NONE"),
+        ("koliko stane zajtrk", "NONE"),
+    ]
+
+    def test_features_are_stable_and_fold_accents(self):
+        from app.services.intent_classifier import features
+
+        assert features("Nočitev") == features("nocitev")
+        assert all(0 <= index < 4096 for index in features("rezerviram sobo"))
+        assert features("") == []
+
+    def test_train_predict_and_roundtrip(self, tmp_path):
+        from app.services.intent_classifier import IntentClassifier, train
+
+        classifier = train(self.EXAMPLES, epochs=200)
+        for message, label in self.EXAMPLES:
+            assert classifier.predict(message)[0] == label
+        path = tmp_path / "clf.json"
+        classifier.save(path)
+        loaded = IntentClassifier.load(path)
+        assert loaded.version == classifier.version
+        label, confidence = loaded.predict("rezerviram sobo")
+        assert label == "BOOKING_ROOM" and 0.0 <= confidence <= 1.0
+
+    def test_rejects_unknown_format(self, tmp_path):
+        import json
+        from app.services.intent_classifier import IntentClassifier
+
+        path = tmp_path / "clf.json"
+        path.write_text(json.dumps({"format": 99}), encoding="utf-8")
+        assert IntentClassifier.load(path) is None
+
+    def test_shipped_model_holdout_metrics(self):
+        """Ocena na odloženih primerih (scripts/train_router_classifier.py), ne na učnih."""
+        from app.services.intent_classifier import IntentClassifier
+
+        classifier = IntentClassifier.load()
+        assert classifier is not None
+        holdout = classifier.meta.get("holdout")
+        assert holdout, "model brez ocene na odloženih primerih"
+        # nad pragom se model ne sme motiti, sicer bi rezervacije šle mimo LLM napačno
+        assert holdout["confident_accuracy"] >= 0.98
+        assert holdout["coverage"] > 0.5
+        assert holdout["accuracy"] >= 0.9
+
+    def test_llm_only_below_threshold(self, monkeypatch):
+        import asyncio
+        import app.services.chat_router as cr
+
+        llm_calls = []
+
+        async def fake_llm(message):
+            llm_calls.append(message)
+            return {"action": "NONE"}
+
+        monkeypatch.setattr(cr, "_llm_route_reservation_async", fake_llm)
+        monkeypatch.setattr(cr, "classify_reservation", lambda message: {"action": "BOOKING_ROOM", "confidence": 0.97})
+        assert asyncio.run(cr._route_reservation_async("rad bi sobo"))["action"] == "BOOKING_ROOM"
+        assert llm_calls == []
+        monkeypatch.setattr(cr, "classify_reservation", lambda message: None)
+        assert asyncio.run(cr._route_reservation_async("hm"))["action"] == "NONE"
+        assert llm_calls == ["hm"]
+
+    def test_confident_booking_skips_all_llm_calls(self, monkeypatch):
+        """Skozi chat_endpoint: zanesljiva rezervacija ne sproži ne one-shot ne routing klica."""
+        import asyncio
+        import uuid
+        from types import SimpleNamespace
+        import app.core.llm_client as llm_client
+        import app.services.chat_router as cr
+
+        llm_calls = []
+
+        def create(**kwargs):
+            llm_calls.append(kwargs)
+            raise AssertionError("LLM ne bi smel biti klican")
+
+        client = SimpleNamespace(responses=SimpleNamespace(create=create))
+        client.with_options = lambda **kwargs: client
+        monkeypatch.setattr(llm_client, "get_async_llm_client", lambda: client)
+        monkeypatch.setattr(cr, "USE_FULL_KB_LLM", True)
+        monkeypatch.setattr(cr, "USE_ONE_SHOT_LLM", True)
+        monkeypatch.setattr(cr.reservation_service, "log_conversation", lambda **kwargs: 1)
+        monkeypatch.setattr(cr, "classify_reservation", lambda message: {"action": "BOOKING_ROOM", "confidence": 0.95})
+
+        payload = cr.ChatRequestWithSession(message="Rad bi rezerviral sobo", session_id=f"clf-{uuid.uuid4()}")
+        response = asyncio.run(cr.chat_endpoint(payload))
+        assert llm_calls == []
+        assert response.reply
+        assert cr.get_reservation_state(payload.session_id)["type"] == "room"
+
+
+class TestTemporalParser:
+    """Pravilni razčlenjevalnik datumov, nočitev, oseb in ure (si/en/de)."""
+
+    TODAY = datetime(2026, 10, 17).date()  # sobota
+
+    def parse(self, text):
+        from app.services.temporal_parser import parse_booking_entities
+        return parse_booking_entities(text, self.TODAY)
+
+    def test_ranges_in_three_languages(self):
+        for text in ["od 3. do 6. maja", "from 3rd to 6th of May", "vom 3. bis 6. Mai", "May 3-6"]:
+            entities = self.parse(text)
+            assert (entities.date, entities.end_date, entities.approximate) == ("03.05.2027", "06.05.2027", False), text
+
+    def test_relative_days_and_weekdays(self):
+        assert self.parse("naslednji petek").date == "23.10.2026"
+        assert self.parse("next saturday").date == "24.10.2026"
+        assert self.parse("ta sobota").date == "17.10.2026"
+        assert self.parse("čez 2 tedna").date == "31.10.2026"
+        assert self.parse("pojutrišnjem").date == "19.10.2026"
+        assert self.parse("Guten Morgen!").date is None
+
+    def test_windows_are_approximate(self):
+        easter = self.parse("über Ostern")
+        assert (easter.date, easter.end_date, easter.approximate) == ("26.03.2027", "29.03.2027", True)
+        july = self.parse("konec julija")
+        assert (july.date, july.end_date, july.exact_date) == ("21.07.2027", "31.07.2027", None)
+
+    def test_quantities_and_time(self):
+        entities = self.parse("3 Nächte für 2 Erwachsene und 1 Kind, Ankunft um 7 pm")
+        assert (entities.nights, entities.adults, entities.kids, entities.people, entities.time) == (3, 2, 1, 3, "19:00")
+        entities = self.parse("mizo za šest oseb ob 13.30")
+        assert (entities.people, entities.time) == (6, "13:30")
+
+    def test_chat_router_fallbacks(self):
+        from app.services.chat_router import extract_date_range, extract_nights, extract_time, parse_people_count
+
+        assert extract_nights("two nights") == 2
+        assert extract_nights("za dve osebi") is None
+        assert extract_time("at 1 pm") == "13:00"
+        assert parse_people_count("dva odrasla in en otrok")["total"] == 3
+        assert extract_date_range("from 3rd to 6th of May") is not None
+
+
+class TestTypoIndex:
+    """Popravljanje tipkarskih napak iz domenskega besedišča (SymSpell)."""
+
+    def test_index_corrects_within_bounded_distance(self):
+        from app.services.typo_index import TypoIndex
+
+        index = TypoIndex()
+        for word in ["rezervacija", "table", "kosilo"]:
+            index.add(word)
+        index.add("sobota", target=False)
+        assert index.lookup("rezevacija") == "rezervacija"
+        assert index.lookup("tabel") == "table"  # zamenjava sosednjih črk
+        assert index.lookup("koslo") == "kosilo"
+        assert index.lookup("sobota") is None  # znana beseda ostane
+        assert index.lookup("tab") is None  # prekratko za popravek
+        assert index.lookup("rzvcija") is None  # predaleč
+
+    def test_edit_distance_matches_full_table(self):
+        from app.services.typo_index import edit_distance
+
+        assert edit_distance("tablle", "table", 1) == 1
+        assert edit_distance("rezrvacijo", "rezervacija", 2) == 2
+        assert edit_distance("koliko", "kosilo", 1) == 2  # nad mejo -> limit + 1
+
+    def test_detectors_match_corrected_tokens(self):
+        from app.services.chat_router import correct_typos, detect_router_intent, is_reservation_typo
+
+        assert correct_typos("bukng tablle za 4") == "buking table za 4"
+        assert correct_typos("salamo in marmelade") == "salamo in marmelade"  # končnice niso napake
+        assert detect_router_intent("rezrvacija sobe za 2", {"step": None}) == "booking_room"
+        assert detect_router_intent("veceja za 6 oseb", {"step": None}) == "booking_table"
+        assert is_reservation_typo("rezevacija")
+        assert not is_reservation_typo("sobota")
+
+
+class TestMetrics:
+    """Razponi faz po nameri in Prometheus izpis za /metrics."""
+
+    def test_histogram_render_and_quantile(self):
+        from app.core.metrics import Histogram
+
+        histogram = Histogram("test_seconds", "Test.", ("intent",), buckets=(0.1, 1.0))
+        for value in [0.05] * 90 + [0.5] * 10:
+            histogram.observe(value, intent="info_llm")
+        lines = histogram.render()
+        assert 'test_seconds_bucket{intent="info_llm",le="0.1"} 90' in lines
+        assert 'test_seconds_bucket{intent="info_llm",le="+Inf"} 100' in lines
+        assert 'test_seconds_count{intent="info_llm"} 100' in lines
+        assert histogram.quantile(0.5, intent="info_llm") < 0.1 < histogram.quantile(0.95, intent="info_llm") <= 1.0
+        assert histogram.quantile(0.95, intent="drugo") is None
+
+    def test_spans_are_tagged_with_final_intent(self):
+        from types import SimpleNamespace
+        from app.core import metrics
+
+        metrics.reset_metrics()
+        token = metrics.start_trace()
+        with metrics.span("routing", "reservation"):
+            metrics.observe_llm_call("route_reservation", "gpt-test", 0.2, usage=SimpleNamespace(input_tokens=100, output_tokens=5))
+        metrics.set_trace_intent("booking_room")
+        metrics.finish_trace(token)
+        metrics.record_span("llm", 0.3, "stream")  # izven zahtevka
+
+        text = metrics.render_metrics()
+        assert 'chat_stage_seconds_count{stage="routing",detail="reservation",intent="booking_room"} 1' in text
+        assert 'chat_stage_seconds_count{stage="llm",detail="route_reservation",intent="booking_room"} 1' in text
+        assert 'chat_stage_seconds_count{stage="llm",detail="stream",intent="none"} 1' in text
+        assert 'chat_request_seconds_count{intent="booking_room"} 1' in text
+        assert 'llm_call_seconds_count{call_site="route_reservation",model="gpt-test",status="ok"} 1' in text
+        assert 'llm_tokens_total{call_site="route_reservation",model="gpt-test",type="input"} 100' in text
+        assert set(metrics.latency_summary()["stages"]) == {"routing:reservation", "llm:route_reservation", "llm:stream"}
+        metrics.reset_metrics()
+
+    def test_chat_endpoint_records_request_by_intent(self, monkeypatch):
+        import asyncio
+        import app.services.chat_router as cr
+        from app.core import metrics
+        from app.models.chat import ChatResponse
+
+        async def fake_reply(payload, session):
+            await asyncio.to_thread(metrics.record_span, "retrieval", 0.01, "semantic")
+            metrics.set_trace_intent("info_semantic")
+            return ChatResponse(reply="ok")
+
+        metrics.reset_metrics()
+        monkeypatch.setattr(cr, "_chat_reply", fake_reply)
+        asyncio.run(cr.chat_endpoint(cr.ChatRequestWithSession(message="živjo", session_id="metrics-test")))
+        text = metrics.render_metrics()
+        assert 'chat_request_seconds_count{intent="info_semantic"} 1' in text
+        assert 'chat_stage_seconds_count{stage="retrieval",detail="semantic",intent="info_semantic"} 1' in text
+        metrics.reset_metrics()
+
+    def test_stream_endpoint_traced_until_response_is_sent(self, monkeypatch):
+        """/chat/stream: sled se zapre po zadnjem kosu; delegirane veje brez gnezdene sledi."""
+        import uuid
+        from fastapi.testclient import TestClient
+        import app.services.chat_router as cr
+        from app.core import metrics
+        from app.models.chat import ChatResponse
+        from main import app
+
+        async def fake_stream(message, settings, language="si"):
+            metrics.record_span("retrieval", 0.01, "bounded_context")
+            metrics.observe_llm_call("full_kb_stream", "gpt-test", 0.2)
+            yield "Odgovor "
+            yield "iz streama."
+
+        async def fake_reply(payload, session):
+            metrics.set_trace_intent("booking_room")
+            return ChatResponse(reply="Za kateri datum?")
+
+        monkeypatch.setattr(cr, "USE_FULL_KB_LLM", True)
+        monkeypatch.setattr(cr, "_llm_answer_full_kb_stream_async", fake_stream)
+        monkeypatch.setattr(cr, "_chat_reply", fake_reply)
+        monkeypatch.setattr(cr.reservation_service, "log_conversation", lambda **kwargs: 1)
+        client = TestClient(app)
+
+        metrics.reset_metrics()
+        response = client.post("/chat/stream", json={"message": "Kakšen je razgled?", "session_id": f"stream-{uuid.uuid4()}"})
+        assert response.text == "Odgovor iz streama."
+        text = metrics.render_metrics()
+        assert 'chat_request_seconds_count{intent="stream"} 1' in text
+        assert 'chat_stage_seconds_count{stage="retrieval",detail="bounded_context",intent="stream"} 1' in text
+        assert 'chat_stage_seconds_count{stage="llm",detail="full_kb_stream",intent="stream"} 1' in text
+        assert 'chat_stage_seconds_count{stage="logging",detail="conversation",intent="stream"} 1' in text
+        assert 'intent="none"' not in text
+
+        metrics.reset_metrics()
+        response = client.post("/chat/stream", json={"message": "rad bi rezerviral sobo", "session_id": f"stream-{uuid.uuid4()}"})
+        assert response.text == "Za kateri datum?"
+        assert [labels["intent"] for labels in metrics.CHAT_REQUEST_SECONDS.label_values()] == ["booking_room"]
+        assert 'chat_request_seconds_count{intent="booking_room"} 1' in metrics.render_metrics()
+        metrics.reset_metrics()
@@ -236,3 +236,314 @@ class TestAvailability:
         for room in rooms:
             room_upper = room.upper().replace("Ž", "Z")
             assert room_upper in valid_rooms or room in valid_rooms
+
+
+@pytest.fixture
+def isolated_service(tmp_path):
+    """ReservationService nad prazno začasno SQLite bazo."""
+    from app.services.reservation_service import ReservationService
+    return ReservationService(db_path=str(tmp_path / "reservations.db"))
+
+
+def get_future_day(year_offset: int, month: int, day: int) -> datetime:
+    """Vrne fiksen dan v prihodnjem letu (stabilno za teste z urnikom)."""
+    return datetime(datetime.now().year + year_offset, month, day)
+
+
+class TestOccupancyIndex:
+    """Testi za indeks zasedenosti sob."""
+
+    def test_index_add_and_remove(self):
+        """Indeks po odstranitvi rezervacije sprosti sobo in kapaciteto."""
+        from app.services.occupancy_index import RoomOccupancyIndex, RoomStay
+
+        index = RoomOccupancyIndex(["A", "B"])
+        index.rebuild([RoomStay(reservation_id=1, start=100, nights=3, rooms_needed=1, preferred=("B",))])
+        assert index.free_rooms(101, 1) == ["A"]
+        assert index.fits(100, 3, 1)
+        assert not index.fits(100, 3, 2)
+        index.remove(1)
+        assert index.free_rooms(101, 1) == ["A", "B"]
+        assert index.rooms_used(101) == 0
+
+    def test_reads_during_rebuild_see_complete_index(self):
+        """Poizvedba iz druge niti med osvežitvijo vidi star (poln) indeks, ne praznega."""
+        import threading
+        from app.services.occupancy_index import RoomOccupancyIndex, RoomStay
+
+        stays = [
+            RoomStay(reservation_id=1, start=100, nights=3, rooms_needed=1),
+            RoomStay(reservation_id=2, start=100, nights=3, rooms_needed=1),
+        ]
+        index = RoomOccupancyIndex(["A", "B"])
+        index.rebuild(stays)
+        seen = []
+
+        def read():
+            seen.append((index.fits(101, 1, 1), index.free_rooms(101, 1), index.used_days(101, 1)))
+
+        def loader():
+            for stay in stays:
+                reader = threading.Thread(target=read)
+                reader.start()
+                reader.join(timeout=5)
+                yield stay
+
+        index.rebuild(loader())
+        assert seen == [(False, [], [2])] * 2
+        assert index.free_rooms(101, 1) == []
+
+    def test_index_follows_writes(self, isolated_service):
+        """Ustvarjanje in preklic rezervacije se takoj odrazita v available_rooms."""
+        service = isolated_service
+        future_str = get_future_day(1, 10, 5).strftime("%d.%m.%Y")
+        assert "HANA" in service.available_rooms(future_str, 2)
+        res_id = service.create_reservation(
+            date=future_str,
+            people=2,
+            reservation_type="room",
+            nights=2,
+            rooms=1,
+            location="Soba HANA",
+        )
+        assert "HANA" not in service.available_rooms(future_str, 2)
+        service.update_status(res_id, "cancelled")
+        assert "HANA" in service.available_rooms(future_str, 2)
+
+
+class TestConnectionPool:
+    """Testi za pool povezav."""
+
+    def test_bounded_pool_reuses_and_times_out(self):
+        """Pool vrnjeno povezavo ponovno uporabi, ob polnem poolu pa po timeoutu javi napako."""
+        import sqlite3
+        from app.core.db_pool import BoundedConnectionPool
+
+        pool = BoundedConnectionPool(lambda: sqlite3.connect(":memory:", check_same_thread=False), max_size=1, timeout=0.05)
+        conn = pool.acquire()
+        conn.close()
+        conn = pool.acquire()
+        with pytest.raises(TimeoutError):
+            pool.acquire()
+        conn.close()
+        stats = pool.stats()
+        assert stats["created"] == 1
+        assert stats["acquired"] == 2
+        assert stats["in_use"] == 0
+        assert stats["waits"] == 1
+        assert stats["timeouts"] == 1
+
+
+class TestDateRangeQueries:
+    """Testi za ISO stolpce start_date/end_date."""
+
+    def test_range_filter_uses_overlap(self, isolated_service):
+        """Rezervacija se vrne za obdobje, ki se prekriva z bivanjem, sicer ne."""
+        service = isolated_service
+        arrival = get_future_day(1, 4, 10)
+        res_id = service.create_reservation(
+            date=arrival.strftime("%d.%m.%Y"),
+            people=2,
+            reservation_type="room",
+            nights=3,
+            location="Soba CILKA",
+        )
+        stored = service.get_reservation(res_id)
+        assert stored["start_date"] == arrival.strftime("%Y-%m-%d")
+        assert stored["end_date"] == (arrival + timedelta(days=3)).strftime("%Y-%m-%d")
+
+        last_night = (arrival + timedelta(days=2)).strftime("%Y-%m-%d")
+        departure = (arrival + timedelta(days=3)).strftime("%Y-%m-%d")
+        hits = service.read_reservations(date_from=last_night, date_to=last_night, include_undated=False)
+        assert [r["id"] for r in hits] == [res_id]
+        misses = service.read_reservations(date_from=departure, date_to=departure, include_undated=False)
+        assert misses == []
+
+
+class TestAvailabilityMatrix:
+    """Testi za matriko razpoložljivosti."""
+
+    def test_matrix_reflects_booking(self, isolated_service):
+        """Zasedena soba je v matriki označena, najdaljše bivanje se ustavi pred rezervacijo."""
+        service = isolated_service
+        window_start = get_future_day(1, 3, 1)
+        arrival = window_start + timedelta(days=5)
+        service.create_reservation(
+            date=arrival.strftime("%d.%m.%Y"),
+            people=2,
+            reservation_type="room",
+            nights=2,
+            location="Soba MANCA",
+        )
+        matrix = service.availability_matrix(window_start.strftime("%d.%m.%Y"), 10)
+        assert matrix["rooms"]["MANCA"][5:7] == [False, False]
+        assert matrix["max_stay"]["MANCA"][0] == 5
+        assert matrix["free_rooms"][5] == 6
+        assert matrix["earliest_arrival"]["2"] == window_start.strftime("%d.%m.%Y")
+
+
+class TestAlternativeWindows:
+    """Testi za iskanje najbližjih prostih terminov."""
+
+    def test_nearest_windows_prefix_sums(self):
+        """Vrne najbližja prosta okna pred in po želenem dnevu."""
+        from app.services.occupancy_index import nearest_windows
+
+        blocked = [False, False, False, True, True, False, False, False, False]
+        allowed = [True] * len(blocked)
+        # želen prihod na dan 3 (zaseden), 2 noči
+        assert nearest_windows(blocked, 2, 3, allowed, limit=2) == [5, 1]
+        assert nearest_windows(blocked, 2, 3, allowed, limit=2, before=False) == [5, 6]
+        allowed[5] = False
+        assert nearest_windows(blocked, 2, 3, allowed, limit=1) == [1]
+
+    def test_room_preference_windows(self, isolated_service):
+        """Ob zasedeni želeni sobi predlaga termine, ko je ta soba prosta."""
+        service = isolated_service
+        arrival = get_future_day(1, 10, 12)
+        service.create_reservation(
+            date=arrival.strftime("%d.%m.%Y"),
+            people=2,
+            reservation_type="room",
+            nights=4,
+            location="Soba TINKARA",
+        )
+        windows = service.suggest_room_windows(
+            arrival.strftime("%d.%m.%Y"), 2, 2, room_preference="tinkara", limit=3
+        )
+        expected = [
+            (arrival - timedelta(days=2)).strftime("%d.%m.%Y"),
+            (arrival - timedelta(days=3)).strftime("%d.%m.%Y"),
+            (arrival + timedelta(days=4)).strftime("%d.%m.%Y"),
+        ]
+        assert windows == expected
+        # brez želje je termin prost (druge sobe)
+        assert service.check_room_availability(arrival.strftime("%d.%m.%Y"), 2, 2) == (True, None)
+
+
+class TestRoomAssignment:
+    """Testi za dodeljevanje sob."""
+
+    def test_assignment_independent_of_row_order(self):
+        """Razporeditev po prihodu najde prostor, kjer ga požrešno dodeljevanje po id-jih ne."""
+        from app.services.occupancy_index import RoomOccupancyIndex, RoomStay
+        from app.services.room_assignment import assign_rooms
+
+        stays = [
+            RoomStay(reservation_id=1, start=6, nights=1, rooms_needed=1),
+            RoomStay(reservation_id=2, start=3, nights=1, rooms_needed=1),
+            RoomStay(reservation_id=3, start=5, nights=2, rooms_needed=1),
+            RoomStay(reservation_id=4, start=3, nights=3, rooms_needed=1),
+        ]
+        result = assign_rooms(["A", "B"], stays)
+        assert all(len(rooms) == 1 for rooms in result.values())
+        assert result == assign_rooms(["A", "B"], list(reversed(stays)))
+
+        index = RoomOccupancyIndex(["A", "B"])
+        index.rebuild(stays[:3])
+        index.upsert(stays[3])
+        assert index.assigned_rooms(4) != []
+
+    def test_auto_assign_pending(self, isolated_service):
+        """Pending rezervacija brez sobe dobi prosto sobo, izbrane sobe ostanejo."""
+        service = isolated_service
+        arrival = get_future_day(1, 5, 4).strftime("%d.%m.%Y")
+        pinned = service.create_reservation(date=arrival, people=2, reservation_type="room", nights=2, location="Soba MARIJA")
+        open_id = service.create_reservation(date=arrival, people=2, reservation_type="room", nights=2)
+
+        proposals = service.auto_assign_rooms()
+        assert [p["id"] for p in proposals] == [open_id]
+        assert proposals[0]["complete"]
+        assert "MARIJA" not in proposals[0]["rooms"]
+        assert service.get_reservation(open_id)["location"] is None
+
+        service.auto_assign_rooms(apply=True)
+        assert service.get_reservation(open_id)["location"] == proposals[0]["rooms"][0]
+        assert service.get_reservation(pinned)["location"] == "Soba MARIJA"
+
+
+class TestMigrations:
+    """Testi za verzionirane migracije sheme."""
+
+    def test_upgrade_old_schema_once(self, tmp_path):
+        """Stara tabela dobi manjkajoče stolpce in ISO datume, druga izvedba ne naredi ničesar."""
+        import sqlite3
+        from app.services.reservation_service import ReservationService
+
+        db_path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE reservations (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL, nights INTEGER, "
+            "people INTEGER NOT NULL, reservation_type TEXT NOT NULL, time TEXT, location TEXT, name TEXT, "
+            "phone TEXT, email TEXT, note TEXT, created_at TEXT NOT NULL, source TEXT NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO reservations (date, nights, people, reservation_type, created_at, source) "
+            "VALUES ('03.02.2031', 2, 2, 'room', '2030-01-01', 'chat')"
+        )
+        conn.commit()
+        conn.close()
+
+        service = ReservationService(db_path=db_path)
+        assert service.migrate() == [1, 2, 3, 4, 5, 6, 7, 8]
+        assert service.migrate() == []
+        row = service.get_reservation(1)
+        assert row["status"] == "pending"
+        assert (row["start_date"], row["end_date"]) == ("2031-02-03", "2031-02-05")
+
+
+class TestConversationLog:
+    """Testi za write-behind zapisovanje pogovorov."""
+
+    def test_writer_batches_rows(self):
+        """Writer zapiše vrstice v paketih in flush počaka na zapis."""
+        from app.services.conversation_log import ConversationLogWriter
+
+        batches = []
+        writer = ConversationLogWriter(batches.append, batch_size=10, flush_interval_ms=20)
+        for i in range(25):
+            assert writer.enqueue((f"s{i}",))
+        assert writer.flush(timeout=2)
+        assert sum(len(b) for b in batches) == 25
+        assert all(len(b) <= 10 for b in batches)
+        writer.close()
+        assert not writer.enqueue(("late",))
+
+    def test_followup_is_written_synchronously(self, isolated_service):
+        """Pogovor za followup dobi ID takoj, ostali se zapišejo ob flushu."""
+        service = isolated_service
+        assert service.log_conversation("sess-1", "živjo", "Pozdravljeni!", intent="greeting") is None
+        conv_id = service.log_conversation("sess-1", "?", "Ne vem.", intent="unknown", needs_followup=True)
+        assert isinstance(conv_id, int)
+        assert service.flush_conversation_log()
+        messages = [c["user_message"] for c in service.get_conversations_by_session("sess-1")]
+        assert sorted(messages) == ["?", "živjo"]
+
+
+class TestUsageRollups:
+    """Testi za rollup statistiko uporabe."""
+
+    def test_rollups_match_backfill(self, isolated_service):
+        """Sproti posodobljen rollup se ujema s ponovnim izračunom iz pogovorov."""
+        from app.services.migrations import _m006_usage_rollups
+
+        service = isolated_service
+        for session_id in ["a", "a", "b", "", "c"]:
+            service.log_conversation(session_id, "vprašanje", "odgovor", intent="info")
+        service.log_conversation("c", "?", "Ne vem.", intent="unknown", needs_followup=True)
+        assert service.flush_conversation_log()
+
+        stats = service.get_usage_stats()
+        assert (stats["today"], stats["month"], stats["year"]) == (3, 3, 3)
+        assert stats["messages"]["today"] == 6
+        assert stats["followups"]["today"] == 1
+
+        conn = service._conn()
+        try:
+            cur = conn.cursor()
+            _m006_usage_rollups(cur, service)
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+        assert service.get_usage_stats() == stats